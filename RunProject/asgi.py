@@ -9,8 +9,12 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'RunProject.settings')
+django.setup(set_prefix=False)
 
-application = get_asgi_application()
+# 与 get_asgi_application() 相同，只是文章列表/详情/批量获取/关于接口使用异步视图(app/async_api_views.py)
+from app.async_api_views import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
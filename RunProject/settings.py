@@ -44,7 +44,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # /metrics 的请求指标（app/metrics.py）
+    'app.middleware.MetricsMiddleware',
+    # 请求耗时分段：Server-Timing 响应头与慢请求日志，放在最前面以覆盖整个请求
+    'app.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # 整页缓存：须在会话/认证中间件之前，命中时不再经过它们（由 PAGE_CACHE_ENABLED 开启）
+    'app.middleware.PageCacheMiddleware',
+    # 带内容哈希的 static/media 文件长期缓存
+    'app.middleware.AssetCacheControlMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,7 +66,8 @@ ROOT_URLCONF = 'RunProject.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # 在 Django 模板后端上统计渲染耗时(app/templating.py)
+        'BACKEND': 'app.templating.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates']
         ,
         'APP_DIRS': True,
@@ -126,9 +135,72 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static'] if (BASE_DIR / 'static').exists() else []
 
+# STATIC_FINGERPRINT=1 时 collectstatic 输出 name.<哈希>.ext，{% static %} 自动引用带指纹的文件名，
+# 配合 AssetCacheControlMiddleware / 前置服务器对其使用 Cache-Control: immutable
+if os.environ.get('STATIC_FINGERPRINT', '') == '1':
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+    }
+
+# generate_static_site 默认给 docs/ 中的 static/、media/ 文件名加内容哈希(--no-fingerprint 关闭)
+STATIC_BUILD_FINGERPRINT = True
+# 资源文件优先以 reflink/硬链接放入 docs/，False 时总是复制
+STATIC_BUILD_LINK_FILES = True
+# 静态站点对外地址(sitemap 中的绝对 URL)与单个 sitemap 文件的 URL 上限(协议规定不超过 50000)
+STATIC_SITE_URL = 'https://pangu-immortal.github.io/'
+STATIC_SITEMAP_MAX_URLS = 50000
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 内容版本号（app/caching.py）在缓存中的有效期（秒）
+# 使用进程内缓存部署多个进程时，其他进程最多滞后这么久才看到内容变化
+CONTENT_VERSION_TTL = 60
+
+# api_article_list 响应缓存有效期（秒），内容变化时通过版本号立即失效
+API_CACHE_TIMEOUT = 300
+
+# 批量文章接口 /api/articles/batch/ 单次最多的文章数
+API_BATCH_MAX_IDS = 50
+
+# 公开页面整页缓存（app/middleware.py），仅对匿名 GET 生效；默认关闭
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', '') == '1'
+PAGE_CACHE_TIMEOUT = 600
+
+# 请求耗时分段（app/middleware.py ServerTimingMiddleware）：SQL / Markdown / bleach / 模板耗时与缓存命中
+# SERVER_TIMING_HEADER 控制是否写入 Server-Timing 响应头(浏览器开发者工具可见)；
+# 总耗时超过 SLOW_REQUEST_THRESHOLD_MS 的请求以 JSON 记入 app.requests 日志，None 表示不记录
+SERVER_TIMING_ENABLED = True
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', '1') == '1'
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ['SLOW_REQUEST_THRESHOLD_MS']) if os.environ.get('SLOW_REQUEST_THRESHOLD_MS') else None
+
+# Prometheus 指标（app/metrics.py），由 /metrics 输出；METRICS_TOKEN 非空时要求 Authorization: Bearer <token>
+# 多个 worker 进程部署时设置 METRICS_MULTIPROC_DIR(启动前清空)，各进程最多每 METRICS_FLUSH_INTERVAL 秒
+# 把数值写入该目录，/metrics 汇总所有进程
+METRICS_ENABLED = True
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR') or None
+METRICS_FLUSH_INTERVAL = 1.0
+
+# Markdown 渲染缓存（app/rendering.py）：进程内 LRU 条数与磁盘缓存目录
+MARKDOWN_CACHE_SIZE = 256
+MARKDOWN_CACHE_DIR = BASE_DIR / '.cache' / 'markdown'
+
+# 封面衍生图宽度（app/images.py），按内容哈希存放在 media/covers/_variants/ 下
+COVER_VARIANT_WIDTHS = (320, 640, 960, 1280)
+
+# 封面水印：上传后在后台线程池中处理，原图保留在 media/covers/_originals/
+# 字体必须包含水印文字的字形(中文需 CJK 字体)，默认路径为 Debian/Ubuntu 的 fonts-noto-cjk；
+# 字体不可用或缺字时系统检查报 app.W001，封面保持待处理，配置好字体后运行 process_covers 补上
+COVER_WATERMARK_TEXT = '盘古大仙洞府'
+COVER_WATERMARK_FONT = os.environ.get(
+    'COVER_WATERMARK_FONT', '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+)
+COVER_PROCESSING_WORKERS = 2
+# 为真时在保存后同步处理(测试用)
+COVER_PROCESSING_SYNC = False
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
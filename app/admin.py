@@ -6,6 +6,9 @@ from django.http import HttpResponseRedirect
 from django.shortcuts import render
 from markdownx.widgets import MarkdownxWidget
 from .models import Article, Tag
+from . import search
+from .caching import notify_articles_changed
+from django.db.models import Count
 from django.utils import timezone
 import logging
 
@@ -22,9 +25,14 @@ class TagAdmin(admin.ModelAdmin):
     change_list_template = "admin/pink_tag_list.html"
     enable_nav_sidebar = False
     
+    def get_queryset(self, request):
+        # 文章数随列表一次性聚合，避免逐行 COUNT
+        return super().get_queryset(request).annotate(article_total=Count("articles"))
+
     def article_count(self, obj):
-        return obj.article_set.count()
+        return obj.article_total
     article_count.short_description = "文章数量"
+    article_count.admin_order_field = "article_total"
 
 
 @admin.register(Article)
@@ -115,13 +123,26 @@ class ArticleAdmin(admin.ModelAdmin):
 
     cover_thumb.short_description = "预览图"
 
+    def get_search_results(self, request, queryset, search_term):
+        """后台搜索走 FTS5 索引(含隐藏文章)，避免对正文做 LIKE 全表扫描"""
+        match = search.build_match_query(search_term) if search.is_available() else None
+        if match is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=search.matching_ids(match)), False
+
     @admin.action(description="隐藏所选文章")
     def make_hidden(self, request, queryset):
-        queryset.update(is_hidden=True)
+        self._set_hidden(queryset, True)
 
     @admin.action(description="显示所选文章")
     def make_visible(self, request, queryset):
-        queryset.update(is_hidden=False)
+        self._set_hidden(queryset, False)
+
+    def _set_hidden(self, queryset, hidden):
+        # update() 不触发信号，需手动刷新 updated_at、内容版本与整页缓存
+        article_ids = list(queryset.values_list("pk", flat=True))
+        queryset.update(is_hidden=hidden, updated_at=timezone.now())
+        notify_articles_changed(article_ids)
 
     def save_model(self, request, obj, form, change):
         # 直接保存，不做任何验证
@@ -3,79 +3,138 @@ API视图模块
 为Vue前端提供JSON格式的数据接口
 """
 
-from django.http import JsonResponse, HttpResponseNotAllowed
+from asgiref.sync import iscoroutinefunction
+from django.http import JsonResponse, HttpResponseNotAllowed, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from django.core import serializers
+from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.conf import settings
 from functools import wraps
 import json
 import base64
 import re
+from .caching import CachedJsonResponse, api_list_cache, article_conditional, site_conditional
 from .models import Article, Tag
+from .pagination import CursorPage, InvalidCursor, paginate_by_cursor
+from .rendering import html_to_text
+from . import search, serializers
+
+
+def _add_cors_headers(response):
+    if isinstance(response, (JsonResponse, HttpResponseNotModified)):
+        response['Access-Control-Allow-Origin'] = '*'
+        response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
+        response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+    return response
 
 
 def cors_headers(view_func):
-    """添加CORS响应头的装饰器"""
+    """添加CORS响应头的装饰器(同步、异步视图均可)"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            return _add_cors_headers(await view_func(request, *args, **kwargs))
+        return async_wrapper
+
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        response = view_func(request, *args, **kwargs)
-        if isinstance(response, JsonResponse):
-            response['Access-Control-Allow-Origin'] = '*'
-            response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-            response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-        return response
+        return _add_cors_headers(view_func(request, *args, **kwargs))
     return wrapper
 
 
+def _media_url(request):
+    """在线接口中的文件地址：绝对 URL"""
+    return lambda name: request.build_absolute_uri(default_storage.url(name))
+
+
+def _article_list_params(request):
+    """
+    解析文章列表参数：(标签名, 游标, 页码)
+    游标为 None 时按页码分页；页码不是整数时按第一页处理，与 Paginator.get_page 一致
+    """
+    try:
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        page = 1
+    return request.GET.get("tag"), request.GET.get("cursor"), page
+
+
+def _article_list_cache_parts(request) -> tuple:
+    """列表缓存键：(主机, 标签, 页码, 游标)，内容版本由 ResponseCache 加入"""
+    return request.get_host(), request.GET.get("tag", ""), request.GET.get("page", ""), request.GET.get("cursor")
+
+
+def _invalid_cursor_response():
+    return JsonResponse({"ok": False, "msg": "无效的分页游标"}, status=400)
+
+
+def _article_list_json(request, page_obj, tags):
+    """由查询结果组装文章列表响应，page_obj 为 CursorPage 或 Paginator 的 Page"""
+    if isinstance(page_obj, CursorPage):
+        pagination = serializers.cursor_pagination(page_obj)
+    else:
+        pagination = serializers.page_pagination(page_obj)
+    return JsonResponse(serializers.article_list_payload(
+        page_obj.object_list, tags, pagination, _media_url(request),
+    ))
+
+
+def _cacheable_content(response):
+    """只缓存成功响应"""
+    return response.content if response.status_code == 200 else None
+
+
+def _cached_list_response(content, cached, computed):
+    """缓存命中时由缓存内容重建响应，否则直接返回刚构造的响应"""
+    response = computed.get("response") or CachedJsonResponse(content)
+    response["X-Cache"] = "HIT" if cached else "MISS"
+    return response
+
+
+def _build_article_list_response(request):
+    """构造文章列表 JSON 响应(缓存未命中时调用)"""
+    tag_name, cursor, page = _article_list_params(request)
+    qs = Article.objects.for_listing()
+    if tag_name:
+        tag = get_object_or_404(Tag, name=tag_name)
+        qs = qs.filter(tags=tag)
+    if cursor is not None:
+        try:
+            page_obj = paginate_by_cursor(qs, cursor, 10)
+        except InvalidCursor:
+            return _invalid_cursor_response()
+    else:
+        page_obj = Paginator(qs, 10).get_page(page)
+    return _article_list_json(request, page_obj, Tag.objects.all())
+
+
 @cors_headers
 @csrf_exempt
 @require_http_methods(["GET", "OPTIONS"])  # 🔒 安全：只允许 GET
+@site_conditional
 def api_article_list(request):
+    """
+    文章列表接口
+    默认按 page 页码分页；传入 cursor 参数(第一页传空串)时改用游标分页，
+    响应中的 next_cursor 原样回传即可获取下一页，适合无限滚动
+    """
     if request.method == "OPTIONS":
         return JsonResponse({}, status=200)
     try:
         if request.method == "GET":
-            tag_name = request.GET.get("tag")
-            page = int(request.GET.get("page", 1))
-            qs = Article.objects.filter(is_hidden=False).order_by("-published_at")
-            if tag_name:
-                tag = get_object_or_404(Tag, name=tag_name)
-                qs = qs.filter(tags=tag)
-            paginator = Paginator(qs, 10)
-            page_obj = paginator.get_page(page)
-            articles = []
-            for article in page_obj.object_list:
-                cover_url = ""
-                if article.cover:
-                    cover_url = request.build_absolute_uri(article.cover.url) if hasattr(request, 'build_absolute_uri') else article.cover.url
-                articles.append({
-                    "id": article.id,
-                    "title": article.title,
-                    "cover": cover_url,
-                    "summary": article.content_md[:200] + "..." if len(article.content_md) > 200 else article.content_md,
-                    "published_at": article.published_at.strftime("%Y-%m-%d %H:%M"),
-                    "tags": [{"id": tag.id, "name": tag.name} for tag in article.tags.all()]
-                })
-            all_tags = Tag.objects.all()
-            tags_data = [{"id": tag.id, "name": tag.name} for tag in all_tags]
-            return JsonResponse({
-                "ok": True,
-                "data": {
-                    "articles": articles,
-                    "tags": tags_data,
-                    "pagination": {
-                        "current_page": page_obj.number,
-                        "total_pages": page_obj.paginator.num_pages,
-                        "has_next": page_obj.has_next(),
-                        "has_previous": page_obj.has_previous(),
-                        "total_count": paginator.count
-                    }
-                }
-            })
+            # 按 (主机, 标签, 页码, 游标, 内容版本) 缓存序列化结果，只缓存成功响应
+            key = api_list_cache.make_key(*_article_list_cache_parts(request))
+            computed = {}
+
+            def compute():
+                computed["response"] = response = _build_article_list_response(request)
+                return _cacheable_content(response)
+
+            content, cached = api_list_cache.get_or_compute(key, compute)
+            return _cached_list_response(content, cached, computed)
         else:
             try:
                 body = json.loads(request.body.decode() or "{}")
@@ -128,9 +187,80 @@ def api_article_list(request):
         return JsonResponse({"ok": False, "msg": f"文章接口错误: {str(e)}"}, status=500)
 
 
+class BatchRequestError(ValueError):
+    """批量接口参数错误，消息直接返回给客户端"""
+
+
+def _parse_batch_request(request) -> tuple:
+    """解析 ids(逗号分隔，去重后保持顺序) 与 fields(逗号分隔，缺省为详情接口的字段)"""
+    raw_ids = [part.strip() for part in (request.GET.get("ids") or "").split(",") if part.strip()]
+    if not raw_ids:
+        raise BatchRequestError("ids 不能为空")
+    ids = []
+    for part in raw_ids:
+        if not part.isdigit():
+            raise BatchRequestError(f"无效的文章 id: {part}")
+        if int(part) not in ids:
+            ids.append(int(part))
+    limit = getattr(settings, "API_BATCH_MAX_IDS", 50)
+    if len(ids) > limit:
+        raise BatchRequestError(f"一次最多获取 {limit} 篇文章")
+
+    fields = request.GET.get("fields")
+    if not fields:
+        return ids, set(serializers.DEFAULT_BATCH_FIELDS)
+    fields = {name.strip() for name in fields.split(",") if name.strip()} | {"id"}
+    unknown = fields - set(serializers.BATCH_FIELDS)
+    if unknown:
+        raise BatchRequestError(f"未知字段: {', '.join(sorted(unknown))}")
+    return ids, fields
+
+
+def _batch_queryset(ids, fields):
+    """一条查询取出所有可见文章，只读所需的列；需要标签时再用一条查询预取"""
+    columns = {column for name in fields for column in serializers.BATCH_FIELD_COLUMNS.get(name, ())}
+    qs = Article.objects.visible().filter(pk__in=ids).only(*columns)
+    if "tags" in fields:
+        qs = qs.prefetch_related("tags")
+    return qs
+
+
+def _batch_response(request, ids, fields, articles):
+    """按请求的顺序输出，不存在或不可见的 id 放入 missing"""
+    by_id = {article.pk: article for article in articles}
+    return JsonResponse(serializers.article_batch_payload(
+        [by_id[pk] for pk in ids if pk in by_id],
+        [pk for pk in ids if pk not in by_id],
+        fields,
+        _media_url(request),
+    ))
+
+
+@cors_headers
+@csrf_exempt
+@require_http_methods(["GET", "OPTIONS"])
+@site_conditional
+def api_article_batch(request):
+    """
+    批量获取文章：ids=1,2,3 按请求顺序返回，fields=title,cover,... 只返回指定字段
+    一次请求代替逐篇调用详情接口，不存在或隐藏的文章列在 missing 中
+    """
+    if request.method == "OPTIONS":
+        return JsonResponse({}, status=200)
+    try:
+        ids, fields = _parse_batch_request(request)
+    except BatchRequestError as e:
+        return JsonResponse({"ok": False, "msg": str(e)}, status=400)
+    try:
+        return _batch_response(request, ids, fields, _batch_queryset(ids, fields))
+    except Exception as e:
+        return JsonResponse({"ok": False, "msg": f"批量文章接口错误: {str(e)}"}, status=500)
+
+
 @cors_headers
 @csrf_exempt
 @require_http_methods(["GET", "OPTIONS"])  # 🔒 安全：只允许 GET
+@article_conditional
 def api_article_detail(request, pk):
     if request.method == "OPTIONS":
         return JsonResponse({}, status=200)
@@ -139,34 +269,7 @@ def api_article_detail(request, pk):
         if request.method == "GET":
             if article.is_hidden:
                 return JsonResponse({"ok": False, "msg": "文章不可见"}, status=404)
-            comments = article.comments.filter(is_hidden=False)
-            comments_data = []
-            for comment in comments:
-                avatar_url = ""
-                if comment.avatar:
-                    avatar_url = request.build_absolute_uri(comment.avatar.url) if hasattr(request, 'build_absolute_uri') else comment.avatar.url
-                comments_data.append({
-                    "id": comment.id,
-                    "nickname": comment.nickname,
-                    "city": comment.city,
-                    "content": comment.content,
-                    "created_at": comment.created_at.strftime("%Y-%m-%d %H:%M"),
-                    "avatar": avatar_url
-                })
-            cover_url = ""
-            if article.cover:
-                cover_url = request.build_absolute_uri(article.cover.url) if hasattr(request, 'build_absolute_uri') else article.cover.url
-            article_data = {
-                "id": article.id,
-                "title": article.title,
-                "content_md": article.content_md,
-                "cover": cover_url,
-                "published_at": article.published_at.strftime("%Y-%m-%d %H:%M"),
-                "tags": [{"id": tag.id, "name": tag.name} for tag in article.tags.all()],
-                "allow_comment": article.allow_comment,
-                "comments": comments_data
-            }
-            return JsonResponse({"ok": True, "data": article_data})
+            return JsonResponse(serializers.article_detail_payload(article, _media_url(request)))
         elif request.method == "PUT":
             try:
                 body = json.loads(request.body.decode() or "{}")
@@ -231,18 +334,66 @@ def api_article_detail(request, pk):
 
 
 @cors_headers
-def api_about_info(request):
+@csrf_exempt
+@require_http_methods(["GET", "OPTIONS"])
+def api_search(request):
     """
-    API: 获取关于作者信息
+    API: 全文检索文章
+    参数 q 为检索词(空格分隔多个词，须同时命中)，page 为页码；
+    结果按相关度排序，标题与正文片段中的命中词以 <mark> 标出
     """
+    if request.method == "OPTIONS":
+        return JsonResponse({}, status=200)
     try:
-        from .views import AUTHOR_BIO
+        query = (request.GET.get("q") or "").strip()
+        if not query:
+            return JsonResponse({"ok": False, "msg": "检索词不能为空"}, status=400)
+        if not search.is_available():
+            return JsonResponse({"ok": False, "msg": "当前数据库不支持全文检索"}, status=503)
+        try:
+            page = int(request.GET.get("page", 1))
+        except ValueError:
+            page = 1
+        result = search.search(query, page=page, per_page=10)
+        media_url = _media_url(request)
+        results = []
+        for article in result["articles"]:
+            results.append({
+                "id": article.id,
+                "title": article.title,
+                "title_highlight": search.highlight(article.title, query),
+                "snippet": search.snippet(html_to_text(article.rendered_html), query),
+                **serializers.serialize_cover(article, media_url),
+                "published_at": article.published_at.strftime("%Y-%m-%d %H:%M"),
+                "tags": [serializers.serialize_tag(tag) for tag in article.tags.all()],
+                "score": round(-result["scores"][article.id], 4),
+            })
         return JsonResponse({
             "ok": True,
             "data": {
-                "bio": AUTHOR_BIO
+                "query": query,
+                "results": results,
+                "pagination": {
+                    "current_page": result["page"],
+                    "total_pages": result["total_pages"],
+                    "has_next": result["page"] < result["total_pages"],
+                    "has_previous": result["page"] > 1,
+                    "total_count": result["total_count"]
+                }
             }
         })
+    except Exception as e:
+        return JsonResponse({"ok": False, "msg": f"检索接口错误: {str(e)}"}, status=500)
+
+
+@cors_headers
+def api_about_info(request):
+    """
+    API: 获取关于作者信息
+    """
+    try:
+        from .views import AUTHOR_BIO
+        return JsonResponse(serializers.about_payload(AUTHOR_BIO))
     except Exception as e:
         return JsonResponse({
             "ok": False,
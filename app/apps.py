@@ -6,3 +6,10 @@ class AppConfig(AppConfig):
     name = 'app'
     verbose_name = '盘古大仙洞府'
 
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks, signals  # noqa: F401  注册系统检查与模型信号
+        from .instrumentation import install_db_wrapper
+
+        connection_created.connect(install_db_wrapper, dispatch_uid='app.instrumentation.db_wrapper')
@@ -0,0 +1,131 @@
+"""
+异步 API 视图
+文章列表、文章详情、批量获取与关于接口的异步版本，URL、响应结构、缓存与条件请求与 app/api_views.py 一致；
+ASGI 入口(RunProject/asgi.py)使用下面的 ASGIHandler，按 URL 名称把这几个同步视图换成异步版本，
+WSGI 入口不受影响
+
+Django 的异步 ORM 在同一个线程中依次执行查询，因此各查询按顺序 await；
+等待期间事件循环可以处理其他请求
+"""
+
+from django.core.handlers.asgi import ASGIHandler as DjangoASGIHandler
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import serializers
+from .api_views import (
+    BatchRequestError, _article_list_cache_parts, _article_list_json, _article_list_params, _batch_queryset,
+    _batch_response, _cacheable_content, _cached_list_response, _invalid_cursor_response, _media_url,
+    _parse_batch_request, cors_headers,
+)
+from .caching import api_list_cache, article_conditional, site_conditional
+from .models import Article, Tag
+from .pagination import InvalidCursor, aget_page, apaginate_by_cursor
+
+
+async def _all_tags():
+    return [tag async for tag in Tag.objects.all()]
+
+
+async def _build_article_list_response(request):
+    """构造文章列表 JSON 响应(缓存未命中时调用)"""
+    tag_name, cursor, page = _article_list_params(request)
+    qs = Article.objects.for_listing()
+    if tag_name:
+        tag = await aget_object_or_404(Tag, name=tag_name)
+        qs = qs.filter(tags=tag)
+    if cursor is not None:
+        try:
+            page_obj = await apaginate_by_cursor(qs, cursor, 10)
+        except InvalidCursor:
+            return _invalid_cursor_response()
+    else:
+        page_obj = await aget_page(qs, page, 10)
+    return _article_list_json(request, page_obj, await _all_tags())
+
+
+@cors_headers
+@csrf_exempt
+@require_http_methods(["GET", "OPTIONS"])
+@site_conditional
+async def api_article_list(request):
+    """文章列表接口(异步版本)"""
+    if request.method == "OPTIONS":
+        return JsonResponse({}, status=200)
+    try:
+        key = await api_list_cache.amake_key(*_article_list_cache_parts(request))
+        computed = {}
+
+        async def compute():
+            computed["response"] = response = await _build_article_list_response(request)
+            return _cacheable_content(response)
+
+        content, cached = await api_list_cache.aget_or_compute(key, compute)
+        return _cached_list_response(content, cached, computed)
+    except Exception as e:
+        return JsonResponse({"ok": False, "msg": f"文章接口错误: {str(e)}"}, status=500)
+
+
+@cors_headers
+@csrf_exempt
+@require_http_methods(["GET", "OPTIONS"])
+@article_conditional
+async def api_article_detail(request, pk):
+    """文章详情接口(异步版本)"""
+    if request.method == "OPTIONS":
+        return JsonResponse({}, status=200)
+    try:
+        article = await aget_object_or_404(Article.objects.prefetch_related("tags"), pk=pk)
+        if article.is_hidden:
+            return JsonResponse({"ok": False, "msg": "文章不可见"}, status=404)
+        return JsonResponse(serializers.article_detail_payload(article, _media_url(request)))
+    except Exception as e:
+        return JsonResponse({"ok": False, "msg": f"文章详情接口错误: {str(e)}"}, status=500)
+
+
+@cors_headers
+@csrf_exempt
+@require_http_methods(["GET", "OPTIONS"])
+@site_conditional
+async def api_article_batch(request):
+    """批量获取文章接口(异步版本)"""
+    if request.method == "OPTIONS":
+        return JsonResponse({}, status=200)
+    try:
+        ids, fields = _parse_batch_request(request)
+    except BatchRequestError as e:
+        return JsonResponse({"ok": False, "msg": str(e)}, status=400)
+    try:
+        articles = [article async for article in _batch_queryset(ids, fields)]
+        return _batch_response(request, ids, fields, articles)
+    except Exception as e:
+        return JsonResponse({"ok": False, "msg": f"批量文章接口错误: {str(e)}"}, status=500)
+
+
+@cors_headers
+async def api_about_info(request):
+    """关于作者接口(异步版本)"""
+    from .views import AUTHOR_BIO
+    return JsonResponse(serializers.about_payload(AUTHOR_BIO))
+
+
+# URL 名称 -> 异步视图
+ASYNC_VIEWS = {
+    "api_article_list": api_article_list,
+    "api_article_detail": api_article_detail,
+    "api_article_batch": api_article_batch,
+    "api_about_info": api_about_info,
+}
+
+
+class ASGIHandler(DjangoASGIHandler):
+    """解析 URL 后把 ASYNC_VIEWS 中列出的视图换成异步版本，其余视图(含 URL 名称、参数)不变"""
+
+    def resolve_request(self, request):
+        match = super().resolve_request(request)
+        view = ASYNC_VIEWS.get(match.view_name)
+        if view is not None:
+            match.func = view
+        return match
@@ -0,0 +1,54 @@
+"""
+性能基准
+corpus.py 生成可配置规模的合成语料(文章、标签、Markdown 正文、封面)，
+scenarios.py 定义各热点路径的计时场景并汇总延迟分位数、查询数与内存；
+对应管理命令 seed_benchmark_corpus / run_benchmarks
+
+基准使用独立的 SQLite 文件与 media 目录(默认 .cache/benchmark.sqlite3 及同名 .media/)，
+不会改动开发数据库与仓库中的 media/
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings
+
+DEFAULT_DATABASE = Path(settings.BASE_DIR) / '.cache' / 'benchmark.sqlite3'
+
+
+def media_root_for(database: Path) -> Path:
+    return database.with_name(database.name + '.media')
+
+
+def meta_path_for(database: Path) -> Path:
+    """语料参数与统计，写在数据库旁边，随结果一起输出"""
+    return database.with_name(database.name + '.json')
+
+
+@contextmanager
+def benchmark_environment(database: Path):
+    """
+    把默认连接切换到基准数据库，media 指向基准目录，封面同步处理，关闭 DEBUG(避免记录每条 SQL)
+    """
+    database = Path(database)
+    database.parent.mkdir(parents=True, exist_ok=True)
+    media_root = media_root_for(database)
+    media_root.mkdir(parents=True, exist_ok=True)
+    original = connection.settings_dict['NAME']
+    connection.close()
+    connection.settings_dict['NAME'] = str(database)
+    try:
+        with override_settings(MEDIA_ROOT=str(media_root), DEBUG=False, COVER_PROCESSING_SYNC=True):
+            yield
+    finally:
+        connection.close()
+        connection.settings_dict['NAME'] = original
+
+
+def remove_database(database: Path):
+    for path in (Path(database), meta_path_for(Path(database))):
+        if path.exists():
+            os.unlink(path)
@@ -0,0 +1,178 @@
+"""
+合成语料
+按给定随机种子生成，参数相同则内容相同，便于不同提交之间对比：
+- 文章：中英混排段落、标题、列表、引用、代码块与表格，正文长度围绕 markdown_size 波动
+- 标签：每篇文章挂 tags_per_article 个，标签热度按 Zipf 分布(少数标签覆盖大多数文章)
+- 封面：前 covers 篇文章带封面，经完整的水印与衍生图流程处理
+- 约 3% 的文章隐藏，用于覆盖可见性过滤
+"""
+
+import io
+import random
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from app import search
+from app.images import process_cover
+from app.models import Article, Tag
+
+HIDDEN_RATIO = 0.03
+BATCH_SIZE = 500
+
+_CJK = '的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理'
+_WORDS = (
+    'Django Python Android Binder kernel cache query index template render markdown bleach '
+    'request response latency throughput memory thread process async await sqlite postgres '
+    'build static asset fingerprint sitemap search shard page cursor'
+).split()
+_LANGS = ('python', 'javascript', 'bash', 'sql', 'kotlin')
+
+
+def _sentence(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(3, 7)):
+        if rng.random() < 0.7:
+            parts.append(''.join(rng.choice(_CJK) for _ in range(rng.randint(4, 12))))
+        else:
+            word = rng.choice(_WORDS)
+            parts.append(f'`{word}`' if rng.random() < 0.2 else word)
+    return ' '.join(parts) + '。'
+
+
+def _paragraph(rng: random.Random) -> str:
+    text = ''.join(_sentence(rng) for _ in range(rng.randint(2, 5)))
+    if rng.random() < 0.2:
+        text += f' [参考链接](https://example.com/{rng.choice(_WORDS).lower()})'
+    return text
+
+
+def _code_block(rng: random.Random) -> str:
+    lang = rng.choice(_LANGS)
+    lines = [f'{rng.choice(_WORDS).lower()}_{i} = compute("{rng.choice(_WORDS)}", {rng.randint(1, 999)})'
+             for i in range(rng.randint(4, 16))]
+    return f'```{lang}\n' + '\n'.join(lines) + '\n```'
+
+
+def _table(rng: random.Random) -> str:
+    cols = rng.randint(3, 5)
+    header = '| ' + ' | '.join(rng.choice(_WORDS) for _ in range(cols)) + ' |'
+    rows = [
+        '| ' + ' | '.join(str(rng.randint(0, 10000)) for _ in range(cols)) + ' |'
+        for _ in range(rng.randint(3, 8))
+    ]
+    return '\n'.join([header, '|' + ' --- |' * cols, *rows])
+
+
+def _list(rng: random.Random) -> str:
+    return '\n'.join(f'- {_sentence(rng)}' for _ in range(rng.randint(3, 6)))
+
+
+def make_markdown(rng: random.Random, size: int) -> str:
+    """生成约 size 个字符的 Markdown 正文(±50%)"""
+    target = max(200, int(size * rng.uniform(0.5, 1.5)))
+    blocks = []
+    length = 0
+    section = 1
+    while length < target:
+        roll = rng.random()
+        if roll < 0.12:
+            block = f'## {section}. ' + ''.join(rng.choice(_CJK) for _ in range(rng.randint(4, 10)))
+            section += 1
+        elif roll < 0.25:
+            block = _code_block(rng)
+        elif roll < 0.32:
+            block = _table(rng)
+        elif roll < 0.40:
+            block = _list(rng)
+        elif roll < 0.44:
+            block = '> ' + _sentence(rng)
+        else:
+            block = _paragraph(rng)
+        blocks.append(block)
+        length += len(block) + 2
+    return '\n\n'.join(blocks)
+
+
+def _cover_image(rng: random.Random, index: int) -> bytes:
+    start = tuple(rng.randint(0, 255) for _ in range(3))
+    end = tuple(rng.randint(0, 255) for _ in range(3))
+    image = Image.new('RGB', (1200, 630), start)
+    draw = ImageDraw.Draw(image)
+    for x in range(0, 1200, 8):
+        t = x / 1200
+        draw.rectangle([x, 0, x + 8, 630], fill=tuple(int(a + (b - a) * t) for a, b in zip(start, end)))
+    draw.text((60, 280), f'benchmark cover {index}', fill=(255, 255, 255))
+    buf = io.BytesIO()
+    image.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+def _zipf_weights(count: int) -> list:
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def seed_corpus(articles: int, tags: int, tags_per_article: int, markdown_size: int, covers: int,
+                seed: int = 1, log=None) -> dict:
+    """在当前(空的)数据库中生成语料，返回统计信息"""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+
+    tag_objs = Tag.objects.bulk_create(
+        [Tag(name=f'{rng.choice(_WORDS)}-{i}' if i % 3 == 0 else f'标签{i}') for i in range(tags)]
+    )
+    weights = _zipf_weights(len(tag_objs))
+    tags_per_article = min(tags_per_article, len(tag_objs))
+
+    now = timezone.now()
+    total_chars = 0
+    created = 0
+    Through = Article.tags.through
+    for start in range(0, articles, BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + BATCH_SIZE, articles)):
+            article = Article(
+                title=f'{"".join(rng.choice(_CJK) for _ in range(rng.randint(6, 16)))} {rng.choice(_WORDS)} #{i}',
+                content_md=make_markdown(rng, markdown_size),
+                # 约每 6 小时一篇，保证发布时间各不相同
+                published_at=now - timezone.timedelta(hours=6 * i, minutes=rng.randint(0, 300)),
+                is_hidden=rng.random() < HIDDEN_RATIO,
+            )
+            article.refresh_rendered_fields()
+            total_chars += len(article.content_md)
+            batch.append(article)
+        batch = Article.objects.bulk_create(batch)
+        links = []
+        for article in batch:
+            chosen = set()
+            while len(chosen) < tags_per_article:
+                chosen.add(rng.choices(range(len(tag_objs)), weights)[0])
+            links.extend(Through(article_id=article.pk, tag_id=tag_objs[n].pk) for n in sorted(chosen))
+        Through.objects.bulk_create(links)
+        created += len(batch)
+        log(f'  · 文章 {created}/{articles}')
+
+    # 封面走与后台上传相同的处理流程(保留原图、水印、衍生图)
+    cover_ids = list(Article.objects.order_by('pk').values_list('pk', flat=True)[:covers])
+    for index, pk in enumerate(cover_ids):
+        article = Article.objects.get(pk=pk)
+        article.cover.save(f'bench-{pk}.jpg', ContentFile(_cover_image(rng, index)), save=False)
+        Article.objects.filter(pk=pk).update(cover=article.cover.name)
+        process_cover(pk)
+    if cover_ids:
+        log(f'  · 封面 {len(cover_ids)} 张')
+
+    if search.is_available():
+        search.rebuild_index(Article.objects.only('pk', 'title', 'content_md').iterator())
+
+    return {
+        'articles': articles,
+        'visible_articles': Article.objects.visible().count(),
+        'tags': len(tag_objs),
+        'tags_per_article': tags_per_article,
+        'markdown_size': markdown_size,
+        'average_markdown_chars': round(total_chars / articles) if articles else 0,
+        'covers': len(cover_ids),
+        'seed': seed,
+    }
@@ -0,0 +1,84 @@
+"""
+进程内的 WSGI / ASGI 请求驱动
+直接调用 Django 的 WSGIHandler 与 ASGI 入口(app/async_api_views.ASGIHandler)，
+走完整的中间件链、请求信号与连接管理，但不经过网络和外部服务器，便于比较两种入口本身的开销
+"""
+
+import asyncio
+import io
+import sys
+from urllib.parse import urlencode
+
+HOST = 'localhost'
+
+
+def wsgi_get(app, path: str, params: dict = None, headers: dict = None) -> tuple:
+    """返回 (状态码, 响应头字典, 响应体)"""
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': urlencode(params or {}),
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    started = []
+    result = app(environ, lambda status, response_headers, exc_info=None: started.append((status, response_headers)))
+    try:
+        body = b''.join(result)
+    finally:
+        result.close()  # 触发 request_finished(关闭数据库连接等)
+    status, response_headers = started[0]
+    return int(status.split()[0]), dict(response_headers), body
+
+
+async def asgi_get(app, path: str, params: dict = None, headers: dict = None) -> tuple:
+    """返回 (状态码, 响应头字典, 响应体)"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': urlencode(params or {}).encode(),
+        'root_path': '',
+        'headers': [(b'host', HOST.encode())] + [
+            (name.lower().encode(), value.encode()) for name, value in (headers or {}).items()
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': (HOST, 80),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # 客户端一直保持连接，响应完成后 Django 会取消这个等待
+        await asyncio.Future()
+
+    response = {'body': []}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = {k.decode('latin-1'): v.decode('latin-1') for k, v in message['headers']}
+        elif message['type'] == 'http.response.body':
+            response['body'].append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return response['status'], response['headers'], b''.join(response['body'])
@@ -0,0 +1,309 @@
+"""
+基准场景
+每个场景由 @scenario 注册：接收 Context，返回单次迭代要执行的函数(参数为迭代序号)
+run_scenario 负责预热、计时、统计查询数与分段耗时(app/instrumentation.py)，
+最后在 tracemalloc 下额外执行一次迭代测量内存峰值(不计入延迟)
+
+concurrency:* 场景每次迭代同时发出 Context.concurrency 个 API 请求，另外给出吞吐量(请求/秒)，
+用于比较同步视图 + WSGI 与异步视图 + ASGI；WSGI 场景的请求在线程池中处理，查询数与分段不计入结果。
+本地 SQLite 的查询几乎不等待 I/O，Context.db_latency 可给每条查询加上固定延迟，模拟网络上的数据库
+"""
+
+import asyncio
+import io
+import math
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from app import instrumentation, rendering
+from app.async_api_views import ASGIHandler
+from app.models import Article, Tag
+
+from .drivers import asgi_get, wsgi_get
+
+SCENARIOS = {}
+# concurrency:wsgi 的线程数，相当于多线程 WSGI 服务器(如 gunicorn gthread)单个进程的线程数
+WSGI_THREADS = 16
+
+
+class Scenario:
+    def __init__(self, name: str, factory, iterations: int, warmup: int, cold_cache: bool, concurrent: bool,
+                 description: str):
+        self.name = name
+        self.factory = factory
+        self.iterations = iterations
+        self.warmup = warmup
+        # 每次迭代前清空 Django cache(内容版本、响应缓存)，测量未命中缓存的路径
+        self.cold_cache = cold_cache
+        # 每次迭代并发执行 Context.concurrency 个请求，结果中给出吞吐量
+        self.concurrent = concurrent
+        self.description = description
+
+
+def scenario(name: str, iterations: int = 200, warmup: int = 10, cold_cache: bool = False, concurrent: bool = False):
+    def register(factory):
+        SCENARIOS[name] = Scenario(
+            name, factory, iterations, warmup, cold_cache, concurrent, (factory.__doc__ or '').strip(),
+        )
+        return factory
+    return register
+
+
+class Context:
+    """场景共享的数据：可见文章 id、标签名、列表页数、HTTP 客户端"""
+
+    def __init__(self, jobs: int = 1, concurrency: int = 64, db_latency: float = 0.0):
+        self.jobs = jobs
+        self.concurrency = concurrency
+        # 并发场景中每条查询额外等待的秒数
+        self.db_latency = db_latency
+        self.client = Client(HTTP_HOST='localhost')
+        self.article_ids = list(Article.objects.visible().order_by('pk').values_list('pk', flat=True))
+        self.tag_names = list(Tag.objects.order_by('pk').values_list('name', flat=True))
+        self.list_pages = max(1, math.ceil(len(self.article_ids) / 10))
+        self._tmp = []
+        self._cleanups = []
+
+    def get(self, path: str, params: dict = None):
+        response = self.client.get(path, params or {})
+        if response.status_code != 200:
+            raise RuntimeError(f'GET {path} {params or ""} -> {response.status_code}')
+        return response
+
+    def pick_article(self, i: int) -> int:
+        return self.article_ids[(i * 7919) % len(self.article_ids)]
+
+    def list_params(self, i: int) -> dict:
+        """大部分请求翻页，每三次中有一次按标签筛选(热门标签与冷门标签交替)"""
+        if i % 3 == 2 and self.tag_names:
+            return {'tag': self.tag_names[(i // 3) % len(self.tag_names)]}
+        return {'page': i % min(self.list_pages, 50) + 1}
+
+    def api_request(self, i: int) -> tuple:
+        """并发场景的第 i 个请求：列表、详情与关于接口按 3:2:1 混合"""
+        kind = i % 6
+        if kind < 3:
+            return '/api/articles/', self.list_params(i)
+        if kind < 5:
+            return f'/api/articles/{self.pick_article(i)}/', None
+        return '/api/about/', None
+
+    def temp_dir(self) -> Path:
+        path = Path(tempfile.mkdtemp(prefix='bench-'))
+        self._tmp.append(path)
+        return path
+
+    def on_cleanup(self, func):
+        self._cleanups.append(func)
+
+    def cleanup(self):
+        for func in self._cleanups:
+            func()
+        for path in self._tmp:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+@scenario('view:article_list')
+def view_article_list(ctx):
+    """文章列表页 /articles/ (翻页与标签筛选)"""
+    return lambda i: ctx.get('/articles/', ctx.list_params(i))
+
+
+@scenario('view:article_detail')
+def view_article_detail(ctx):
+    """文章详情页 /articles/<id>/"""
+    return lambda i: ctx.get(f'/articles/{ctx.pick_article(i)}/')
+
+
+@scenario('api:article_list', cold_cache=True)
+def api_article_list(ctx):
+    """列表接口 /api/articles/，每次迭代前清空缓存"""
+    return lambda i: ctx.get('/api/articles/', ctx.list_params(i))
+
+
+@scenario('api:article_list:cached')
+def api_article_list_cached(ctx):
+    """列表接口 /api/articles/，响应缓存命中(同一组参数循环请求)"""
+    return lambda i: ctx.get('/api/articles/', ctx.list_params(i % 6))
+
+
+@scenario('api:article_detail')
+def api_article_detail(ctx):
+    """详情接口 /api/articles/<id>/"""
+    return lambda i: ctx.get(f'/api/articles/{ctx.pick_article(i)}/')
+
+
+@scenario('render:markdown', iterations=100, warmup=3)
+def render_markdown(ctx):
+    """Markdown -> bleach 清洗流水线(不走渲染缓存)"""
+    sample = [ctx.pick_article(i) for i in range(min(50, len(ctx.article_ids)))]
+    sources = dict(Article.objects.filter(pk__in=sample).values_list('pk', 'content_md'))
+    texts = [sources[pk] for pk in sample]
+    return lambda i: rendering.render_markdown_uncached(texts[i % len(texts)])
+
+
+@scenario('static:generate_site', iterations=3, warmup=0)
+def static_full_build(ctx):
+    """generate_static_site --full (清空输出后全量构建)"""
+    output_dir = ctx.temp_dir() / 'docs'
+
+    def run(i):
+        call_command('generate_static_site', '--full', '--jobs', str(ctx.jobs), '--output', str(output_dir),
+                     stdout=io.StringIO())
+    return run
+
+
+@scenario('static:generate_site:incremental', iterations=5, warmup=1)
+def static_incremental_build(ctx):
+    """generate_static_site 增量构建，内容无变化(预热一次全量构建)"""
+    output_dir = ctx.temp_dir() / 'docs'
+
+    def run(i):
+        call_command('generate_static_site', '--jobs', str(ctx.jobs), '--output', str(output_dir), stdout=io.StringIO())
+    return run
+
+
+def _check(path: str, status: int):
+    if status != 200:
+        raise RuntimeError(f'GET {path} -> {status}')
+
+
+@contextmanager
+def _simulated_db_latency(ctx):
+    """期间新建的连接(每个请求在各自的线程中建立)每条查询额外等待 ctx.db_latency 秒"""
+    if not ctx.db_latency:
+        yield
+        return
+
+    def slow(execute, sql, params, many, context):
+        time.sleep(ctx.db_latency)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(slow)
+
+    connection_created.connect(install, weak=False, dispatch_uid='benchmark.db_latency')
+    try:
+        yield
+    finally:
+        connection_created.disconnect(dispatch_uid='benchmark.db_latency')
+
+
+@scenario('concurrency:wsgi', iterations=20, warmup=2, concurrent=True)
+def concurrency_wsgi(ctx):
+    """同步视图 + WSGIHandler，16 个线程处理每批并发的 API 请求(列表/详情/关于)"""
+    app = WSGIHandler()
+    pool = ThreadPoolExecutor(WSGI_THREADS)
+    ctx.on_cleanup(pool.shutdown)
+
+    def get(n):
+        path, params = ctx.api_request(n)
+        _check(path, wsgi_get(app, path, params)[0])
+
+    def run(i):
+        with _simulated_db_latency(ctx):
+            list(pool.map(get, range(i * ctx.concurrency, (i + 1) * ctx.concurrency)))
+    return run
+
+
+@scenario('concurrency:asgi', iterations=20, warmup=2, concurrent=True)
+def concurrency_asgi(ctx):
+    """异步视图 + ASGI 入口，每批并发的 API 请求(列表/详情/关于)在同一个事件循环中处理"""
+    app = ASGIHandler()
+
+    async def get(n):
+        path, params = ctx.api_request(n)
+        _check(path, (await asgi_get(app, path, params))[0])
+
+    async def burst(i):
+        await asyncio.gather(*(get(n) for n in range(i * ctx.concurrency, (i + 1) * ctx.concurrency)))
+
+    def run(i):
+        with _simulated_db_latency(ctx):
+            asyncio.run(burst(i))
+    return run
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """线性插值分位数，q 取 0~100"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(samples: list) -> dict:
+    """毫秒为单位的延迟统计"""
+    values = sorted(s * 1000 for s in samples)
+    return {
+        'min': values[0],
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': values[-1],
+        'mean': statistics.fmean(values),
+        'stdev': statistics.stdev(values) if len(values) > 1 else 0.0,
+    }
+
+
+def run_scenario(item: Scenario, ctx: Context, iterations: int = None, measure_memory: bool = True) -> dict:
+    iterations = iterations or item.iterations
+    step = item.factory(ctx)
+    queries = []
+    samples = []
+    segments = {}
+
+    def one(i):
+        if item.cold_cache:
+            cache.clear()
+        with connection.execute_wrapper(instrumentation.db_wrapper), instrumentation.collect() as timings:
+            start = time.perf_counter()
+            step(i)
+            elapsed = time.perf_counter() - start
+        return elapsed, timings
+
+    for i in range(item.warmup):
+        one(i)
+    for i in range(iterations):
+        elapsed, timings = one(item.warmup + i)
+        samples.append(elapsed)
+        queries.append(timings.counts.get('db', 0))
+        for name, seconds in timings.durations.items():
+            segments[name] = segments.get(name, 0.0) + seconds
+
+    result = {
+        'description': item.description,
+        'iterations': iterations,
+        'latency_ms': summarize(samples),
+        'queries': {'mean': statistics.fmean(queries), 'max': max(queries)},
+        # 每次迭代中各分段的平均耗时(主进程内)
+        'segments_ms': {name: seconds * 1000 / iterations for name, seconds in sorted(segments.items())},
+    }
+    if item.concurrent:
+        result['concurrency'] = ctx.concurrency
+        result['db_latency_ms'] = ctx.db_latency * 1000
+        result['throughput_rps'] = ctx.concurrency * iterations / sum(samples)
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            one(item.warmup + iterations)
+            result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
@@ -0,0 +1,360 @@
+"""
+内容版本、条件请求 (ETag / Last-Modified / 304) 与响应缓存
+
+content_version() 给出全站内容的廉价版本号：文章/标签的最大 updated_at 与数量，
+结果缓存在 Django cache 中，由 signals 在内容变化时刷新；
+使用进程内缓存(LocMemCache)部署多个进程时，其他进程最多滞后 CONTENT_VERSION_TTL 秒
+
+ResponseCache 以 "内容版本 + 请求参数" 为键缓存序列化后的响应字节，
+内容变化 -> 版本号变化 -> 旧键自然失效，无需逐个删除
+
+整页缓存(app/middleware.py)按失效范围(scope)精确失效：每个范围对应一个随机令牌，
+页面缓存键包含其所属范围的令牌，内容变化时只替换受影响范围的令牌
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .metrics import record_cache_lookup
+
+CONTENT_VERSION_KEY = "content:version"
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def compute_content_version() -> tuple:
+    """从数据库计算 (版本号, 最后修改时间)，共两条聚合查询"""
+    from .models import Article, Tag
+
+    articles = Article.objects.aggregate(latest=Max("updated_at"), total=Count("id"))
+    tags = Tag.objects.aggregate(latest=Max("updated_at"), total=Count("id"))
+    last_modified = max(articles["latest"] or _EPOCH, tags["latest"] or _EPOCH)
+    raw = f"{articles['latest']}|{articles['total']}|{tags['latest']}|{tags['total']}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16], last_modified
+
+
+def content_version() -> tuple:
+    """当前 (版本号, 最后修改时间)，优先读缓存"""
+    version = cache.get(CONTENT_VERSION_KEY)
+    if version is None:
+        version = compute_content_version()
+        cache.set(CONTENT_VERSION_KEY, version, getattr(settings, "CONTENT_VERSION_TTL", 60))
+    return version
+
+
+async def acontent_version() -> tuple:
+    """content_version 的异步版本"""
+    version = await cache.aget(CONTENT_VERSION_KEY)
+    if version is None:
+        version = await sync_to_async(compute_content_version)()
+        await cache.aset(CONTENT_VERSION_KEY, version, getattr(settings, "CONTENT_VERSION_TTL", 60))
+    return version
+
+
+def bump_content_version() -> tuple:
+    """内容变化后立即重新计算版本号"""
+    version = compute_content_version()
+    cache.set(CONTENT_VERSION_KEY, version, getattr(settings, "CONTENT_VERSION_TTL", 60))
+    return version
+
+
+def _site_etag(request, *args, **kwargs):
+    return content_version()[0]
+
+
+def _site_last_modified(request, *args, **kwargs):
+    return content_version()[1]
+
+
+def _article_meta(request, pk):
+    """单篇可见文章的 updated_at，同一请求内只查一次；文章不存在时返回 None"""
+    if not hasattr(request, "_article_updated_at"):
+        from .models import Article
+
+        request._article_updated_at = (
+            Article.objects.visible().filter(pk=pk).values_list("updated_at", flat=True).first()
+        )
+    return request._article_updated_at
+
+
+def _article_etag(request, pk, *args, **kwargs):
+    from .rendering import CONFIG_FINGERPRINT
+
+    updated_at = _article_meta(request, pk)
+    if updated_at is None:
+        return None
+    return f"{pk}-{updated_at.timestamp()}-{CONFIG_FINGERPRINT[:8]}"
+
+
+def _article_last_modified(request, pk, *args, **kwargs):
+    return _article_meta(request, pk)
+
+
+def _conditional(etag_func, last_modified_func):
+    """
+    在视图执行前比较 If-None-Match / If-Modified-Since，命中时直接返回 304，
+    不再查询正文、渲染 Markdown 或序列化；并要求客户端每次都回源校验
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            return _async_conditional(view_func, etag_func, last_modified_func)
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ("GET", "HEAD"):
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _async_conditional(view_func, etag_func, last_modified_func):
+    """
+    异步视图：ETag 与最后修改时间可能要查库，先在线程中一并算好，
+    再交给 condition 比较(它在事件循环中同步调用这两个函数)
+    """
+    def validators(request, *args, **kwargs):
+        return etag_func(request, *args, **kwargs), last_modified_func(request, *args, **kwargs)
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        etag, last_modified = await sync_to_async(validators)(request, *args, **kwargs)
+        conditional_view = condition(
+            etag_func=lambda *a, **kw: etag, last_modified_func=lambda *a, **kw: last_modified,
+        )(view_func)
+        response = await conditional_view(request, *args, **kwargs)
+        if request.method in ("GET", "HEAD"):
+            patch_cache_control(response, no_cache=True)
+        return response
+    return wrapper
+
+
+# 列表类页面：依赖全站内容版本
+site_conditional = _conditional(_site_etag, _site_last_modified)
+# 详情类页面：只依赖单篇文章(标签改名等会同步刷新文章的 updated_at)
+article_conditional = _conditional(_article_etag, _article_last_modified)
+
+
+class CachedJsonResponse(JsonResponse):
+    """直接使用已序列化的 JSON 字节构造响应，跳过 json.dumps"""
+
+    def __init__(self, content: bytes, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        HttpResponse.__init__(self, content=content, **kwargs)
+
+
+class ResponseCache:
+    """
+    带防击穿的版本化响应缓存
+    同一进程内同一键的并发请求由分段锁串行化，跨进程由 cache.add 抢占计算锁(值为本次调用的令牌)，
+    未抢到锁的请求在分段锁外轮询等待结果，因此冷键在并发下只计算一次
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, prefix: str, timeout: int = 300, lock_timeout: int = 10, poll_interval: float = 0.05):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "waits": 0}
+
+    def make_key(self, *parts) -> str:
+        """键 = 前缀 + 内容版本 + 参数哈希"""
+        return self._key(content_version()[0], parts)
+
+    async def amake_key(self, *parts) -> str:
+        return self._key((await acontent_version())[0], parts)
+
+    def _key(self, version: str, parts) -> str:
+        raw = "|".join(str(p) for p in parts)
+        return f"{self.prefix}:{version}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    def get_or_compute(self, key: str, compute):
+        """
+        读缓存，未命中时调用 compute()；compute 返回 None 表示结果不可缓存(如错误响应)
+        返回 (值, 是否来自缓存)
+        """
+        value = cache.get(key)
+        if value is not None:
+            self._count("hits")
+            return value, True
+
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        with self._locks[hash(key) % self.LOCK_STRIPES]:
+            value = cache.get(key)
+            if value is not None:
+                self._count("waits")
+                return value, True
+            if cache.add(lock_key, token, self.lock_timeout):
+                return self._compute(key, compute, lock_key, token)
+
+        # 其他进程正在计算：在分段锁外等待，不阻塞落在同一分段的其他键
+        value = self._wait(key, lock_key)
+        if value is not None:
+            self._count("waits")
+            return value, True
+        # 等待超时或对方未写入结果：自行计算兜底，锁已释放或过期时重新抢占
+        owned = cache.add(lock_key, token, self.lock_timeout)
+        return self._compute(key, compute, lock_key, token if owned else None)
+
+    def _wait(self, key: str, lock_key: str):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            found = cache.get_many([key, lock_key])
+            if key in found:
+                return found[key]
+            if lock_key not in found:
+                return None
+        return None
+
+    def _compute(self, key: str, compute, lock_key: str, token):
+        """token 为本次调用持有的计算锁，None 表示没有持有"""
+        try:
+            self._count("misses")
+            value = compute()
+            if value is not None:
+                cache.set(key, value, self.timeout)
+        finally:
+            if token is not None:
+                self._release(lock_key, token)
+        return value, False
+
+    @staticmethod
+    def _release(lock_key: str, token: str):
+        # 只删除自己持有的锁：计算超过 lock_timeout 时锁可能已过期并被其他进程重新抢占
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+    async def aget_or_compute(self, key: str, compute):
+        """
+        get_or_compute 的异步版本，compute 为协程函数
+        不再使用进程内的分段锁(不能在事件循环中阻塞)，同一进程内的并发请求也由 cache.add 抢占计算锁
+        """
+        value = await cache.aget(key)
+        if value is not None:
+            self._count("hits")
+            return value, True
+
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        owned = await cache.aadd(lock_key, token, self.lock_timeout)
+        if not owned:
+            value = await self._await(key, lock_key)
+            if value is not None:
+                self._count("waits")
+                return value, True
+            owned = await cache.aadd(lock_key, token, self.lock_timeout)
+        try:
+            self._count("misses")
+            value = await compute()
+            if value is not None:
+                await cache.aset(key, value, self.timeout)
+        finally:
+            if owned and await cache.aget(lock_key) == token:
+                await cache.adelete(lock_key)
+        return value, False
+
+    async def _await(self, key: str, lock_key: str):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            found = await cache.aget_many([key, lock_key])
+            if key in found:
+                return found[key]
+            if lock_key not in found:
+                return None
+        return None
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["waits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["hits"] + stats["waits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+        record_cache_lookup(self.prefix, name != "misses")
+
+
+# api_article_list 的响应缓存
+api_list_cache = ResponseCache("api:articles", timeout=getattr(settings, "API_CACHE_TIMEOUT", 300))
+
+
+def response_cache_stats() -> dict:
+    """各响应缓存的命中统计，供监控使用"""
+    return {"api_article_list": api_list_cache.stats()}
+
+
+# ===== 整页缓存的失效范围 =====
+PAGE_SCOPE_KEY = "pagecache:scope:{}"
+LIST_SCOPE = "list"      # 全部文章列表页
+TAGS_SCOPE = "tags"      # 标签侧边栏，出现在所有列表页中
+STATIC_SCOPE = "static"  # 首页、关于页等不依赖数据库的页面
+
+
+def article_scope(pk) -> str:
+    return f"article:{pk}"
+
+
+def tag_scope(name: str) -> str:
+    # 标签名可能含空格或非 ASCII 字符，哈希后用作缓存键
+    return "tag:" + hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+
+
+def page_scope_tokens(scopes) -> list:
+    """读取各范围当前的令牌；令牌不存在(首次或被淘汰)时生成新令牌，旧缓存随之不可达"""
+    keys = [PAGE_SCOPE_KEY.format(s) for s in scopes]
+    found = cache.get_many(keys)
+    tokens = []
+    for key in keys:
+        token = found.get(key)
+        if token is None:
+            token = uuid.uuid4().hex
+            if not cache.add(key, token, None):
+                token = cache.get(key) or token
+        tokens.append(token)
+    return tokens
+
+
+def invalidate_page_scopes(scopes):
+    """替换指定范围的令牌，使这些范围下的整页缓存全部失效"""
+    cache.set_many({PAGE_SCOPE_KEY.format(s): uuid.uuid4().hex for s in set(scopes)}, None)
+
+
+def invalidate_article_pages(article_ids, tag_names=()):
+    """文章变化：其详情页、全部列表页以及所属标签的列表页"""
+    invalidate_page_scopes(
+        [LIST_SCOPE]
+        + [article_scope(pk) for pk in article_ids]
+        + [tag_scope(name) for name in tag_names]
+    )
+
+
+def notify_articles_changed(article_ids):
+    """绕过 save() 与信号直接 update 文章后调用：刷新内容版本并失效相关页面"""
+    from .models import Tag
+
+    tag_names = set(Tag.objects.filter(articles__in=article_ids).values_list("name", flat=True))
+    bump_content_version()
+    invalidate_article_pages(article_ids, tag_names)
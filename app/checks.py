@@ -0,0 +1,21 @@
+"""
+系统检查(manage.py check 以及 runserver / migrate 等命令启动时执行)
+"""
+
+from django.core.checks import Warning, register
+
+
+@register()
+def check_watermark_font(app_configs, **kwargs):
+    """水印字体画不出 COVER_WATERMARK_TEXT 时，新上传的封面会一直停在未加水印状态"""
+    from .images import watermark_font_problem
+
+    problem = watermark_font_problem()
+    if not problem:
+        return []
+    return [Warning(
+        f"{problem}，新上传的封面不会加水印",
+        hint="安装包含水印文字字形的字体，或用环境变量 COVER_WATERMARK_FONT 指定字体文件，"
+             "然后运行 python manage.py process_covers 补上水印",
+        id="app.W001",
+    )]
@@ -0,0 +1,356 @@
+"""
+封面图片处理
+1. 水印：上传的原图按内容哈希保存到 media/covers/_originals/，水印总是从原图重新绘制，
+   因此重复处理不会叠加；处理在后台线程池中进行，不阻塞 save()
+2. 衍生图：每个不同的封面(按文件内容哈希区分)只生成一次一组限宽的 WebP + JPEG，
+   存放在 media/covers/_variants/<哈希>/ 下，并写入 variants.json 描述文件；
+   模板、接口与静态构建读取描述文件输出 srcset，请求路径上从不生成图片
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from .metrics import image_processing
+
+logger = logging.getLogger(__name__)
+
+ORIGINALS_DIR = "covers/_originals"
+# 迁移 0008 给升级前已有封面写入的 cover_source_hash：文件已带旧版水印，
+# 首次处理(或 process_covers --adopt)时把当前文件记为原图，不重画
+LEGACY_SOURCE_HASH = "legacy"
+VARIANTS_DIR = "covers/_variants"
+DEFAULT_COVER_WIDTHS = (320, 640, 960, 1280)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# 衍生图描述的进程内缓存：哈希 -> 描述
+_variants_cache = {}
+_VARIANTS_CACHE_SIZE = 1024
+# 没有衍生图的哈希 -> 过期时刻(time.monotonic)，接口不必每次请求都读盘；
+# 衍生图可能由其他进程(process_covers)生成，所以只记住一小段时间
+_missing_variants = {}
+_MISSING_VARIANTS_TTL = 30
+
+
+def cover_widths() -> tuple:
+    return tuple(getattr(settings, "COVER_VARIANT_WIDTHS", DEFAULT_COVER_WIDTHS))
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _variants_root(cover_hash: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / VARIANTS_DIR / cover_hash
+
+
+def load_variants(cover_hash: str):
+    """
+    读取某个封面哈希的衍生图描述，不存在时返回 None
+    同一哈希对应的内容不会变化，结果可以放心缓存；不存在的结果只缓存 _MISSING_VARIANTS_TTL 秒
+    """
+    if not cover_hash:
+        return None
+    info = _variants_cache.get(cover_hash)
+    if info is None:
+        if _missing_variants.get(cover_hash, 0) > time.monotonic():
+            return None
+        try:
+            info = json.loads((_variants_root(cover_hash) / "variants.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            if len(_missing_variants) >= _VARIANTS_CACHE_SIZE:
+                _missing_variants.clear()
+            _missing_variants[cover_hash] = time.monotonic() + _MISSING_VARIANTS_TTL
+            return None
+        if len(_variants_cache) >= _VARIANTS_CACHE_SIZE:
+            _variants_cache.clear()
+        _variants_cache[cover_hash] = info
+    return info
+
+
+def _save_atomic(img: Image.Image, path: Path, **params):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=path.suffix)
+    os.close(fd)
+    try:
+        img.save(tmp, **params)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def generate_variants(source: Path, cover_hash: str) -> dict:
+    """按配置的宽度生成衍生图(不放大)，返回描述信息"""
+    root = _variants_root(cover_hash)
+    root.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as original:
+        img = ImageOps.exif_transpose(original).convert("RGB")
+    widths = sorted({w for w in cover_widths() if w < img.width} | {min(img.width, max(cover_widths()))})
+    variants = []
+    for width in widths:
+        height = max(1, round(img.height * width / img.width))
+        resized = img.resize((width, height), Image.LANCZOS) if width != img.width else img
+        _save_atomic(resized, root / f"w{width}.webp", format="WEBP", quality=WEBP_QUALITY, method=6)
+        _save_atomic(resized, root / f"w{width}.jpg", format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        variants.append({
+            "width": width,
+            "height": height,
+            "webp": f"{VARIANTS_DIR}/{cover_hash}/w{width}.webp",
+            "jpeg": f"{VARIANTS_DIR}/{cover_hash}/w{width}.jpg",
+        })
+    info = {"width": img.width, "height": img.height, "widths": list(cover_widths()), "variants": variants}
+    fd, tmp = tempfile.mkstemp(dir=root, prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, root / "variants.json")  # 描述文件最后写入，存在即代表衍生图完整
+    _missing_variants.pop(cover_hash, None)
+    return info
+
+
+def _variants_current(info) -> bool:
+    # 调整了 COVER_VARIANT_WIDTHS 时需要重新生成
+    return info is not None and info.get("widths") == list(cover_widths())
+
+
+def ensure_cover_variants(cover_name: str, known_hash: str = ""):
+    """
+    确保封面的衍生图存在，返回封面内容哈希；封面文件不存在时返回空串
+    相同内容的封面(重复上传)共用同一组衍生图
+    known_hash 为数据库中记录的封面哈希，其衍生图齐全时直接采用，不再读取整个封面文件计算哈希
+    """
+    if not cover_name:
+        return ""
+    source = Path(settings.MEDIA_ROOT) / cover_name
+    if not source.exists():
+        return ""
+    if known_hash and _variants_current(load_variants(known_hash)):
+        return known_hash
+    cover_hash = file_sha256(source)
+    info = load_variants(cover_hash)
+    if not _variants_current(info):
+        _variants_cache.pop(cover_hash, None)
+        with image_processing.time(step="variants"):
+            generate_variants(source, cover_hash)
+    return cover_hash
+
+
+def variant_srcsets(cover_hash: str, url_prefix: str):
+    """
+    生成 srcset 所需数据：{'webp': 'url 320w, ...', 'jpeg': ..., 'fallback': 最大 JPEG 地址, 'width', 'height'}
+    没有衍生图时返回 None
+    """
+    info = load_variants(cover_hash)
+    if not info or not info["variants"]:
+        return None
+    variants = info["variants"]
+    return {
+        "webp": ", ".join(f"{url_prefix}{v['webp']} {v['width']}w" for v in variants),
+        "jpeg": ", ".join(f"{url_prefix}{v['jpeg']} {v['width']}w" for v in variants),
+        "fallback": f"{url_prefix}{variants[-1]['jpeg']}",
+        "width": variants[-1]["width"],
+        "height": variants[-1]["height"],
+    }
+
+
+# 私用区字符，任何字体都不会收录，用它取得字体的缺字占位形状(.notdef，通常是空心方框)
+_TOFU_PROBE = "\U000F0000"
+
+
+def _font(size: int):
+    """COVER_WATERMARK_FONT 必须包含水印文字的字形；打不开时返回 None"""
+    try:
+        return ImageFont.truetype(settings.COVER_WATERMARK_FONT, size)
+    except OSError:
+        return None
+
+
+def _glyph(font, char: str) -> tuple:
+    left, top, right, bottom = font.getbbox(char)
+    img = Image.new("L", (max(1, right - left), max(1, bottom - top)))
+    ImageDraw.Draw(img).text((-left, -top), char, font=font, fill=255)
+    return img.size, img.tobytes()
+
+
+def missing_glyphs(font, text: str) -> list:
+    """返回字体中没有字形的字符(画出来与缺字占位相同)"""
+    tofu = _glyph(font, _TOFU_PROBE)
+    return [char for char in dict.fromkeys(text) if not char.isspace() and _glyph(font, char) == tofu]
+
+
+def watermark_font_problem(size: int = 32) -> str:
+    """检查 COVER_WATERMARK_FONT 能否绘制水印文字，返回问题描述，没有问题时返回空串"""
+    font = _font(size)
+    if font is None:
+        return f"无法加载水印字体 {settings.COVER_WATERMARK_FONT}"
+    missing = missing_glyphs(font, getattr(settings, "COVER_WATERMARK_TEXT", "盘古大仙洞府"))
+    if missing:
+        return f"水印字体 {settings.COVER_WATERMARK_FONT} 缺少字形 {''.join(missing)}"
+    return ""
+
+
+def watermark(source: Path, dest: Path) -> bool:
+    """
+    从原图绘制右下角半透明水印并原子写入 dest，同一原图多次调用结果相同
+    字体不可用或缺少水印文字的字形时不写入(否则会烧进一排方框)，记录警告并返回 False
+    """
+    text = getattr(settings, "COVER_WATERMARK_TEXT", "盘古大仙洞府")
+    with Image.open(source) as original:
+        img = ImageOps.exif_transpose(original).convert("RGBA")
+    # 动态计算字号
+    font = _font(max(14, int(min(img.size) * 0.04)))
+    if font is None:
+        logger.warning("无法加载水印字体 %s，跳过水印: %s", settings.COVER_WATERMARK_FONT, dest.name)
+        return False
+    missing = missing_glyphs(font, text)
+    if missing:
+        logger.warning("水印字体 %s 缺少字形 %s，跳过水印: %s",
+                       settings.COVER_WATERMARK_FONT, "".join(missing), dest.name)
+        return False
+    text_layer = Image.new("RGBA", img.size, (255, 255, 255, 0))
+    draw = ImageDraw.Draw(text_layer)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    margin = int(min(img.size) * 0.02)
+    x = img.width - (right - left) - margin - left
+    y = img.height - (bottom - top) - margin - top
+    draw.text((x, y), text, font=font, fill=(255, 255, 255, 120))
+    _save_atomic(Image.alpha_composite(img, text_layer).convert("RGB"), dest)
+    return True
+
+
+def preserve_original(path: Path) -> tuple:
+    """把刚上传的封面按内容哈希复制到原图目录，返回 (哈希, 原图相对路径)"""
+    source_hash = file_sha256(path)
+    name = f"{ORIGINALS_DIR}/{source_hash}{path.suffix.lower()}"
+    target = Path(settings.MEDIA_ROOT) / name
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+        os.close(fd)
+        shutil.copyfile(path, tmp)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, target)
+    return source_hash, name
+
+
+def adopt_cover(article_id: int) -> bool:
+    """
+    认领升级前已有的封面(见 LEGACY_SOURCE_HASH)：当前文件作为原图保存并记录哈希，不重新绘制，
+    之后的 process_cover 只补衍生图，不会再叠一层水印
+    """
+    from .models import Article
+
+    article = Article.objects.filter(pk=article_id, cover_source_hash=LEGACY_SOURCE_HASH).only("pk", "cover").first()
+    if article is None or not article.cover:
+        return False
+    cover_path = Path(settings.MEDIA_ROOT) / article.cover.name
+    if not cover_path.exists():
+        return False
+    source_hash, original = preserve_original(cover_path)
+    return bool(Article.objects.filter(
+        pk=article.pk, cover=article.cover.name, cover_source_hash=LEGACY_SOURCE_HASH,
+    ).update(cover_source_hash=source_hash, cover_original=original))
+
+
+def process_cover(article_id: int, reprocess: bool = False) -> bool:
+    """
+    处理文章封面：保存原图、绘制水印、生成衍生图，返回是否有更新
+    cover_source_hash 非空表示当前封面已加过水印，除非 reprocess(按新的水印配置从原图重做)
+    只做衍生图补齐时也会走到这里，已处理的封面只检查衍生图
+    """
+    from .caching import notify_articles_changed
+    from .models import Article
+
+    article = Article.objects.filter(pk=article_id).only(
+        "pk", "cover", "cover_hash", "cover_source_hash", "cover_original",
+    ).first()
+    if article is None or not article.cover:
+        return False
+    media_root = Path(settings.MEDIA_ROOT)
+    cover_path = media_root / article.cover.name
+    if not cover_path.exists():
+        return False
+
+    fields = {}
+    redrawn = False
+    if article.cover_source_hash == LEGACY_SOURCE_HASH:
+        # 升级前已有的封面已带水印：当前文件记为原图，不重画
+        fields["cover_source_hash"], fields["cover_original"] = preserve_original(cover_path)
+    elif not article.cover_source_hash:
+        # 新上传的封面：当前文件就是原图。画上水印后才记为已处理，
+        # 字体不可用时封面保持待处理，装好字体后再次处理即可补上
+        source_hash, original = preserve_original(cover_path)
+        with image_processing.time(step="watermark"):
+            redrawn = watermark(media_root / original, cover_path)
+        if redrawn:
+            fields["cover_source_hash"], fields["cover_original"] = source_hash, original
+    elif reprocess:
+        original = media_root / article.cover_original
+        if article.cover_original and original.exists():
+            with image_processing.time(step="watermark"):
+                redrawn = watermark(original, cover_path)
+        else:
+            logger.warning("封面原图缺失，跳过重新处理: %s", article.cover.name)
+    # 没有重画时封面文件未变，沿用记录的哈希(静态构建每次都会检查全部封面)
+    cover_hash = ensure_cover_variants(article.cover.name, "" if redrawn else article.cover_hash)
+    if cover_hash != article.cover_hash:
+        fields["cover_hash"] = cover_hash
+    if not fields:
+        return False
+
+    # 处理期间封面被替换时放弃写回，新封面有自己的处理任务
+    updated = Article.objects.filter(pk=article.pk, cover=article.cover.name).update(
+        updated_at=timezone.now(), **fields,
+    )
+    if updated:
+        notify_articles_changed([article.pk])
+    return bool(updated)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run_in_background(article_id: int):
+    try:
+        process_cover(article_id)
+    except Exception:
+        logger.exception("处理封面失败: article=%s", article_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue_cover_processing(article_id: int):
+    """
+    提交封面处理任务；COVER_PROCESSING_SYNC 为真时(测试、管理命令)同步执行
+    应在事务提交后调用，否则后台线程可能读不到新封面
+    """
+    global _executor
+    if getattr(settings, "COVER_PROCESSING_SYNC", False):
+        process_cover(article_id)
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "COVER_PROCESSING_WORKERS", 2),
+                thread_name_prefix="cover",
+            )
+    _executor.submit(_run_in_background, article_id)
@@ -0,0 +1,130 @@
+"""
+耗时分段统计
+collect() 开启一次统计(一个页面的渲染、一次请求)，期间代码用 timed('分段名') 标记耗时，
+数据库查询由 db_wrapper(注册为 connection.execute_wrapper) 计入 'db' 分段并计数；
+每个新建的数据库连接都会装上 db_wrapper(见 AppConfig.ready)，异步视图在其他线程中执行的查询也能统计到
+分段按"自身耗时"统计：嵌套分段(如模板中触发的查询)从外层扣除，各分段之和不超过总耗时；
+collect() 可以嵌套(构建阶段 -> 页面)，内层结束时把各分段累加到外层
+
+统计对象保存在 contextvar 中，线程、asyncio 任务之间互不干扰；
+没有开启统计时 timed() 只多一次 contextvar 读取，可以常驻在渲染代码里；
+count() 只计次数不计耗时，用于缓存命中等事件
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager, nullcontext
+
+_current = contextvars.ContextVar('timings', default=None)
+
+
+class Timings:
+    """一次统计的结果：分段名 -> 自身耗时(秒) 与次数"""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        self.start = time.perf_counter()
+        self.total = 0.0
+        # 进行中的分段：[分段名, 开始时间, 子分段耗时]
+        self._stack = []
+
+    def enter(self, name: str):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, start, children = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self.add(name, elapsed - children)
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def add(self, name: str, seconds: float, count: int = 1):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    def count(self, name: str, n: int = 1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def finish(self):
+        self.total = time.perf_counter() - self.start
+
+    def as_dict(self) -> dict:
+        """{'total': 秒, 分段名: 秒, ..., 'other': 未标记的耗时, 'queries': 查询次数}"""
+        data = {'total': self.total}
+        data.update(self.durations)
+        data['other'] = max(0.0, self.total - sum(self.durations.values()))
+        data['queries'] = self.counts.get('db', 0)
+        return data
+
+
+@contextmanager
+def collect():
+    """开启一次统计，退出时 Timings.total 为总耗时"""
+    parent = _current.get()
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+        timings.finish()
+        if parent is not None:
+            for name, seconds in timings.durations.items():
+                parent.add(name, seconds, 0)
+            for name, n in timings.counts.items():
+                parent.count(name, n)
+            # 外层正处在某个分段中时，内层已计入的耗时从该分段扣除
+            if parent._stack:
+                parent._stack[-1][2] += sum(timings.durations.values())
+
+
+def current():
+    """当前上下文中的统计对象，未开启时为 None"""
+    return _current.get()
+
+
+@contextmanager
+def timed(name: str):
+    """把代码块的耗时计入当前统计的 name 分段"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    timings.enter(name)
+    try:
+        yield
+    finally:
+        timings.exit()
+
+
+def count(name: str, n: int = 1):
+    """在当前统计中记一次事件(如 'cache_hit')，不计耗时"""
+    timings = _current.get()
+    if timings is not None:
+        timings.count(name, n)
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper 钩子：查询耗时计入 'db' 分段；重复注册时只有最外层计数"""
+    timings = _current.get()
+    if timings is None or (timings._stack and timings._stack[-1][0] == 'db'):
+        return execute(sql, params, many, context)
+    timings.enter('db')
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.exit()
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    """connection_created 信号：给新连接常驻 db_wrapper，未开启统计时只多一次 contextvar 读取"""
+    if db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_wrapper)
+
+
+def track_queries(connection):
+    """在 connection 上注册 db_wrapper；外层已注册时不再重复(否则每条查询计两次)"""
+    if db_wrapper in connection.execute_wrappers:
+        return nullcontext()
+    return connection.execute_wrapper(db_wrapper)
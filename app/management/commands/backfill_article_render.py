@@ -0,0 +1,45 @@
+"""
+Django 管理命令: 回填文章的渲染派生字段
+
+使用方法:
+    python manage.py backfill_article_render          # 只处理内容或渲染配置有变化的文章
+    python manage.py backfill_article_render --force  # 全部重新渲染
+
+说明:
+    content_html / summary / word_count / reading_minutes / content_hash
+    平时由 Article.save() 维护；新增字段后、升级 Markdown 扩展或清洗白名单后
+    运行本命令补齐。使用 bulk_update 写回，不触发 save() 中的封面处理
+"""
+
+from django.core.management.base import BaseCommand
+
+from app.models import Article
+
+
+class Command(BaseCommand):
+    help = '回填文章的渲染 HTML、摘要、字数与内容哈希'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='忽略内容哈希，全部重新渲染')
+        parser.add_argument('--batch-size', type=int, default=200, help='每批写回的文章数 (默认 200)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = ('content_md',) + Article.RENDERED_FIELDS
+        batch = []
+        updated = 0
+        total = 0
+
+        for article in Article.objects.only('pk', *fields).order_by('pk').iterator(chunk_size=batch_size):
+            total += 1
+            if article.refresh_rendered_fields(force=options['force']):
+                batch.append(article)
+            if len(batch) >= batch_size:
+                Article.objects.bulk_update(batch, Article.RENDERED_FIELDS)
+                updated += len(batch)
+                batch = []
+        if batch:
+            Article.objects.bulk_update(batch, Article.RENDERED_FIELDS)
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ 已回填 {updated} 篇文章 (共检查 {total} 篇)'))
@@ -3,26 +3,63 @@ Django 管理命令: 生成静态站点到 docs/ 目录
 用于 GitHub Pages 部署
 
 使用方法:
-    python manage.py generate_static_site
+    python manage.py generate_static_site          # 增量构建
+    python manage.py generate_static_site --full   # 不沿用上次输出，全量重建
+    python manage.py generate_static_site --rollback  # 换回上一次构建的 docs/
+    python manage.py generate_static_site --jobs 4 # 4 个进程并行渲染页面
+    python manage.py generate_static_site --no-fingerprint  # 资源文件名不加内容哈希
+    python manage.py generate_static_site --profile  # 输出各阶段/各页面耗时报告 build-profile.json
 
 功能:
     1. 渲染所有页面为静态 HTML
     2. 收集静态资源 (CSS/JS/图片)
-    3. 复制 media 文件 (封面/头像)
-    4. 生成站点地图
-    5. 输出到 docs/ 目录供 GitHub Pages 使用
+    3. 同步可见文章引用的 media 文件 (封面/衍生图/正文图片)，优先硬链接，
+       文件名加内容哈希并改写页面中的引用
+    4. 生成站点地图 (sitemap index + 分片，lastmod 取自文章修改时间) 与站内检索索引
+       (浏览器端按需加载的分片倒排表)
+    5. 导出 Vue 前端使用的 JSON 接口数据 (api/)，结构与在线 API 一致
+    6. 为 HTML/CSS/JS/XML/JSON 等文本文件写入 .gz (安装 brotli 时另有 .br) 预压缩副本
+    7. 输出到 docs/ 目录供 GitHub Pages 使用
+
+静态 JSON 接口 (与 app/api_views.py 共用 app/serializers.py):
+    api/articles/page_N.json             文章列表      (/api/articles/?page=N)
+    api/articles/tag/<标签>/page_N.json  标签文章列表  (/api/articles/?tag=<标签>&page=N)
+    api/articles/<id>.json               文章详情      (/api/articles/<id>/)
+    api/about.json                       关于          (/api/about/)
+
+本地预览 (按 Accept-Encoding 返回预压缩副本):
+    python manage.py preview_static_site
+
+增量构建:
+    docs/.build-manifest.json 记录每个输出文件的输入哈希(文章字段、标签归属、
+    模板文件、静态文件内容)，输入未变化的文件不再重写，不再产出的文件会被删除
+
+原子发布:
+    新版本在 docs.staging/ 中构建(起点为 docs/ 的硬链接克隆)，全部完成后与 docs/ 原子交换，
+    构建中断或出错时 docs/ 保持原样；上一版保留为 docs.previous/，--rollback 可立即换回
+    构建期间的数据读取来自同一时刻的快照(见 app/static_build/snapshot.py)
 """
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.db.models import Max
 from django.utils import timezone
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import quote
+import json
+import multiprocessing
+import os
 import shutil
-import markdown as md
-import bleach
 
 from app.models import Article, Tag
+from app import rendering, serializers
+from app.images import load_variants, process_cover
+from app.views import AUTHOR_BIO
+from app.static_build import compress, fingerprint, pages, search_index, sitemap, snapshot, sync
+from app.static_build.profile import BuildProfiler
+from app.static_build.manifest import BuildManifest, MANIFEST_NAME, digest, file_digest, tree_digest
 
 
 class Command(BaseCommand):
@@ -31,144 +68,345 @@ class Command(BaseCommand):
     def __init__(self):
         super().__init__()
         self.output_dir = Path(settings.BASE_DIR) / 'docs'
-        self.author_bio = "这里是《盘古大仙洞府》——记录技术、思考与灵感的地方。"
+        self.author_bio = AUTHOR_BIO
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='忽略构建清单与上次输出，全量重建',
+        )
+        parser.add_argument(
+            '--output', '-o',
+            metavar='DIR',
+            help='输出目录 (默认 docs/)，暂存目录与上一版分别为同级的 <DIR>.staging、<DIR>.previous',
+        )
+        parser.add_argument(
+            '--rollback',
+            action='store_true',
+            help='不构建，把 docs/ 与上一版 docs.previous/ 互换',
+        )
+        parser.add_argument(
+            '--jobs', '-j',
+            type=int,
+            default=1,
+            help='并行渲染文章详情页与列表页的进程数，0 表示使用全部 CPU 核心 (默认 1，串行)',
+        )
+        parser.add_argument(
+            '--no-fingerprint',
+            action='store_true',
+            help='static/ 与 media/ 保持原文件名，不加内容哈希指纹',
+        )
+        parser.add_argument(
+            '--profile',
+            nargs='?',
+            const='build-profile.json',
+            metavar='FILE',
+            help='统计各阶段墙钟/CPU 时间、查询数、内存峰值与每个页面的分段耗时，写入 JSON 报告 (默认 build-profile.json)',
+        )
+        parser.add_argument(
+            '--profile-top',
+            type=int,
+            default=10,
+            metavar='N',
+            help='--profile 时在终端列出最慢的 N 个页面 (默认 10)',
+        )
 
     def handle(self, *args, **options):
+        if options['output']:
+            self.output_dir = Path(options['output']).resolve()
+        self.staging_dir = self.output_dir.with_name(f'{self.output_dir.name}.staging')
+        self.previous_dir = self.output_dir.with_name(f'{self.output_dir.name}.previous')
+        if options['rollback']:
+            return self.rollback()
+
         self.stdout.write(self.style.SUCCESS('开始生成静态站点...'))
 
-        # 清空并重建输出目录
-        if self.output_dir.exists():
-            shutil.rmtree(self.output_dir)
-        self.output_dir.mkdir(parents=True)
+        self.written = 0
+        self.skipped = 0
+        self.jobs = options['jobs'] or os.cpu_count() or 1
+        self.pending = []
+        self.fingerprint = getattr(settings, 'STATIC_BUILD_FINGERPRINT', True) and not options['no_fingerprint']
+        # 资源原名 -> 输出名(带指纹)，复制资源时填充，渲染页面时用于改写引用
+        self.assets = {}
+        # 资源文件优先 reflink/硬链接到 docs/，按方式计数
+        self.link_files = getattr(settings, 'STATIC_BUILD_LINK_FILES', True)
+        self.placed = {}
+        # 列表页与标签页 (文件名, 页面内容最后变化的时间)，生成列表时收集，写入 sitemap
+        self.sitemap_pages = []
+        self.started_at = timezone.now()
+        self.profiler = BuildProfiler(enabled=bool(options['profile']))
+
+        # 上次中断留下的半成品直接丢弃
+        if self.staging_dir.exists():
+            shutil.rmtree(self.staging_dir)
+        self.build_dir = self.staging_dir
+
+        # 没有可用清单时无法判断孤立文件，退化为全量重建
+        if options['full'] or not BuildManifest.load(self.output_dir / MANIFEST_NAME).exists:
+            self.stdout.write('  · 全量构建')
+            self.build_dir.mkdir(parents=True)
+            self.manifest = BuildManifest(self.build_dir / MANIFEST_NAME)
+        else:
+            self.stdout.write('  · 增量构建 (使用 docs/%s)' % MANIFEST_NAME)
+            sync.clone_tree(self.output_dir, self.build_dir)
+            self.manifest = BuildManifest.load(self.build_dir / MANIFEST_NAME)
+
+        try:
+            with self.profiler.run():
+                removed = self.build()
+        except BaseException:
+            shutil.rmtree(self.build_dir, ignore_errors=True)
+            self.stderr.write(self.style.ERROR(f'✗ 构建失败，{self.output_dir} 保持不变'))
+            raise
+        atomic = self.publish()
+
+        stats = rendering.cache_stats()
+        self.stdout.write(
+            f'  ✓ Markdown 渲染缓存: 内存命中 {stats["memory_hits"]}，磁盘命中 {stats["disk_hits"]}，'
+            f'未命中 {stats["misses"]} (主进程)'
+        )
+        self.stdout.write(f'  ✓ 写入 {self.written} 个文件，跳过 {self.skipped} 个未变化文件，删除 {removed} 个孤立文件')
+        if self.placed:
+            self.stdout.write('  ✓ 资源文件: ' + '，'.join(f'{method} {count} 个' for method, count in sorted(self.placed.items())))
+        self.stdout.write(self.style.SUCCESS(f'✓ 静态站点已生成到: {self.output_dir}'))
+        self.stdout.write(
+            f'  ✓ {"原子" if atomic else ""}替换完成，上一版保留在 {self.previous_dir.name}/ '
+            f'(python manage.py generate_static_site --rollback 换回)'
+        )
+        self.stdout.write(self.style.SUCCESS(f'  可以提交到 GitHub 仓库并在仓库设置中启用 GitHub Pages (从 docs/ 目录)'))
 
-        # 1. 生成首页
-        self.generate_index()
+        if self.profiler.enabled:
+            self.write_profile(Path(options['profile']), options['profile_top'])
 
-        # 2. 生成文章列表页(含分页)
-        self.generate_article_list()
+    def build(self) -> int:
+        """按顺序执行各构建阶段，返回删除的孤立文件数"""
+        # 模板任一文件变化都会影响所有页面
+        self.template_digest = tree_digest(Path(settings.BASE_DIR) / 'templates')
+        # 序列化代码变化时所有 JSON 接口文件都需重新生成
+        self.serializer_digest = file_digest(Path(serializers.__file__))
 
-        # 3. 生成所有文章详情页
-        self.generate_article_details()
+        # 封面需在渲染前处理完毕，页面里的 srcset 依赖 cover_hash；这是构建中唯一写数据库的步骤
+        self._run(self.prepare_covers)
 
-        # 4. 生成关于页面
-        self.generate_about()
+        # 其余阶段读取同一时刻的数据快照
+        with snapshot.read_snapshot() as database:
+            # --jobs 的工作进程连接同一份快照
+            self.database = database
+            return self.build_from_snapshot()
 
-        # 5. 生成留言板页面
-        # self.generate_board()  # 留言板功能已移除
+    def build_from_snapshot(self) -> int:
+        """在数据快照内生成全部页面与文件"""
+        # 1. 复制静态资源与 media 文件，页面中的引用需按其指纹改写，须先于页面完成
+        self._run(self.copy_static_files)
+        self._run(self.copy_media_files)
+        self._run(self.write_asset_manifest)
 
-        # 6. 复制静态资源
-        self.copy_static_files()
+        # 2. 生成首页
+        self._run(self.generate_index)
 
-        # 7. 复制 media 文件
-        self.copy_media_files()
+        # 3. 生成文章列表页(含分页)及对应的 JSON 接口文件
+        self._run(self.generate_article_list)
 
-        # 8. 生成 sitemap
-        self.generate_sitemap()
+        # 4. 生成所有文章详情页及对应的 JSON 接口文件
+        self._run(self.generate_article_details)
 
-        # 9. 生成 .nojekyll (GitHub Pages 需要)
-        (self.output_dir / '.nojekyll').touch()
+        # 并行模式下，列表页与详情页在此统一交给进程池渲染
+        self._run(self.render_pending)
 
-        self.stdout.write(self.style.SUCCESS(f'✓ 静态站点已生成到: {self.output_dir}'))
-        self.stdout.write(self.style.SUCCESS(f'  可以提交到 GitHub 仓库并在仓库设置中启用 GitHub Pages (从 docs/ 目录)'))
+        # 5. 生成关于页面与站内检索(页面 + 分片索引)
+        self._run(self.generate_about)
+        self._run(self.generate_search)
+
+        # 6. 生成留言板页面
+        # self.generate_board()  # 留言板功能已移除
+
+        # 7. 生成 sitemap (index + 分片)
+        self._run(self.generate_sitemap)
+
+        # 8. 生成 .nojekyll (GitHub Pages 需要)
+        self._emit('.nojekyll', digest('nojekyll'), lambda: '')
+
+        # 9. 为文本产物写入 .gz/.br 预压缩副本
+        self._run(self.compress_outputs)
+
+        # 10. 删除孤立文件并保存清单
+        removed = self._run(self.remove_orphans)
+        self.manifest.save()
+        return removed
+
+    def publish(self) -> bool:
+        """把构建好的 docs.staging/ 换入 docs/，原来的 docs/ 成为 docs.previous/，返回是否原子替换"""
+        if not self.output_dir.exists():
+            os.rename(self.staging_dir, self.output_dir)
+            return True
+        atomic = sync.swap_dirs(self.staging_dir, self.output_dir)
+        if self.previous_dir.exists():
+            shutil.rmtree(self.previous_dir)
+        os.rename(self.staging_dir, self.previous_dir)
+        return atomic
+
+    def rollback(self):
+        """docs/ 与 docs.previous/ 互换，再次执行即恢复"""
+        if not self.previous_dir.is_dir():
+            raise CommandError(f'没有可回滚的版本: {self.previous_dir} 不存在')
+        if self.output_dir.exists():
+            sync.swap_dirs(self.previous_dir, self.output_dir)
+        else:
+            os.rename(self.previous_dir, self.output_dir)
+        self.stdout.write(self.style.SUCCESS(f'✓ 已换回上一版: {self.output_dir} (原版本在 {self.previous_dir.name}/)'))
+
+    def _run(self, step):
+        """执行一个构建阶段，--profile 时按方法名记入报告"""
+        with self.profiler.phase(step.__name__):
+            return step()
+
+    def prepare_covers(self):
+        """同步处理可见文章中尚未完成的封面(水印、衍生图)，已处理的只检查衍生图"""
+        ids = Article.objects.visible().exclude(cover__isnull=True).exclude(cover='').values_list('pk', flat=True)
+        processed = sum(process_cover(pk) for pk in ids)
+        self.stdout.write(f'  ✓ 封面就绪 ({len(ids)} 张封面，本次处理 {processed} 张)')
+
+    def write_asset_manifest(self):
+        """输出资源原名到指纹名的映射，供外部工具(CDN 预热、其他页面)查询"""
+        if not self.fingerprint:
+            return
+        self._emit(fingerprint.ASSET_MANIFEST_NAME, digest(self.assets), lambda: json.dumps(
+            self.assets, ensure_ascii=False, indent=2, sort_keys=True,
+        ))
+        self.stdout.write(f'  ✓ 资源指纹: {len(self.assets)} 个文件 ({fingerprint.ASSET_MANIFEST_NAME})')
 
     def generate_index(self):
         """生成首页"""
-        html = render_to_string('index.html', {
+        self._emit('index.html', self._page_inputs('index', self.author_bio), lambda: render_to_string('index.html', {
             'bio': self.author_bio,
             'is_static': True,
             'current_page': 'index'
-        })
-        self._write_html('index.html', html)
+        }))
         self.stdout.write('  ✓ 生成首页')
 
     def generate_article_list(self):
         """生成文章列表页(分页)"""
         from django.core.paginator import Paginator
 
-        articles = Article.objects.filter(is_hidden=False).order_by('-published_at')
-        tags = Tag.objects.all()
+        # 文章与标签归属各一次查询，标签页在内存中分组，不再逐标签查询
+        articles = list(Article.objects.for_listing())
+        tags = list(Tag.objects.all())
+        tags_inputs = [(t.pk, t.name) for t in tags]
+        by_tag = pages.bucket_by_tag(articles)
 
         # 生成主列表页(第1页)
         paginator = Paginator(articles, 10)
         for page_num in paginator.page_range:
             page_obj = paginator.get_page(page_num)
-            html = render_to_string('list.html', {
-                'page_obj': page_obj,
-                'tags': tags,
-                'active_tag': None,
-                'is_static': True,
-                'current_page': 'list'
-            })
-
-            if page_num == 1:
-                self._write_html('list.html', html)
-            else:
-                self._write_html(f'list_page_{page_num}.html', html)
+            filename = 'list.html' if page_num == 1 else f'list_page_{page_num}.html'
+            self._emit_list_page(filename, page_obj, tags, tags_inputs, None)
 
         # 生成标签筛选页
         for tag in tags:
-            tag_articles = articles.filter(tags=tag)
-            tag_paginator = Paginator(tag_articles, 10)
+            tag_paginator = Paginator(by_tag.get(tag.pk, []), 10)
 
             for page_num in tag_paginator.page_range:
                 page_obj = tag_paginator.get_page(page_num)
-                html = render_to_string('list.html', {
-                    'page_obj': page_obj,
-                    'tags': tags,
-                    'active_tag': tag,
-                    'is_static': True,
-                    'current_page': 'list'
-                })
-
                 filename = f'list_tag_{tag.name}_page_{page_num}.html' if page_num > 1 else f'list_tag_{tag.name}.html'
-                self._write_html(filename, html)
+                self._emit_list_page(filename, page_obj, tags, tags_inputs, tag)
 
         self.stdout.write(f'  ✓ 生成文章列表页 ({len(articles)} 篇文章)')
 
+    def _emit_list_page(self, filename, page_obj, tags, tags_inputs, active_tag):
+        """按页面内文章、标签栏与分页状态判断列表页(及同一页的 JSON)是否需要重新生成"""
+        data = (
+            tags_inputs,
+            active_tag.pk if active_tag else None,
+            page_obj.number,
+            page_obj.paginator.num_pages,
+            [self._article_inputs(a) for a in page_obj.object_list],
+        )
+        spec = ('list', active_tag.pk if active_tag else None, page_obj.number)
+        inputs = self._page_inputs('list', *data)
+        # 隐藏或删除文章后，后面的文章前移一页，页内文章的 updated_at 却不变；
+        # 因此 lastmod 取页面输入哈希最后一次变化的时间，首次出现的页面取页内最新的 updated_at
+        newest = max((a.updated_at for a in page_obj.object_list), default=None)
+        self.sitemap_pages.append((filename, self.manifest.lastmod(filename, inputs, self.started_at, newest)))
+        self._emit(filename, inputs, lambda: pages.render_list(page_obj, tags, active_tag), spec=spec)
+
+        api_name = f'api/articles/tag/{active_tag.name}/page_{page_obj.number}.json' if active_tag else f'api/articles/page_{page_obj.number}.json'
+        self._emit_json(api_name, self._json_inputs('list', *data, page_obj.paginator.count), lambda media_url: serializers.article_list_payload(
+            page_obj.object_list, tags, serializers.page_pagination(page_obj), media_url,
+        ))
+
     def generate_article_details(self):
         """生成所有文章详情页"""
-        articles = Article.objects.filter(is_hidden=False)
+        articles = Article.objects.visible().prefetch_related('tags')
 
         for article in articles:
-            comments = []  # 评论功能已移除
-
-            # Markdown -> HTML
-            allowed_tags = bleach.sanitizer.ALLOWED_TAGS.union({
-                'p', 'pre', 'code', 'img', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
-                'table', 'thead', 'tbody', 'tr', 'th', 'td', 'blockquote'
-            })
-            html_content = md.markdown(
-                article.content_md,
-                extensions=['extra', 'fenced_code', 'tables', 'codehilite']
+            filename = f'article_{article.pk}.html'
+            inputs = self._page_inputs('detail', self._article_inputs(article), rendering.cache_key(article.content_md))
+            self._emit(filename, inputs, lambda article=article: pages.render_article(article), spec=('article', article.pk))
+            self._emit_json(
+                f'api/articles/{article.pk}.json',
+                self._json_inputs('detail', self._article_inputs(article)),
+                lambda media_url, article=article: serializers.article_detail_payload(article, media_url),
             )
-            html_content = bleach.clean(
-                html_content,
-                tags=allowed_tags,
-                attributes={'*': ['class', 'id'], 'img': ['src', 'alt']},
-                strip=True
-            )
-
-            html = render_to_string('detail.html', {
-                'article': article,
-                'comments': comments,
-                'article_html': html_content,
-                'is_static': True,
-                'current_page': 'list'
-            })
 
-            self._write_html(f'article_{article.pk}.html', html)
-
-        self.stdout.write(f'  ✓ 生成文章详情页 ({articles.count()} 篇)')
+        self.stdout.write(f'  ✓ 生成文章详情页 ({len(articles)} 篇)')
 
     def generate_about(self):
         """生成关于页面"""
-        html = render_to_string('about.html', {
+        self._emit('about.html', self._page_inputs('about'), lambda: render_to_string('about.html', {
             'is_static': True,
             'current_page': 'about'
-        })
-        self._write_html('about.html', html)
+        }))
+        self._emit_json('api/about.json', self._json_inputs('about', self.author_bio), lambda media_url: serializers.about_payload(self.author_bio))
         self.stdout.write('  ✓ 生成关于页面')
 
+    def generate_search(self):
+        """生成检索页与浏览器端使用的分片倒排索引，文章数据未变化时整体跳过"""
+        self._emit('search.html', self._page_inputs('search'), lambda: render_to_string('search.html', {
+            'is_static': True,
+            'current_page': 'search'
+        }))
+
+        rows = list(Article.objects.visible().order_by('pk').values_list(
+            'pk', 'title', 'summary', 'content_hash', 'published_at',
+        ))
+        inputs = digest('search', search_index.INDEX_VERSION, search_index.TERM_SHARD_BYTES, rows)
+        if self.manifest.is_fresh(search_index.INDEX_NAME, inputs) and self._keep_search_index():
+            self.manifest.record(search_index.INDEX_NAME, inputs)
+            self.skipped += 1
+            self.stdout.write('  ✓ 站内检索索引未变化')
+            return
+
+        articles = Article.objects.visible().order_by('pk').only(
+            'pk', 'title', 'summary', 'content_md', 'content_html', 'content_hash', 'published_at',
+        )
+        meta, files = search_index.build_index(
+            (a.pk, a.title, rendering.html_to_text(a.rendered_html), a.summary,
+             f'article_{a.pk}.html', timezone.localtime(a.published_at).strftime('%Y-%m-%d'))
+            for a in articles.iterator(chunk_size=200)
+        )
+        for name, content in files.items():
+            self._emit(name, digest(content), lambda content=content: content)
+        self._emit(search_index.INDEX_NAME, inputs, lambda: meta)
+        self.stdout.write(
+            f'  ✓ 生成站内检索索引: {len(rows)} 篇文章，{len(files)} 个分片，'
+            f'{search_index.index_size(files) / 1024:.1f} KB'
+        )
+
+    def _keep_search_index(self) -> bool:
+        """索引输入未变化时沿用上次的分片文件(须全部仍在磁盘上)"""
+        try:
+            meta = json.loads((self.build_dir / search_index.INDEX_NAME).read_text(encoding='utf-8'))
+            names = search_index.index_files(meta)
+        except (OSError, ValueError, KeyError):
+            return False
+        if not all(self.manifest.is_fresh(name, self.manifest.previous.get(name)) for name in names):
+            return False
+        for name in names:
+            self.manifest.record(name, self.manifest.previous[name])
+        self.skipped += len(names)
+        return True
+
     def generate_board(self):
         """生成留言板页面"""
         messages = BoardMessage.objects.filter(is_hidden=False).order_by('-created_at')
@@ -183,60 +421,262 @@ class Command(BaseCommand):
     def copy_static_files(self):
         """复制静态资源"""
         static_src = Path(settings.BASE_DIR) / 'static'
-        static_dest = self.output_dir / 'static'
+        static_dest = self.build_dir / 'static'
 
         if static_src.exists():
-            shutil.copytree(static_src, static_dest, dirs_exist_ok=True)
+            self._copy_tree(static_src, static_dest)
             self.stdout.write('  ✓ 复制静态资源 (CSS/JS)')
 
         # 复制 staticfiles (collectstatic 的输出)
         staticfiles_src = Path(settings.BASE_DIR) / 'staticfiles'
         if staticfiles_src.exists():
-            shutil.copytree(staticfiles_src, static_dest, dirs_exist_ok=True)
+            self._copy_tree(staticfiles_src, static_dest)
             self.stdout.write('  ✓ 复制 staticfiles')
 
     def copy_media_files(self):
-        """复制 media 文件 (封面、头像等)"""
-        media_src = Path(settings.MEDIA_ROOT)
-        media_dest = self.output_dir / 'media'
-
-        if media_src.exists():
-            shutil.copytree(media_src, media_dest, dirs_exist_ok=True)
-            self.stdout.write('  ✓ 复制 media 文件 (封面/头像)')
+        """同步可见文章引用的 media 文件(封面、封面衍生图、正文图片)，未引用的不进入 docs/"""
+        media_root = Path(settings.MEDIA_ROOT).resolve()
+        if not media_root.exists():
+            return
+        names = self.referenced_media()
+        before = self.written
+        for name in sorted(names):
+            path = (media_root / name).resolve()
+            # 正文里的引用不可信，只接受 media 目录内的文件
+            if path.is_relative_to(media_root) and path.is_file():
+                self._sync_file(path, f'media/{name}')
+        self.stdout.write(f'  ✓ 同步 media 文件: 引用 {len(names)} 个，写入 {self.written - before} 个')
+
+    def referenced_media(self) -> set:
+        """可见文章引用的 media 文件，路径相对于 MEDIA_ROOT"""
+        names = set()
+        articles = Article.objects.visible().only('cover', 'cover_hash', 'content_md', 'content_html', 'content_hash')
+        for article in articles.iterator(chunk_size=200):
+            if article.cover:
+                names.add(article.cover.name)
+                info = load_variants(article.cover_hash)
+                for variant in info['variants'] if info else ():
+                    names.update((variant['webp'], variant['jpeg']))
+            names.update(
+                ref[len('media/'):] for ref in fingerprint.find_references(article.rendered_html)
+                if ref.startswith('media/')
+            )
+        return names
 
     def generate_sitemap(self):
-        """生成 sitemap.xml"""
-        articles = Article.objects.filter(is_hidden=False)
-
-        sitemap_lines = [
-            '<?xml version="1.0" encoding="UTF-8"?>',
-            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
-            '  <url>',
-            '    <loc>https://pangu-immortal.github.io/</loc>',
-            f'    <lastmod>{timezone.now().strftime("%Y-%m-%d")}</lastmod>',
-            '    <changefreq>weekly</changefreq>',
-            '    <priority>1.0</priority>',
-            '  </url>',
-        ]
-
-        for article in articles:
-            sitemap_lines.extend([
-                '  <url>',
-                f'    <loc>https://pangu-immortal.github.io/article_{article.pk}.html</loc>',
-                f'    <lastmod>{article.published_at.strftime("%Y-%m-%d")}</lastmod>',
-                '    <changefreq>monthly</changefreq>',
-                '    <priority>0.8</priority>',
-                '  </url>',
-            ])
-
-        sitemap_lines.append('</urlset>')
-
-        sitemap_path = self.output_dir / 'sitemap.xml'
-        sitemap_path.write_text('\n'.join(sitemap_lines), encoding='utf-8')
-        self.stdout.write('  ✓ 生成 sitemap.xml')
+        """
+        逐条写出 sitemap 分片(首页、关于、列表页与标签页、文章详情)与 sitemap.xml 索引
+        文章 lastmod 取自 updated_at，列表页取页面内容最后变化的时间；分片内容哈希与上次相同时保留原文件不动
+        """
+        base_url = getattr(settings, 'STATIC_SITE_URL', 'https://pangu-immortal.github.io/')
+        writer = sitemap.SitemapWriter(
+            self.build_dir, base_url, getattr(settings, 'STATIC_SITEMAP_MAX_URLS', sitemap.MAX_URLS),
+        )
+        try:
+            visible = Article.objects.visible()
+            writer.add('', visible.aggregate(latest=Max('updated_at'))['latest'], 'weekly', '1.0')
+            writer.add('about.html', changefreq='monthly', priority='0.5')
+            for filename, lastmod in self.sitemap_pages:
+                writer.add(filename, lastmod, 'weekly', '0.6')
+            rows = visible.order_by('pk').values_list('pk', 'updated_at')
+            for pk, updated_at in rows.iterator(chunk_size=2000):
+                writer.add(f'article_{pk}.html', updated_at, 'monthly', '0.8')
+            shards = writer.close()
+        except BaseException:
+            writer.discard()
+            raise
+
+        written = 0
+        for shard in shards:
+            self.manifest.record(shard.name, shard.content_hash)
+            if self.manifest.is_fresh(shard.name, shard.content_hash):
+                shard.tmp.unlink()
+                self.skipped += 1
+            else:
+                os.replace(shard.tmp, self.build_dir / shard.name)
+                written += 1
+        self.written += written
+
+        index = sitemap.render_index(base_url, shards)
+        self._emit(sitemap.INDEX_NAME, digest(index), lambda: index)
+        self.stdout.write(f'  ✓ 生成 sitemap: {writer.total} 个 URL，{len(shards)} 个分片 (重写 {written} 个)')
+
+    def render_pending(self):
+        """把排队的页面分发到进程池渲染，按文件名顺序汇总结果"""
+        if not self.pending:
+            return
+        jobs = sorted(self.pending)
+        self.pending = []
+
+        # spawn 保证每个工作进程独立完成 Django 配置并建立自己的数据库连接
+        with ProcessPoolExecutor(
+            max_workers=min(self.jobs, len(jobs)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=pages.init_worker,
+            initargs=(
+                settings.SETTINGS_MODULE, str(self.build_dir), self.assets, self.profiler.enabled,
+                self.database, str(settings.MEDIA_ROOT),
+            ),
+        ) as pool:
+            results = sorted(pool.map(pages.run_job, jobs, chunksize=max(1, len(jobs) // (self.jobs * 4))))
+
+        self.written += len(results)
+        workers = {}
+        for filename, pid, elapsed, refs, timings in results:
+            self.manifest.record_assets(filename, refs)
+            self.profiler.add_page(filename, timings, worker=pid, remote=True)
+            count, total = workers.get(pid, (0, 0.0))
+            workers[pid] = (count + 1, total + elapsed)
+        self.stdout.write(f'  ✓ 并行渲染 {len(results)} 个页面 ({len(workers)} 个进程)')
+        for index, (count, total) in enumerate(sorted(workers.values(), reverse=True), 1):
+            self.stdout.write(f'    - worker {index}: {count} 页, {total:.2f}s')
+
+    def compress_outputs(self):
+        """
+        为本次产出的文本文件写入预压缩副本，副本输入哈希 = 源文件输入哈希 + 资源引用 + 压缩参数，
+        源文件未变化的跳过；压缩在线程池中进行(zlib/brotli 压缩时释放 GIL)
+        """
+        tasks = {}
+        skipped = 0
+        for name, inputs in list(self.manifest.current.items()):
+            if not compress.is_compressible(name):
+                continue
+            for encoding in compress.ENCODINGS:
+                sibling = f'{name}.{encoding}'
+                sibling_inputs = digest(
+                    inputs, self.manifest.current_assets.get(name), compress.compression_params(encoding),
+                )
+                if self.manifest.is_fresh(sibling, sibling_inputs):
+                    self.manifest.record(sibling, sibling_inputs)
+                    skipped += 1
+                else:
+                    tasks.setdefault(name, []).append((encoding, sibling, sibling_inputs))
+
+        names = sorted(tasks)
+        written = 0
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            results = pool.map(
+                lambda name: compress.compress_file(self.build_dir / name, [t[0] for t in tasks[name]]),
+                names,
+            )
+            for name, encodings in zip(names, results):
+                # 压缩后没变小的不产出副本，上次留下的旧副本作为孤立文件删除
+                for encoding, sibling, sibling_inputs in tasks[name]:
+                    if encoding in encodings:
+                        self.manifest.record(sibling, sibling_inputs)
+                        written += 1
+        self.written += written
+        self.skipped += skipped
+        self.stdout.write(f'  ✓ 预压缩 ({"/".join(compress.ENCODINGS)}): 写入 {written} 个，跳过 {skipped} 个未变化文件')
+
+    def write_profile(self, path: Path, top: int):
+        """写出 --profile 报告并在终端输出阶段汇总与最慢页面"""
+        if not path.is_absolute():
+            path = Path(settings.BASE_DIR) / path
+        report = self.profiler.write(path, self.jobs)
+        self.stdout.write(self.style.SUCCESS(f'构建性能报告: {path}'))
+        for line in self.profiler.summary(report, top):
+            self.stdout.write(line)
+
+    def remove_orphans(self) -> int:
+        """删除上次构建产出、本次不再产出的文件"""
+        orphans = self.manifest.orphans()
+        for name in orphans:
+            path = self.build_dir / name
+            if path.is_file():
+                path.unlink()
+            # 顺带清理因此变空的目录
+            parent = path.parent
+            while parent != self.build_dir and parent.exists() and not any(parent.iterdir()):
+                parent.rmdir()
+                parent = parent.parent
+        return len(orphans)
+
+    def _page_inputs(self, kind: str, *parts) -> str:
+        """页面输入哈希：页面类型 + 模板 + Markdown 渲染配置 + 页面数据"""
+        return digest(kind, self.template_digest, rendering.CONFIG_FINGERPRINT, *parts)
+
+    def _article_inputs(self, article) -> dict:
+        """影响文章在详情页/列表页中呈现的字段(正文由 content_hash 代表)"""
+        return {
+            'id': article.pk,
+            'title': article.title,
+            'summary': article.summary,
+            'content_hash': article.content_hash,
+            'cover': article.cover.name if article.cover else '',
+            'cover_hash': article.cover_hash,
+            'published_at': article.published_at.isoformat(),
+            'tags': [t.name for t in article.tags.all()],
+        }
+
+    def _json_inputs(self, kind: str, *parts) -> str:
+        """JSON 接口文件输入哈希：类型 + 序列化代码 + 数据(与模板无关)"""
+        return digest('api', kind, self.serializer_digest, *parts)
+
+    def _emit_json(self, filename: str, inputs: str, build):
+        """
+        写入一个静态 JSON 接口文件，build(media_url) 返回与在线 API 相同的响应数据
+        文件地址为站内绝对路径(带指纹)，引用的资源同 HTML 页面一样记入清单
+        """
+        refs = {}
+
+        def media_url(name):
+            key = f'media/{name}'
+            refs[key] = self.assets.get(key)
+            return '/' + quote(self.assets.get(key) or key, safe='/')
+
+        render = lambda: json.dumps(build(media_url), ensure_ascii=False, separators=(',', ':'))
+        if self._emit(filename, inputs, render):
+            self.manifest.record_assets(filename, refs)
+
+    def _emit(self, filename: str, inputs: str, render, spec: tuple = None) -> bool:
+        """
+        输入有变化时才调用 render 生成内容并写入，返回是否需要写入
+        并行模式下带 spec 的页面先排队，由 render_pending 交给进程池
+        """
+        self.manifest.record(filename, inputs)
+        if self.manifest.is_fresh(filename, inputs) and self.manifest.assets_fresh(filename, self.assets):
+            self.manifest.keep_assets(filename)
+            self.skipped += 1
+            return False
+        if spec is not None and self.jobs > 1:
+            self.pending.append((filename, spec))
+            return True
+        with self.profiler.page(filename):
+            refs = pages.render_and_write(self.build_dir / filename, render, self.assets)
+        self.manifest.record_assets(filename, refs)
+        self.written += 1
+        return True
+
+    def _copy_tree(self, src: Path, dest: Path):
+        """增量同步整个目录"""
+        for path in sorted(p for p in src.rglob('*') if p.is_file()):
+            self._sync_file(path, (dest / path.relative_to(src)).relative_to(self.build_dir).as_posix())
+
+    def _sync_file(self, path: Path, original: str):
+        """
+        同步单个资源文件到 docs/original (开启指纹时文件名带内容哈希)
+        源文件大小与 mtime 未变时不读内容，输出已是最新时不写入
+        """
+        inputs = self.manifest.source_digest(path, self._source_key(path))
+        name = fingerprint.hashed_name(original, inputs) if self.fingerprint else original
+        self.assets[original] = name
+        # static/ 与 staticfiles/ 同名文件以后复制者为准，本次已复制过的不能跳过
+        copied = name in self.manifest.current
+        self.manifest.record(name, inputs)
+        if not copied and self.manifest.is_fresh(name, inputs):
+            self.skipped += 1
+            return
+        method = sync.place_file(path, self.build_dir / name, link=self.link_files)
+        self.placed[method] = self.placed.get(method, 0) + 1
+        self.written += 1
+
+    def _source_key(self, path: Path) -> str:
+        try:
+            return path.relative_to(Path(settings.BASE_DIR).resolve()).as_posix()
+        except ValueError:
+            return path.as_posix()
 
     def _write_html(self, filename: str, content: str):
         """写入 HTML 文件"""
-        file_path = self.output_dir / filename
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        file_path.write_text(content, encoding='utf-8')
+        pages.write_atomic(self.build_dir / filename, content)
@@ -0,0 +1,105 @@
+"""
+Django 管理命令: 本地预览生成的静态站点
+
+使用方法:
+    python manage.py preview_static_site                 # http://127.0.0.1:8001/
+    python manage.py preview_static_site --port 9000 --dir docs
+
+说明:
+    与 GitHub Pages/CDN 的行为保持一致：请求带 Accept-Encoding 时优先返回
+    构建阶段写好的 .br / .gz 副本(Content-Encoding + Vary)，不在请求时压缩；
+    带内容哈希的资源返回 Cache-Control: immutable，其余 no-cache
+"""
+
+import mimetypes
+import os
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.static_build.compress import CONTENT_ENCODINGS
+from app.static_build.fingerprint import IMMUTABLE_CACHE_CONTROL, is_immutable
+
+
+def accepted_encodings(header: str) -> set:
+    """解析 Accept-Encoding，返回可接受(q > 0)的编码集合"""
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token and q > 0:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+class PrecompressedHandler(SimpleHTTPRequestHandler):
+    """存在预压缩副本且客户端接受时返回副本，其余交给 SimpleHTTPRequestHandler"""
+
+    def send_head(self):
+        path = Path(self.translate_path(self.path))
+        # 不带 / 的目录交给父类重定向
+        if path.is_dir() and self.path.split('?', 1)[0].endswith('/'):
+            path = path / 'index.html'
+        if path.is_file():
+            accepted = accepted_encodings(self.headers.get('Accept-Encoding', ''))
+            for suffix, encoding in CONTENT_ENCODINGS.items():
+                sibling = path.with_name(f'{path.name}.{suffix}')
+                if encoding in accepted and sibling.is_file():
+                    return self._send_file(path, sibling, encoding)
+        return super().send_head()
+
+    def _send_file(self, path: Path, sibling: Path, encoding: str):
+        f = open(sibling, 'rb')
+        try:
+            stat = os.fstat(f.fileno())
+            self.send_response(200)
+            self.send_header('Content-Type', self.guess_type(str(path)))
+            self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(stat.st_size))
+            self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Last-Modified', self.date_time_string(stat.st_mtime))
+            self.end_headers()
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def end_headers(self):
+        # 带指纹的资源长期缓存，HTML 等其余文件每次协商
+        path = self.path.split('?', 1)[0]
+        self.send_header('Cache-Control', IMMUTABLE_CACHE_CONTROL if is_immutable(path) else 'no-cache')
+        super().end_headers()
+
+
+class Command(BaseCommand):
+    help = '本地预览静态站点，按 Accept-Encoding 返回预压缩副本'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8001, help='监听端口 (默认 8001)')
+        parser.add_argument('--bind', default='127.0.0.1', help='监听地址 (默认 127.0.0.1)')
+        parser.add_argument('--dir', default=str(Path(settings.BASE_DIR) / 'docs'), help='站点目录 (默认 docs/)')
+
+    def handle(self, *args, **options):
+        root = Path(options['dir']).resolve()
+        if not (root / 'index.html').exists():
+            self.stderr.write(self.style.ERROR(f'✗ {root} 下没有 index.html，请先运行 generate_static_site'))
+            return
+        mimetypes.add_type('application/javascript', '.mjs')
+        handler = partial(PrecompressedHandler, directory=str(root))
+        server = ThreadingHTTPServer((options['bind'], options['port']), handler)
+        self.stdout.write(self.style.SUCCESS(f'✓ 预览 {root}: http://{options["bind"]}:{options["port"]}/'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,46 @@
+"""
+Django 管理命令: 处理文章封面 (保存原图、加水印、生成衍生图)
+
+使用方法:
+    python manage.py process_covers              # 处理尚未完成的封面，补齐衍生图
+    python manage.py process_covers --reprocess  # 按当前水印配置从原图重新处理全部封面
+    python manage.py process_covers --adopt      # 升级后执行：把升级前已有的封面记为已处理，不重画水印
+
+说明:
+    平时由 Article.save() 在换封面后交给后台线程池处理；进程退出时未完成的任务，
+    以及调整 COVER_WATERMARK_* / COVER_VARIANT_WIDTHS 之后，运行本命令补齐。
+    水印总是从原图绘制，重复运行不会叠加；水印字体画不出 COVER_WATERMARK_TEXT 时，
+    其余处理照常完成，未加水印的封面保持待处理，命令以非零状态退出
+    升级步骤：migrate 之后运行 --adopt。升级前已有的封面已带水印，迁移 0008 只在数据库里给它们做标记；
+    --adopt 把当前文件保存为原图并记录哈希(文件须已在 media/ 下)。未认领的封面在首次处理时也会
+    同样认领，不会再加一层水印。这些封面保存的“原图”带有旧水印
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.images import LEGACY_SOURCE_HASH, adopt_cover, process_cover, watermark_font_problem
+from app.models import Article
+
+
+class Command(BaseCommand):
+    help = '为带封面的文章加水印并生成 WebP/JPEG 限宽衍生图'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reprocess', action='store_true', help='从保存的原图重新绘制水印')
+        parser.add_argument('--adopt', action='store_true', help='把升级前已有的封面记为已处理(不重画水印)')
+
+    def handle(self, *args, **options):
+        if options['adopt']:
+            ids = list(Article.objects.filter(cover_source_hash=LEGACY_SOURCE_HASH).values_list('pk', flat=True))
+            adopted = sum(adopt_cover(pk) for pk in ids)
+            self.stdout.write(self.style.SUCCESS(f'✓ 已记录 {adopted} 个现有封面 (共检查 {len(ids)} 篇)'))
+            return
+        covers = Article.objects.exclude(cover__isnull=True).exclude(cover='')
+        ids = list(covers.values_list('pk', flat=True))
+        updated = sum(process_cover(pk, reprocess=options['reprocess']) for pk in ids)
+        self.stdout.write(self.style.SUCCESS(f'✓ 已更新 {updated} 篇文章的封面 (共检查 {len(ids)} 篇)'))
+
+        problem = watermark_font_problem()
+        if problem:
+            pending = covers.filter(cover_source_hash='').count()
+            raise CommandError(f'{problem}，{pending} 个封面未加水印；安装字体或设置 COVER_WATERMARK_FONT 后重新运行')
@@ -0,0 +1,26 @@
+"""
+Django 管理命令: 重建全文检索索引
+
+使用方法:
+    python manage.py rebuild_search_index
+
+说明:
+    索引平时由文章保存/删除信号自动同步；
+    loaddata 导入数据、直接改库或调整切分规则后运行本命令
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import search
+from app.models import Article
+
+
+class Command(BaseCommand):
+    help = '重建文章全文检索索引 (SQLite FTS5)'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('全文检索仅支持 SQLite 数据库')
+        articles = Article.objects.only('pk', 'title', 'content_md').iterator()
+        count = search.rebuild_index(articles)
+        self.stdout.write(self.style.SUCCESS(f'✓ 已为 {count} 篇文章重建检索索引'))
@@ -0,0 +1,151 @@
+"""
+Django 管理命令: 运行热点路径性能基准
+
+使用方法:
+    python manage.py seed_benchmark_corpus                 # 先生成语料
+    python manage.py run_benchmarks                        # 运行全部场景
+    python manage.py run_benchmarks -s view:article_list -s api:article_list --iterations 500
+    python manage.py run_benchmarks --compare .cache/benchmarks/上一次.json
+    python manage.py run_benchmarks --list                 # 列出场景
+
+输出:
+    每个场景的延迟分位数 (p50/p90/p95/p99)、每次迭代的查询数、分段耗时与内存峰值，
+    结果连同语料参数、git 提交写入 JSON (默认 .cache/benchmarks/<时间>-<提交>.json)，
+    --compare 与之前的结果逐场景对比
+"""
+
+import json
+import platform
+import subprocess
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.benchmarks import DEFAULT_DATABASE, benchmark_environment, meta_path_for
+from app.benchmarks.scenarios import SCENARIOS, Context, run_scenario
+
+RESULT_VERSION = 1
+
+
+def git_revision() -> dict:
+    def git(*args):
+        return subprocess.run(
+            ['git', *args], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    try:
+        return {'commit': git('rev-parse', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+class Command(BaseCommand):
+    help = '运行热点路径性能基准 (视图、接口、Markdown 渲染、静态站点生成)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=str(DEFAULT_DATABASE), help='基准数据库文件 (默认 .cache/benchmark.sqlite3)')
+        parser.add_argument(
+            '--scenario', '-s', action='append', choices=sorted(SCENARIOS), metavar='NAME',
+            help='只运行指定场景，可重复 (默认全部，--list 查看)',
+        )
+        parser.add_argument('--iterations', '-n', type=int, help='覆盖各场景的默认迭代次数')
+        parser.add_argument('--jobs', '-j', type=int, default=1, help='静态站点场景的并行进程数 (默认 1)')
+        parser.add_argument('--concurrency', '-c', type=int, default=64, help='concurrency:* 场景每批的并发请求数 (默认 64)')
+        parser.add_argument(
+            '--db-latency', type=float, default=0.0, metavar='MS',
+            help='concurrency:* 场景中每条查询额外等待的毫秒数，模拟网络上的数据库 (默认 0)',
+        )
+        parser.add_argument('--no-memory', action='store_true', help='跳过 tracemalloc 内存测量')
+        parser.add_argument('--output', '-o', help='结果 JSON 路径 (默认 .cache/benchmarks/<时间>-<提交>.json)')
+        parser.add_argument('--compare', metavar='FILE', help='与之前的结果 JSON 对比')
+        parser.add_argument('--list', action='store_true', help='列出所有场景')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, item in sorted(SCENARIOS.items()):
+                self.stdout.write(f'  {name:<36} {item.iterations:>4} 次  {item.description}')
+            return
+
+        database = Path(options['database']).resolve()
+        if not database.exists() or not meta_path_for(database).exists():
+            raise CommandError(f'基准数据库不存在: {database}\n请先运行 python manage.py seed_benchmark_corpus')
+        previous = self._load(options['compare']) if options['compare'] else None
+
+        names = options['scenario'] or sorted(SCENARIOS)
+        revision = git_revision()
+        report = {
+            'version': RESULT_VERSION,
+            'created_at': timezone.now().isoformat(),
+            'git': revision,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'corpus': json.loads(meta_path_for(database).read_text(encoding='utf-8')),
+            'jobs': options['jobs'],
+            'concurrency': options['concurrency'],
+            'db_latency_ms': options['db_latency'],
+            'scenarios': {},
+        }
+        self.stdout.write(self.style.SUCCESS(
+            f'运行 {len(names)} 个场景 (语料 {report["corpus"]["articles"]} 篇文章，提交 {(revision["commit"] or "?")[:10]}'
+            f'{" +未提交修改" if revision["dirty"] else ""})'
+        ))
+
+        with benchmark_environment(database):
+            ctx = Context(jobs=options['jobs'], concurrency=options['concurrency'], db_latency=options['db_latency'] / 1000)
+            try:
+                for name in names:
+                    result = run_scenario(SCENARIOS[name], ctx, options['iterations'], not options['no_memory'])
+                    report['scenarios'][name] = result
+                    self.stdout.write(self._line(name, result, previous))
+            finally:
+                ctx.cleanup()
+
+        output = Path(options['output']) if options['output'] else self._default_output(revision)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'✓ 结果已写入 {output}'))
+
+    def _line(self, name: str, result: dict, previous: dict) -> str:
+        latency = result['latency_ms']
+        line = (
+            f'  {name:<36} p50 {latency["p50"]:9.2f}ms  p95 {latency["p95"]:9.2f}ms  p99 {latency["p99"]:9.2f}ms  '
+            f'查询 {result["queries"]["mean"]:6.1f}'
+        )
+        if 'peak_memory' in result:
+            line += f'  内存 {result["peak_memory"] / 1024 / 1024:7.1f} MB'
+        if 'throughput_rps' in result:
+            line += f'  吞吐 {result["throughput_rps"]:8.1f} 请求/秒 (并发 {result["concurrency"]})'
+        old = (previous or {}).get('scenarios', {}).get(name)
+        if old:
+            line += '  | 对比: ' + '  '.join(
+                f'{key} {_change(old["latency_ms"][key], latency[key])}' for key in ('p50', 'p95')
+            )
+            if 'throughput_rps' in old and 'throughput_rps' in result:
+                line += f'  吞吐 {_change(old["throughput_rps"], result["throughput_rps"])}'
+
+            if old['queries']['mean'] != result['queries']['mean']:
+                line += f'  查询 {old["queries"]["mean"]:.1f}→{result["queries"]["mean"]:.1f}'
+        return line
+
+    def _load(self, path: str) -> dict:
+        try:
+            data = json.loads(Path(path).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'无法读取对比结果 {path}: {e}')
+        if data.get('version') != RESULT_VERSION:
+            raise CommandError(f'{path} 的结果格式版本不符')
+        return data
+
+    def _default_output(self, revision: dict) -> Path:
+        stamp = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+        commit = (revision['commit'] or 'unknown')[:10]
+        return Path(settings.BASE_DIR) / '.cache' / 'benchmarks' / f'{stamp}-{commit}.json'
+
+
+def _change(old: float, new: float) -> str:
+    if not old:
+        return '-'
+    return f'{(new - old) / old:+.0%}'
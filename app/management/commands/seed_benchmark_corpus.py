@@ -0,0 +1,56 @@
+"""
+Django 管理命令: 生成性能基准使用的合成语料
+
+使用方法:
+    python manage.py seed_benchmark_corpus                    # 默认 2000 篇文章
+    python manage.py seed_benchmark_corpus --articles 20000 --tags 200 --markdown-size 8000
+
+说明:
+    语料写入独立的 SQLite 文件 (默认 .cache/benchmark.sqlite3)，封面写入同名 .media/ 目录，
+    开发数据库与仓库中的 media/ 不受影响；已有的基准库会被删除重建
+    参数与随机种子相同时生成的内容相同，可在不同提交之间复用同一组参数对比
+"""
+
+import json
+import shutil
+import time
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from app.benchmarks import DEFAULT_DATABASE, benchmark_environment, media_root_for, meta_path_for, remove_database
+from app.benchmarks.corpus import seed_corpus
+
+
+class Command(BaseCommand):
+    help = '生成性能基准使用的合成语料 (独立的 SQLite 数据库)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=str(DEFAULT_DATABASE), help='基准数据库文件 (默认 .cache/benchmark.sqlite3)')
+        parser.add_argument('--articles', type=int, default=2000, help='文章数 (默认 2000)')
+        parser.add_argument('--tags', type=int, default=60, help='标签数 (默认 60)')
+        parser.add_argument('--tags-per-article', type=int, default=3, help='每篇文章的标签数 (默认 3)')
+        parser.add_argument('--markdown-size', type=int, default=3000, help='正文平均字符数 (默认 3000)')
+        parser.add_argument('--covers', type=int, default=30, help='带封面的文章数 (默认 30)')
+        parser.add_argument('--seed', type=int, default=1, help='随机种子 (默认 1)')
+
+    def handle(self, *args, **options):
+        database = Path(options['database']).resolve()
+        remove_database(database)
+        shutil.rmtree(media_root_for(database), ignore_errors=True)
+
+        start = time.perf_counter()
+        with benchmark_environment(database):
+            call_command('migrate', verbosity=0)
+            stats = seed_corpus(
+                options['articles'], options['tags'], options['tags_per_article'],
+                options['markdown_size'], options['covers'], options['seed'],
+                log=self.stdout.write,
+            )
+        meta_path_for(database).write_text(json.dumps(stats, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ 基准语料已生成 ({time.perf_counter() - start:.1f}s): {database}\n'
+            f'  {stats["articles"]} 篇文章 (可见 {stats["visible_articles"]})，{stats["tags"]} 个标签，'
+            f'平均正文 {stats["average_markdown_chars"]} 字符，{stats["covers"]} 张封面'
+        ))
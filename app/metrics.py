@@ -0,0 +1,275 @@
+"""
+Prometheus 指标
+/metrics 以文本格式(0.0.4)输出，指标保存在进程内，不依赖外部服务：
+- blog_http_requests_total / blog_http_request_duration_seconds / blog_http_response_size_bytes /
+  blog_db_queries_per_request：按 URL 名称(view)统计，由 MetricsMiddleware 记录
+- blog_cache_requests_total 与由它计算的 blog_cache_hit_ratio：响应缓存、整页缓存与 Markdown 渲染缓存
+- blog_image_processing_seconds：封面水印与衍生图生成耗时
+
+多进程：设置 METRICS_MULTIPROC_DIR 后，每个进程最多每 METRICS_FLUSH_INTERVAL 秒把自己的数值写入
+该目录下的 <pid>-<随机串>.json(原子替换)，/metrics 汇总目录中所有文件；已退出进程的文件保留，
+复用了其 pid 的新进程写入另一个文件，因此计数不会倒退。目录应在启动 worker 前清空
+"""
+
+import abc
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+from . import instrumentation
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (512, 2048, 8192, 32768, 131072, 524288, 2097152)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+IMAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class Registry:
+    """本进程的全部指标；collect() 返回(多进程时汇总后的) 指标名 -> {标签值元组: 数值}"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+        self._file_pid = None
+        self._file_name = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def snapshot(self) -> dict:
+        return {name: metric.dump() for name, metric in self.metrics.items()}
+
+    def flush(self, force: bool = False):
+        """多进程模式下把本进程的数值写入目录；未到间隔时跳过"""
+        directory = getattr(settings, "METRICS_MULTIPROC_DIR", None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0):
+            return
+        if not self._flush_lock.acquire(blocking=force):
+            return  # 其他线程正在写
+        try:
+            self._last_flush = now
+            data = {name: [[list(key), value] for key, value in values.items()]
+                    for name, values in self.snapshot().items()}
+            directory = Path(directory)
+            directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"pid": os.getpid(), "metrics": data}, f)
+            os.replace(tmp, directory / self._process_file_name())
+        finally:
+            self._flush_lock.release()
+
+    def _process_file_name(self) -> str:
+        """本进程的文件名；fork 出的子进程(可能复用已退出 worker 的 pid)换用新的文件名，不覆盖别人的计数"""
+        pid = os.getpid()
+        if self._file_pid != pid:
+            self._file_pid = pid
+            self._file_name = f"{pid}-{uuid.uuid4().hex[:12]}.json"
+        return self._file_name
+
+    def collect(self) -> dict:
+        directory = getattr(settings, "METRICS_MULTIPROC_DIR", None)
+        if not directory:
+            return self.snapshot()
+        self.flush(force=True)
+        merged = {name: {} for name in self.metrics}
+        for path in sorted(Path(directory).glob("*.json")):
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))["metrics"]
+            except (OSError, ValueError, KeyError):
+                continue  # 写入中途被读到或格式不对的文件
+            for name, samples in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue  # 旧版本代码留下的指标
+                values = merged[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    values[key] = metric.merge(values[key], value) if key in values else value
+        return merged
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush, force=True)
+
+
+class Metric(abc.ABC):
+    """指标基类：子类给出 type，并实现数值的合并(多进程汇总)与文本格式输出"""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def dump(self) -> dict:
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    def _copy(self, value):
+        return value
+
+    @abc.abstractmethod
+    def merge(self, a, b):
+        """合并两个进程中同一标签组合的数值"""
+
+    @abc.abstractmethod
+    def exposition(self, values: dict) -> list:
+        """把 {标签值元组: 数值} 输出为文本格式的行(不含 HELP/TYPE)"""
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, a, b):
+        return a + b
+
+    def exposition(self, values: dict) -> list:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    """数值为 [各桶计数(非累计，最后一个为 +Inf), 总和]"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS,
+                 registry: Registry = REGISTRY):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _copy(self, value):
+        return [list(value[0]), value[1]]
+
+    def merge(self, a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1]]
+
+    def exposition(self, values: dict) -> list:
+        lines = []
+        bounds = [_number(b) for b in self.buckets] + ["+Inf"]
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+http_requests = Counter(
+    "blog_http_requests_total", "HTTP requests by URL name, method and status.", ("view", "method", "status"),
+)
+http_duration = Histogram(
+    "blog_http_request_duration_seconds", "HTTP request latency by URL name.", ("view",),
+)
+http_response_size = Histogram(
+    "blog_http_response_size_bytes", "HTTP response body size by URL name.", ("view",), buckets=SIZE_BUCKETS,
+)
+db_queries = Histogram(
+    "blog_db_queries_per_request", "SQL queries per HTTP request by URL name.", ("view",), buckets=QUERY_BUCKETS,
+)
+cache_requests = Counter(
+    "blog_cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"),
+)
+image_processing = Histogram(
+    "blog_image_processing_seconds", "Cover image processing time by step.", ("step",), buckets=IMAGE_BUCKETS,
+)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """记一次缓存查找：计入 /metrics，并计入当前请求的 Server-Timing"""
+    result = "hit" if hit else "miss"
+    cache_requests.inc(cache=cache, result=result)
+    instrumentation.count(f"cache_{result}")
+
+
+def record_request(view: str, method: str, status: int, seconds: float, size, queries: int):
+    """size 为 None 表示流式响应，不统计大小"""
+    http_requests.inc(view=view, method=method if method in _KNOWN_METHODS else "other", status=status)
+    http_duration.observe(seconds, view=view)
+    if size is not None:
+        http_response_size.observe(size, view=view)
+    db_queries.observe(queries, view=view)
+    REGISTRY.flush()
+
+
+def exposition(registry: Registry = REGISTRY) -> str:
+    values = registry.collect()
+    lines = []
+    for name, metric in registry.metrics.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        lines.extend(metric.exposition(values.get(name, {})))
+
+    # 命中率由汇总后的计数计算，多进程时也是全局命中率
+    totals = {}
+    for (cache, result), count in values.get(cache_requests.name, {}).items():
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == "hit" else 0), lookups + count)
+    lines.append("# HELP blog_cache_hit_ratio Cache hit ratio over all recorded lookups.")
+    lines.append("# TYPE blog_cache_hit_ratio gauge")
+    for cache, (hits, lookups) in sorted(totals.items()):
+        lines.append(f'blog_cache_hit_ratio{{cache="{_escape(cache)}"}} {_number(hits / lookups if lookups else 0.0)}')
+    return "\n".join(lines) + "\n"
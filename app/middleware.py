@@ -0,0 +1,294 @@
+"""
+中间件
+
+PageCacheMiddleware：匿名访客 GET 公开页面的整页缓存(需在 settings 中开启 PAGE_CACHE_ENABLED)
+命中时直接返回缓存的响应体(同时保存原文与 gzip 压缩版本)，不经过会话、ORM 与模板引擎；
+缓存键 = 路径 + 查询参数 + 所属失效范围的令牌，失效规则见 app/caching.py 与 app/signals.py
+
+AssetCacheControlMiddleware：由 Django 直接提供的 static/media 文件，带内容哈希的
+使用 Cache-Control: immutable 长期缓存，其余每次协商(no-cache)
+
+MetricsMiddleware：按 URL 名称统计请求数、耗时、响应大小与查询数，由 /metrics 输出(app/metrics.py)
+
+ServerTimingMiddleware：统计每个请求的 SQL 次数与耗时、Markdown / bleach / 模板耗时和缓存命中，
+写入 Server-Timing 响应头；超过 SLOW_REQUEST_THRESHOLD_MS 的请求以 JSON 记入 app.requests 日志
+
+以上中间件同时支持 WSGI 与 ASGI：在 ASGI 下以异步方式接入，不会迫使异步视图退回线程中执行
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+from urllib.parse import urlparse
+
+from . import instrumentation, metrics
+from .caching import (
+    LIST_SCOPE, STATIC_SCOPE, TAGS_SCOPE, article_scope, page_scope_tokens, tag_scope,
+)
+from .metrics import record_cache_lookup
+from .static_build.fingerprint import IMMUTABLE_CACHE_CONTROL, is_immutable
+
+_ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+# 不随缓存保存的响应头；Vary 照常保存，返回时再加上 Accept-Encoding
+_SKIPPED_HEADERS = {"content-length", "content-encoding", "set-cookie", "x-page-cache", "server-timing"}
+
+request_logger = logging.getLogger("app.requests")
+
+
+class SyncAndAsyncMiddleware:
+    """下一层为协程函数(ASGI)时 __call__ 转到 __acall__，否则按同步方式处理"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+class PageCacheMiddleware(SyncAndAsyncMiddleware):
+    """公开页面的整页缓存，应放在 SessionMiddleware 之前"""
+
+    GZIP_MIN_LENGTH = 200
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PAGE_CACHE_ENABLED", False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.timeout = getattr(settings, "PAGE_CACHE_TIMEOUT", 600)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        scopes = self._scopes(request)
+        if scopes is None:
+            return self.get_response(request)
+
+        key = self._cache_key(request, scopes)
+        entry = cache.get(key)
+        record_cache_lookup("page", entry is not None)
+        if entry is not None:
+            return self._respond(request, entry, hit=True)
+
+        response = self.get_response(request)
+        if not self._storable(response):
+            return response
+        entry = self._make_entry(response)
+        cache.set(key, entry, self.timeout)
+        return self._respond(request, entry, hit=False)
+
+    async def __acall__(self, request):
+        scopes = self._scopes(request)
+        if scopes is None:
+            return await self.get_response(request)
+
+        key = await sync_to_async(self._cache_key)(request, scopes)
+        entry = await cache.aget(key)
+        record_cache_lookup("page", entry is not None)
+        if entry is not None:
+            return self._respond(request, entry, hit=True)
+
+        response = await self.get_response(request)
+        if not self._storable(response):
+            return response
+        entry = self._make_entry(response)
+        await cache.aset(key, entry, self.timeout)
+        return self._respond(request, entry, hit=False)
+
+    def _scopes(self, request):
+        """可缓存的请求返回其失效范围列表，否则返回 None"""
+        if request.method not in ("GET", "HEAD"):
+            return None
+        # 带会话 cookie 的请求(如已登录的管理员)可能看到个性化内容，不走缓存
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        # 整页缓存命中时不经过 URL 解析，供 MetricsMiddleware 取 URL 名称
+        request.resolver_match = match
+        name = match.url_name
+        if name == "article_detail":
+            return [article_scope(match.kwargs["pk"])]
+        if name == "article_list":
+            tag = request.GET.get("tag")
+            return [tag_scope(tag) if tag else LIST_SCOPE, TAGS_SCOPE]
+        if name in ("index", "about"):
+            return [STATIC_SCOPE]
+        return None
+
+    def _cache_key(self, request, scopes) -> str:
+        query = "&".join(sorted(request.META.get("QUERY_STRING", "").split("&")))
+        raw = "|".join([request.path, query, *page_scope_tokens(scopes)])
+        return "pagecache:page:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _storable(self, response) -> bool:
+        if response.status_code != 200 or response.streaming or response.cookies:
+            return False
+        cache_control = response.get("Cache-Control", "")
+        return "private" not in cache_control and "no-store" not in cache_control
+
+    def _make_entry(self, response) -> dict:
+        content = response.content
+        compressed = None
+        if len(content) >= self.GZIP_MIN_LENGTH:
+            compressed = gzip.compress(content, compresslevel=6, mtime=0)
+        headers = {k: v for k, v in response.items() if k.lower() not in _SKIPPED_HEADERS}
+        return {"content": content, "gzip": compressed, "headers": headers}
+
+    def _respond(self, request, entry, hit: bool):
+        use_gzip = entry["gzip"] is not None and _ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        response = HttpResponse(entry["gzip"] if use_gzip else entry["content"])
+        for header, value in entry["headers"].items():
+            response[header] = value
+        if use_gzip:
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        response["X-Page-Cache"] = "HIT" if hit else "MISS"
+        last_modified = parse_http_date_safe(entry["headers"].get("Last-Modified", ""))
+        return get_conditional_response(
+            request, etag=entry["headers"].get("ETag"), last_modified=last_modified, response=response
+        )
+
+
+class AssetCacheControlMiddleware(SyncAndAsyncMiddleware):
+    """static/media 文件的缓存头；HTML 页面不经过这里(由条件请求装饰器负责)"""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.prefixes = tuple(
+            "/" + urlparse(url).path.lstrip("/")
+            for url in (settings.STATIC_URL, settings.MEDIA_URL)
+            if url and not urlparse(url).netloc
+        )
+        if not self.prefixes:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self._patch(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._patch(request, await self.get_response(request))
+
+    def _patch(self, request, response):
+        if request.path.startswith(self.prefixes) and response.status_code in (200, 304):
+            if is_immutable(request.path):
+                response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            elif not response.has_header("Cache-Control"):
+                response["Cache-Control"] = "no-cache"
+        return response
+
+
+class MetricsMiddleware(SyncAndAsyncMiddleware):
+    """/metrics 的请求指标，应放在最前面"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with instrumentation.track_queries(connection), instrumentation.collect() as timings:
+            response = self.get_response(request)
+        return self._record(request, response, timings)
+
+    async def __acall__(self, request):
+        # 异步视图的查询在其他线程的连接上执行，由连接上常驻的 db_wrapper 计入
+        with instrumentation.collect() as timings:
+            response = await self.get_response(request)
+        return self._record(request, response, timings)
+
+    def _record(self, request, response, timings):
+        match = getattr(request, "resolver_match", None)
+        metrics.record_request(
+            view=match.view_name if match else "unmatched",
+            method=request.method,
+            status=response.status_code,
+            seconds=timings.total,
+            size=None if response.streaming else len(response.content),
+            queries=timings.counts.get("db", 0),
+        )
+        return response
+
+
+class ServerTimingMiddleware(SyncAndAsyncMiddleware):
+    """
+    请求耗时分段，应放在最前面(整页缓存命中也会统计)
+    分段计时见 app/instrumentation.py：查询由 execute_wrapper 计时，Markdown / bleach / 模板在渲染代码中计时，
+    每个请求只多一次 contextvar 切换与每条查询一次函数调用，可以常驻生产环境
+    """
+
+    # (分段名, Server-Timing 中的说明)
+    SEGMENTS = (("markdown", "markdown"), ("bleach", "sanitize"), ("template", "template"))
+
+    def __init__(self, get_response):
+        self.header = getattr(settings, "SERVER_TIMING_HEADER", True)
+        self.threshold = getattr(settings, "SLOW_REQUEST_THRESHOLD_MS", None)
+        if not getattr(settings, "SERVER_TIMING_ENABLED", False) or not (self.header or self.threshold is not None):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with instrumentation.track_queries(connection), instrumentation.collect() as timings:
+            response = self.get_response(request)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        with instrumentation.collect() as timings:
+            response = await self.get_response(request)
+        return self._finish(request, response, timings)
+
+    def _finish(self, request, response, timings):
+        if self.header:
+            response["Server-Timing"] = self.format_header(timings)
+        if self.threshold is not None and timings.total * 1000 >= self.threshold:
+            self.log_slow(request, response, timings)
+        return response
+
+    @classmethod
+    def format_header(cls, timings) -> str:
+        durations, counts = timings.durations, timings.counts
+        queries = counts.get("db", 0)
+        metrics = [f'db;dur={durations.get("db", 0.0) * 1000:.1f};desc="{queries} queries"']
+        for name, desc in cls.SEGMENTS:
+            if name in durations:
+                metrics.append(f'{name};dur={durations[name] * 1000:.1f};desc="{desc}"')
+        hits, misses = counts.get("cache_hit", 0), counts.get("cache_miss", 0)
+        if hits or misses:
+            metrics.append(f'cache;desc="hit={hits} miss={misses}"')
+        metrics.append(f"total;dur={timings.total * 1000:.1f}")
+        return ", ".join(metrics)
+
+    def log_slow(self, request, response, timings):
+        data = timings.as_dict()
+        request_logger.warning(json.dumps({
+            "event": "slow_request",
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "duration_ms": round(data.pop("total") * 1000, 1),
+            "queries": data.pop("queries"),
+            "segments_ms": {name: round(seconds * 1000, 1) for name, seconds in data.items()},
+            "cache": {"hits": timings.counts.get("cache_hit", 0), "misses": timings.counts.get("cache_miss", 0)},
+        }, ensure_ascii=False))
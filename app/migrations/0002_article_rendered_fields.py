@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='content_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='渲染后的 HTML'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='reading_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='阅读时长（分钟）'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='summary',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='摘要'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='字数'),
+        ),
+    ]
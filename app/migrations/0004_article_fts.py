@@ -0,0 +1,38 @@
+# 全文检索：SQLite FTS5 虚拟表，并为已有文章建立索引
+
+from django.db import migrations
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from app.search import FTS_TABLE, index_text
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, body, tokenize='unicode61')"
+    )
+    Article = apps.get_model('app', 'Article')
+    for article in Article.objects.only('pk', 'title', 'content_md').iterator():
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+            [article.pk, index_text(article.title), index_text(article.content_md)],
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from app.search import FTS_TABLE
+
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_article_published_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
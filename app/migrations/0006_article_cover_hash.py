@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='cover_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='封面哈希'),
+        ),
+    ]
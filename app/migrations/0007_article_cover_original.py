@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_article_cover_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='cover_original',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='封面原图'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='cover_source_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='封面原图哈希'),
+        ),
+    ]
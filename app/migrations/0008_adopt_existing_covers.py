@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# 与 app.images.LEGACY_SOURCE_HASH 相同；迁移中不引用应用代码，取值在此固定
+LEGACY_SOURCE_HASH = 'legacy'
+
+
+def mark_existing_covers(apps, schema_editor):
+    """
+    已有封面在旧版 save() 中已加过水印：只在数据库里做标记，不读写文件。
+    process_cover 遇到标记时把当前文件记为原图、不重画；process_covers --adopt 可以提前完成这一步
+    """
+    Article = apps.get_model('app', 'Article')
+    Article.objects.filter(cover_source_hash='').exclude(cover__isnull=True).exclude(cover='') \
+        .update(cover_source_hash=LEGACY_SOURCE_HASH)
+
+
+def unmark_existing_covers(apps, schema_editor):
+    Article = apps.get_model('app', 'Article')
+    Article.objects.filter(cover_source_hash=LEGACY_SOURCE_HASH).update(cover_source_hash='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_article_cover_original'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_existing_covers, unmark_existing_covers),
+    ]
@@ -1,10 +1,19 @@
 from django.db import models
 from django.utils import timezone
 from django.core.validators import MinLengthValidator
-from PIL import Image, ImageDraw, ImageFont
-from pathlib import Path
-from django.conf import settings
-import os
+from django.db import transaction
+import math
+import re
+
+from .images import enqueue_cover_processing
+from .rendering import cache_key, html_to_text, render_markdown
+
+SUMMARY_LENGTH = 200
+# 阅读速度：中文按字、英文按词计
+CJK_CHARS_PER_MINUTE = 400
+WORDS_PER_MINUTE = 200
+_CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+_WORD_RE = re.compile(r'[A-Za-z0-9]+(?:[\'\-][A-Za-z0-9]+)*')
 
 
 def upload_cover_path(instance, filename):
@@ -16,6 +25,7 @@ class Tag(models.Model):
     """标签模型：用于对文章进行分类与筛选"""
     name = models.CharField("名称", max_length=32, unique=True)
     created_at = models.DateTimeField("创建时间", auto_now_add=True)
+    updated_at = models.DateTimeField("更新时间", auto_now=True)
 
     class Meta:
         ordering = ["name"]
@@ -26,6 +36,22 @@ class Tag(models.Model):
         return self.name
 
 
+class ArticleQuerySet(models.QuerySet):
+    """文章查询集：页面、接口与静态构建共用的查询构造"""
+
+    def visible(self):
+        return self.filter(is_hidden=False)
+
+    def for_listing(self):
+        """列表场景：只取可见文章，不加载正文，标签一次性预取(避免逐篇查询)"""
+        return (
+            self.visible()
+            .defer("content_md", "content_html")
+            .prefetch_related("tags")
+            .order_by("-published_at")
+        )
+
+
 class Article(models.Model):
     """文章模型：存储 Markdown 内容、封面、标签与发布时间"""
     title = models.CharField("标题", max_length=200, blank=True, default='')
@@ -34,43 +60,94 @@ class Article(models.Model):
     tags = models.ManyToManyField(Tag, verbose_name="标签", blank=True, related_name="articles")
     published_at = models.DateTimeField("发布时间", default=timezone.now)
     is_hidden = models.BooleanField("是否隐藏", default=False)
+    # 内容、可见性或标签变化时更新，用作 ETag / Last-Modified 的依据
+    updated_at = models.DateTimeField("更新时间", auto_now=True)
     # allow_comment 字段已移除（评论功能已删除）
 
+    objects = ArticleQuerySet.as_manager()
+
+    # 以下字段在 save() 时由 content_md 派生，列表页与详情页直接读取，无需每次渲染
+    content_html = models.TextField("渲染后的 HTML", blank=True, default='', editable=False)
+    summary = models.TextField("摘要", blank=True, default='', editable=False)
+    word_count = models.PositiveIntegerField("字数", default=0, editable=False)
+    reading_minutes = models.PositiveIntegerField("阅读时长（分钟）", default=0, editable=False)
+    content_hash = models.CharField("内容哈希", max_length=64, blank=True, default='', editable=False)
+    # 封面文件内容哈希，对应 media/covers/_variants/<哈希>/ 下的衍生图
+    cover_hash = models.CharField("封面哈希", max_length=64, blank=True, default='', editable=False)
+    # 上传原图的内容哈希与保存位置(media/covers/_originals/)；为空表示封面尚未加水印，
+    # "legacy" 表示升级前已带水印、尚未记录原图的旧封面(见 images.LEGACY_SOURCE_HASH)
+    cover_source_hash = models.CharField("封面原图哈希", max_length=64, blank=True, default='', editable=False)
+    cover_original = models.CharField("封面原图", max_length=255, blank=True, default='', editable=False)
+
+    RENDERED_FIELDS = ("content_html", "summary", "word_count", "reading_minutes", "content_hash")
+    COVER_STATE_FIELDS = ("cover_hash", "cover_source_hash", "cover_original")
+
     class Meta:
         ordering = ["-published_at"]
+        # 游标分页按 (published_at, id) 倒序定位
+        indexes = [models.Index(fields=["-published_at", "-id"], name="article_published_id_idx")]
         verbose_name = "文章"
         verbose_name_plural = "文章"
 
     def __str__(self):
         return self.title
 
+    @property
+    def rendered_html(self) -> str:
+        """详情页 HTML：派生字段与当前内容、渲染配置一致时直接使用，否则现场渲染"""
+        if self.content_html and self.content_hash == cache_key(self.content_md):
+            return self.content_html
+        return render_markdown(self.content_md)
+
+    def refresh_rendered_fields(self, force: bool = False) -> bool:
+        """按 content_md 重新计算派生字段，内容未变化时跳过，返回是否有更新"""
+        new_hash = cache_key(self.content_md)
+        if not force and new_hash == self.content_hash:
+            return False
+        self.content_html = render_markdown(self.content_md)
+        text = html_to_text(self.content_html)
+        self.summary = text[:SUMMARY_LENGTH] + "..." if len(text) > SUMMARY_LENGTH else text
+        cjk = len(_CJK_RE.findall(text))
+        words = len(_WORD_RE.findall(text))
+        self.word_count = cjk + words
+        self.reading_minutes = max(1, math.ceil(cjk / CJK_CHARS_PER_MINUTE + words / WORDS_PER_MINUTE)) if self.word_count else 0
+        self.content_hash = new_hash
+        return True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录库中的封面名称，save() 据此判断是否换了封面
+        if "cover" in field_names:
+            instance._loaded_cover = values[field_names.index("cover")] or ""
+        return instance
+
+    def _cover_changed(self) -> bool:
+        if "cover" in self.get_deferred_fields():
+            return False
+        if self.cover and not self.cover._committed:
+            return True
+        return (self.cover.name or "") != getattr(self, "_loaded_cover", "")
+
     def save(self, *args, **kwargs):
-        """保存后为封面写入网站名称水印"""
+        """
+        保存前刷新渲染派生字段；换了封面时清空封面处理状态，
+        事务提交后交给后台线程池保存原图、加水印、生成衍生图
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content_md" in update_fields:
+            if self.refresh_rendered_fields() and update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | set(self.RENDERED_FIELDS)
+        cover_changed = (update_fields is None or "cover" in update_fields) and self._cover_changed()
+        if cover_changed:
+            self.cover_hash = self.cover_source_hash = self.cover_original = ""
+            if update_fields is not None:
+                kwargs["update_fields"] = set(kwargs["update_fields"]) | set(self.COVER_STATE_FIELDS)
         super().save(*args, **kwargs)
-        if self.cover:
-            try:
-                cover_path = Path(settings.MEDIA_ROOT) / self.cover.name
-                if cover_path.exists():
-                    img = Image.open(cover_path).convert("RGBA")
-                    watermark_text = "盘古大仙洞府"
-                    # 动态计算字号
-                    font_size = max(14, int(min(img.size) * 0.04))
-                    try:
-                        font = ImageFont.truetype("Arial.ttf", font_size)
-                    except Exception:
-                        font = ImageFont.load_default()
-                    text_layer = Image.new("RGBA", img.size, (255, 255, 255, 0))
-                    draw = ImageDraw.Draw(text_layer)
-                    text_w, text_h = draw.textsize(watermark_text, font=font)
-                    margin = int(min(img.size) * 0.02)
-                    x = img.width - text_w - margin
-                    y = img.height - text_h - margin
-                    draw.text((x, y), watermark_text, font=font, fill=(255, 255, 255, 120))
-                    watermarked = Image.alpha_composite(img, text_layer).convert("RGB")
-                    watermarked.save(cover_path)
-            except Exception:
-                # 忽略水印异常，确保保存流程不被阻断
-                pass
+        self._loaded_cover = self.cover.name or ""
+        if cover_changed and self.cover:
+            pk = self.pk
+            transaction.on_commit(lambda: enqueue_cover_processing(pk))
 
 
 # 评论和留言板功能已移除
@@ -0,0 +1,94 @@
+"""
+游标(keyset)分页
+按 (published_at, id) 倒序定位下一页：不做 COUNT(*)，也不使用 OFFSET，
+翻到多深都只读取一页的数据。游标对客户端不透明，只需原样回传
+
+异步视图(app/async_api_views.py)使用的 apaginate_by_cursor 与 aget_page 与同步版本结果相同
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+
+CURSOR_ORDERING = ("-published_at", "-id")
+# BigAutoField 的上限
+MAX_PK = 2 ** 63
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(article) -> str:
+    raw = f"{article.published_at.isoformat()}|{article.pk}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """返回 (published_at, id)；时间不带时区或 id 超出主键范围的也视为无效(否则到数据库才报错)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        published_at, pk = raw.rsplit("|", 1)
+        published_at, pk = datetime.fromisoformat(published_at), int(pk)
+    except (ValueError, UnicodeError, binascii.Error) as e:
+        raise InvalidCursor(cursor) from e
+    if published_at.tzinfo is None or not 0 < pk < MAX_PK:
+        raise InvalidCursor(cursor)
+    return published_at, pk
+
+
+class CursorPage:
+    """一页结果：与 Paginator 的 Page 一样提供 object_list，另带下一页游标"""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _after_cursor(qs, cursor: str, per_page: int):
+    qs = qs.order_by(*CURSOR_ORDERING)
+    if cursor:
+        published_at, pk = decode_cursor(cursor)
+        qs = qs.filter(Q(published_at__lt=published_at) | Q(published_at=published_at, id__lt=pk))
+    return qs[:per_page + 1]
+
+
+def _cursor_page(items: list, per_page: int) -> CursorPage:
+    next_cursor = encode_cursor(items[per_page - 1]) if len(items) > per_page else None
+    return CursorPage(items[:per_page], next_cursor)
+
+
+def paginate_by_cursor(qs, cursor: str = "", per_page: int = 10) -> CursorPage:
+    """取 cursor 之后的一页，cursor 为空表示第一页；多取一条用于判断是否还有下一页"""
+    return _cursor_page(list(_after_cursor(qs, cursor, per_page)), per_page)
+
+
+async def apaginate_by_cursor(qs, cursor: str = "", per_page: int = 10) -> CursorPage:
+    return _cursor_page([item async for item in _after_cursor(qs, cursor, per_page)], per_page)
+
+
+async def aget_page(qs, number, per_page: int) -> Page:
+    """Paginator(qs, per_page).get_page(number) 的异步版本：先取总数确定页码，再读取该页"""
+    paginator = Paginator(qs, per_page)
+    paginator.count = await qs.acount()
+    try:
+        number = paginator.validate_number(number)
+    except PageNotAnInteger:
+        number = 1
+    except EmptyPage:
+        number = paginator.num_pages
+    bottom = (number - 1) * per_page
+    return Page([item async for item in qs[bottom:bottom + per_page]], number, paginator)
@@ -0,0 +1,171 @@
+"""
+Markdown 渲染服务
+视图与静态站点构建共用同一套 Markdown -> 安全 HTML 流水线，
+结果按 "内容哈希 + 扩展/清洗配置" 缓存：进程内 LRU 在前，磁盘存储在后，
+未修改的文章在请求之间、进程之间、多次构建之间都不会被重复渲染
+"""
+
+import hashlib
+import html
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import bleach
+import markdown as md
+from django.conf import settings
+
+from .instrumentation import timed
+from .metrics import record_cache_lookup
+
+MARKDOWN_EXTENSIONS = ['extra', 'fenced_code', 'tables', 'codehilite']
+
+ALLOWED_TAGS = bleach.sanitizer.ALLOWED_TAGS.union({
+    'p', 'pre', 'code', 'img', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td', 'blockquote'
+})
+ALLOWED_ATTRIBUTES = {'*': ['class', 'id'], 'img': ['src', 'alt']}
+
+
+def _library_versions() -> dict:
+    """渲染结果依赖的库版本，升级后旧缓存自动失效"""
+    versions = {'markdown': md.__version__, 'bleach': bleach.__version__}
+    try:
+        import pygments  # codehilite 的代码高亮依赖，可选
+        versions['pygments'] = pygments.__version__
+    except ImportError:
+        versions['pygments'] = None
+    return versions
+
+
+# 渲染配置指纹：扩展、白名单或库版本任何变化都会得到不同的缓存键
+CONFIG_FINGERPRINT = hashlib.sha256(json.dumps({
+    'extensions': MARKDOWN_EXTENSIONS,
+    'tags': sorted(ALLOWED_TAGS),
+    'attributes': ALLOWED_ATTRIBUTES,
+    'versions': _library_versions(),
+}, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """进程内 LRU + 磁盘存储的两级缓存，附带命中统计"""
+
+    def __init__(self, max_entries: int, directory):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return self._memory[key]
+        html = self._read_disk(key)
+        with self._lock:
+            if html is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+        self._remember(key, html)
+        return html
+
+    def set(self, key: str, html: str):
+        self._remember(key, html)
+        self._write_disk(key, html)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """清空进程内缓存与统计(磁盘缓存保留)"""
+        with self._lock:
+            self._memory.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def _remember(self, key: str, html: str):
+        with self._lock:
+            self._memory[key] = html
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f'{key}.html'
+
+    def _read_disk(self, key: str):
+        if not self.directory:
+            return None
+        try:
+            return self._path(key).read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, html: str):
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再 rename，并发进程不会读到半个文件
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(tmp, path)
+        except OSError:
+            # 磁盘缓存只是加速手段，写失败不影响渲染结果
+            pass
+
+
+_cache = RenderCache(
+    max_entries=getattr(settings, 'MARKDOWN_CACHE_SIZE', 256),
+    directory=getattr(settings, 'MARKDOWN_CACHE_DIR', None),
+)
+
+
+def cache_key(content_md: str) -> str:
+    """缓存键：Markdown 原文哈希 + 渲染配置指纹"""
+    h = hashlib.sha256(CONFIG_FINGERPRINT.encode('ascii'))
+    h.update((content_md or '').encode('utf-8'))
+    return h.hexdigest()
+
+
+def render_markdown_uncached(content_md: str) -> str:
+    """Markdown -> 经 bleach 清洗的安全 HTML(不走缓存)"""
+    with timed('markdown'):
+        html = md.markdown(content_md or '', extensions=MARKDOWN_EXTENSIONS)
+    with timed('bleach'):
+        return bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+
+
+def html_to_text(html_content: str) -> str:
+    """HTML -> 纯文本(去标签、反转义、合并空白)，用于摘要与检索片段"""
+    with timed('bleach'):
+        text = html.unescape(bleach.clean(html_content or '', tags=set(), strip=True))
+    return ' '.join(text.split())
+
+
+def render_markdown(content_md: str) -> str:
+    """Markdown -> 安全 HTML，优先读缓存"""
+    key = cache_key(content_md)
+    html = _cache.get(key)
+    record_cache_lookup('markdown', html is not None)
+    if html is None:
+        html = render_markdown_uncached(content_md)
+        _cache.set(key, html)
+    return html
+
+
+def cache_stats() -> dict:
+    """渲染缓存命中统计，供监控使用"""
+    return _cache.stats()
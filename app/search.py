@@ -0,0 +1,192 @@
+"""
+全文检索 (SQLite FTS5)
+文章标题与正文按 CJK 二元切分(bigram)后写入 FTS5 虚拟表 app_article_fts，
+rowid 与 Article.id 一致。索引由 signals 在保存/删除文章时同步，
+/api/search/ 与后台文章搜索共用本模块，不依赖任何外部服务
+"""
+
+import html
+import math
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "app_article_fts"
+# bm25 权重：标题命中比正文命中更重要
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+SNIPPET_RADIUS = 60
+
+_CJK = r"㐀-䶿一-鿿豈-﫿぀-ヿ가-힯"
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|[^\W{_CJK}_]+")
+_CJK_RUN_RE = re.compile(rf"[{_CJK}]+")
+
+
+def tokenize(text: str) -> list:
+    """
+    切分为检索词：拉丁字母/数字按词(小写)，连续 CJK 字符按相邻二元组，
+    每段 CJK 末尾再补一个单字，保证单字查询用前缀匹配也能命中任意位置
+    例：'盘古大仙 Django' -> ['盘古', '古大', '大仙', '仙', 'django']
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall(text or ""):
+        if _CJK_RUN_RE.fullmatch(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+def is_cjk(text: str) -> bool:
+    return bool(_CJK_RUN_RE.fullmatch(text))
+
+
+def index_text(text: str) -> str:
+    """写入 FTS 的文本：空格分隔的检索词，交给 unicode61 分词器按空格切开"""
+    return " ".join(tokenize(text))
+
+
+def build_match_query(query: str):
+    """
+    把用户输入转换为 FTS5 MATCH 表达式，无有效检索词时返回 None
+    每个以空格分隔的词转为一个短语(二元组须连续出现)，多个词之间为 AND；
+    单个 CJK 字符使用前缀匹配
+    """
+    clauses = []
+    for term in (query or "").split():
+        for run in _TOKEN_RE.findall(term):
+            if _CJK_RUN_RE.fullmatch(run):
+                if len(run) == 1:
+                    clauses.append(f'"{run}" *')
+                else:
+                    clauses.append('"%s"' % " ".join(run[i:i + 2] for i in range(len(run) - 1)))
+            else:
+                clauses.append(f'"{run.lower()}"')
+    return " AND ".join(clauses) or None
+
+
+def is_available() -> bool:
+    """FTS5 仅在 SQLite 上启用"""
+    return connection.vendor == "sqlite"
+
+
+def index_article(article):
+    """写入或覆盖一篇文章的索引(隐藏文章同样索引，查询时按可见性过滤)"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [article.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+            [article.pk, index_text(article.title), index_text(article.content_md)],
+        )
+
+
+def remove_article(pk: int):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def rebuild_index(articles) -> int:
+    """清空后按传入的文章重建索引，返回写入篇数"""
+    rows = [(a.pk, index_text(a.title), index_text(a.content_md)) for a in articles]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)", rows)
+    return len(rows)
+
+
+def _match_sql(visible_only: bool) -> str:
+    sql = (
+        f"FROM {FTS_TABLE} f JOIN app_article a ON a.id = f.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s"
+    )
+    if visible_only:
+        sql += " AND a.is_hidden = 0"
+    return sql
+
+
+def count_matches(match: str, visible_only: bool = True) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) {_match_sql(visible_only)}", [match])
+        return cursor.fetchone()[0]
+
+
+def matching_ids(match: str) -> RawSQL:
+    """命中文章 id 的子查询(含隐藏文章)，用于 pk__in 过滤，匹配留在 SQLite 中完成"""
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+
+
+def search_ids(match: str, limit: int = None, offset: int = 0, visible_only: bool = True) -> list:
+    """按 bm25 相关度排序返回 [(文章 id, 得分), ...]，得分越小越相关"""
+    sql = (
+        f"SELECT f.rowid, bm25({FTS_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+        f"{_match_sql(visible_only)} ORDER BY score, f.rowid DESC"
+    )
+    params = [match]
+    if limit is not None:
+        sql += " LIMIT %s OFFSET %s"
+        params += [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search(query: str, page: int = 1, per_page: int = 10) -> dict:
+    """
+    分页检索可见文章
+    返回 {'articles': [...], 'scores': {...}, 'total_count', 'total_pages', 'page'}
+    """
+    from .models import Article
+
+    match = build_match_query(query)
+    total = count_matches(match) if match else 0
+    total_pages = max(1, math.ceil(total / per_page))
+    page = min(max(1, page), total_pages)
+    hits = search_ids(match, per_page, (page - 1) * per_page) if total else []
+    # 命中的一页需要正文来截取片段，按页最多 per_page 篇，完整加载
+    by_id = Article.objects.visible().prefetch_related("tags").in_bulk([pk for pk, _ in hits])
+    return {
+        "articles": [by_id[pk] for pk, _ in hits if pk in by_id],
+        "scores": dict(hits),
+        "total_count": total,
+        "total_pages": total_pages,
+        "page": page,
+    }
+
+
+def _term_pattern(query: str):
+    terms = sorted({t for t in (query or "").split() if t}, key=len, reverse=True)
+    if not terms:
+        return None
+    return re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+
+
+def highlight(text: str, query: str) -> str:
+    """HTML 转义后用 <mark> 包裹命中的查询词"""
+    pattern = _term_pattern(query)
+    if pattern is None:
+        return html.escape(text)
+    parts = []
+    last = 0
+    for m in pattern.finditer(text):
+        parts.append(html.escape(text[last:m.start()]))
+        parts.append(f"<mark>{html.escape(m.group(0))}</mark>")
+        last = m.end()
+    parts.append(html.escape(text[last:]))
+    return "".join(parts)
+
+
+def snippet(text: str, query: str, radius: int = SNIPPET_RADIUS) -> str:
+    """截取第一个命中位置附近的片段并高亮，未命中时取开头"""
+    text = " ".join((text or "").split())
+    pattern = _term_pattern(query)
+    m = pattern.search(text) if pattern else None
+    start = max(0, m.start() - radius) if m else 0
+    end = min(len(text), (m.end() if m else 0) + radius * 2)
+    fragment = highlight(text[start:end], query)
+    return ("..." if start > 0 else "") + fragment + ("..." if end < len(text) else "")
@@ -0,0 +1,143 @@
+"""
+接口数据序列化
+在线 API (app/api_views.py) 与静态导出 (generate_static_site 写出的 api/*.json) 共用，
+保证两者的响应结构完全一致；文件地址由调用方传入的 media_url(相对 MEDIA_ROOT 的文件名) 生成：
+在线接口返回绝对地址，静态导出返回站内相对地址(带指纹)
+"""
+
+from .images import load_variants
+
+# 批量接口可选的字段，按此顺序输出
+BATCH_FIELDS = (
+    "id", "title", "summary", "content_md", "cover", "cover_variants", "word_count", "reading_minutes",
+    "published_at", "tags", "allow_comment",
+)
+# 未指定字段时与详情接口相同(不含已废弃的 comments)
+DEFAULT_BATCH_FIELDS = ("id", "title", "content_md", "cover", "cover_variants", "published_at", "tags", "allow_comment")
+# 字段 -> 需要读取的列，未列出的字段不读库
+BATCH_FIELD_COLUMNS = {
+    "title": ("title",),
+    "summary": ("summary",),
+    "content_md": ("content_md",),
+    "cover": ("cover", "cover_hash"),
+    "cover_variants": ("cover", "cover_hash"),
+    "word_count": ("word_count",),
+    "reading_minutes": ("reading_minutes",),
+    "published_at": ("published_at",),
+}
+
+
+def serialize_tag(tag) -> dict:
+    return {"id": tag.id, "name": tag.name}
+
+
+def serialize_cover(article, media_url) -> dict:
+    """封面原图地址与衍生图列表(由小到大)，衍生图尚未生成时为空列表"""
+    if not article.cover:
+        return {"cover": "", "cover_variants": []}
+    info = load_variants(article.cover_hash)
+    return {
+        "cover": media_url(article.cover.name),
+        "cover_variants": [{
+            "width": v["width"],
+            "height": v["height"],
+            "webp": media_url(v["webp"]),
+            "jpeg": media_url(v["jpeg"]),
+        } for v in (info["variants"] if info else [])],
+    }
+
+
+def serialize_article_item(article, media_url) -> dict:
+    """列表中的一篇文章(需预取 tags)"""
+    return {
+        "id": article.id,
+        "title": article.title,
+        **serialize_cover(article, media_url),
+        "summary": article.summary,
+        "word_count": article.word_count,
+        "reading_minutes": article.reading_minutes,
+        "published_at": article.published_at.strftime("%Y-%m-%d %H:%M"),
+        "tags": [serialize_tag(tag) for tag in article.tags.all()],
+    }
+
+
+def serialize_article_detail(article, media_url) -> dict:
+    return {
+        "id": article.id,
+        "title": article.title,
+        "content_md": article.content_md,
+        **serialize_cover(article, media_url),
+        "published_at": article.published_at.strftime("%Y-%m-%d %H:%M"),
+        "tags": [serialize_tag(tag) for tag in article.tags.all()],
+        # 评论功能已移除，保留字段以兼容前端
+        "allow_comment": False,
+        "comments": [],
+    }
+
+
+def serialize_article_fields(article, fields, media_url) -> dict:
+    """批量接口中的一篇文章，只输出 fields 中的字段(需预取 tags)"""
+    cover = serialize_cover(article, media_url) if "cover" in fields or "cover_variants" in fields else {}
+    data = {}
+    for name in BATCH_FIELDS:
+        if name not in fields:
+            continue
+        if name in cover:
+            data[name] = cover[name]
+        elif name == "published_at":
+            data[name] = article.published_at.strftime("%Y-%m-%d %H:%M")
+        elif name == "tags":
+            data[name] = [serialize_tag(tag) for tag in article.tags.all()]
+        elif name == "allow_comment":
+            data[name] = False
+        else:
+            data[name] = getattr(article, name)
+    return data
+
+
+def page_pagination(page_obj) -> dict:
+    return {
+        "current_page": page_obj.number,
+        "total_pages": page_obj.paginator.num_pages,
+        "has_next": page_obj.has_next(),
+        "has_previous": page_obj.has_previous(),
+        "total_count": page_obj.paginator.count,
+    }
+
+
+def cursor_pagination(page_obj) -> dict:
+    return {
+        "mode": "cursor",
+        "next_cursor": page_obj.next_cursor,
+        "has_next": page_obj.has_next(),
+    }
+
+
+def article_list_payload(articles, tags, pagination: dict, media_url) -> dict:
+    return {
+        "ok": True,
+        "data": {
+            "articles": [serialize_article_item(article, media_url) for article in articles],
+            "tags": [serialize_tag(tag) for tag in tags],
+            "pagination": pagination,
+        },
+    }
+
+
+def article_detail_payload(article, media_url) -> dict:
+    return {"ok": True, "data": serialize_article_detail(article, media_url)}
+
+
+def article_batch_payload(articles, missing, fields, media_url) -> dict:
+    """articles 已按请求顺序排列；missing 为不存在或不可见的 id"""
+    return {
+        "ok": True,
+        "data": {
+            "articles": [serialize_article_fields(article, fields, media_url) for article in articles],
+            "missing": missing,
+        },
+    }
+
+
+def about_payload(bio: str) -> dict:
+    return {"ok": True, "data": {"bio": bio}}
@@ -0,0 +1,92 @@
+"""
+模型信号
+文章保存/删除时同步全文检索索引；
+文章、标签或标签归属变化时刷新内容版本，并精确失效受影响的整页缓存
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search
+from .caching import (
+    TAGS_SCOPE, bump_content_version, invalidate_article_pages, invalidate_page_scopes, tag_scope,
+)
+from .models import Article, Tag
+
+
+def _tag_names(article) -> list:
+    return list(article.tags.values_list("name", flat=True))
+
+
+@receiver(post_save, sender=Article, dispatch_uid="article_search_index")
+def index_article_on_save(sender, instance, raw=False, **kwargs):
+    if raw:  # loaddata 时跳过，导入后执行 rebuild_search_index
+        return
+    search.index_article(instance)
+
+
+@receiver(post_delete, sender=Article, dispatch_uid="article_search_unindex")
+def unindex_article_on_delete(sender, instance, **kwargs):
+    search.remove_article(instance.pk)
+
+
+@receiver(post_save, sender=Article, dispatch_uid="article_changed_save")
+def article_saved(sender, instance, **kwargs):
+    bump_content_version()
+    invalidate_article_pages([instance.pk], _tag_names(instance))
+
+
+@receiver(pre_delete, sender=Article, dispatch_uid="article_remember_tags")
+def remember_article_tags(sender, instance, **kwargs):
+    """删除后标签关系已不存在，提前记下文章所属标签"""
+    instance._deleted_tag_names = _tag_names(instance)
+
+
+@receiver(post_delete, sender=Article, dispatch_uid="article_changed_delete")
+def article_deleted(sender, instance, **kwargs):
+    bump_content_version()
+    invalidate_article_pages([instance.pk], getattr(instance, "_deleted_tag_names", []))
+
+
+@receiver(post_save, sender=Tag, dispatch_uid="tag_touch_articles_save")
+@receiver(pre_delete, sender=Tag, dispatch_uid="tag_touch_articles_delete")
+def touch_articles_of_tag(sender, instance, **kwargs):
+    """标签改名/删除会改变其文章的展示，刷新这些文章的 updated_at"""
+    article_ids = list(instance.articles.values_list("pk", flat=True))
+    Article.objects.filter(pk__in=article_ids).update(updated_at=timezone.now())
+    bump_content_version()
+    # 改名时旧名称的标签页无法得知，但旧名称的请求会因标签不存在而 404，无需失效
+    invalidate_article_pages(article_ids, [instance.name])
+    invalidate_page_scopes([TAGS_SCOPE])
+
+
+@receiver(post_delete, sender=Tag, dispatch_uid="tag_changed_delete")
+def tag_deleted(sender, instance, **kwargs):
+    bump_content_version()
+    invalidate_page_scopes([TAGS_SCOPE, tag_scope(instance.name)])
+
+
+@receiver(m2m_changed, sender=Article.tags.through, dispatch_uid="article_tags_changed")
+def touch_articles_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """文章标签归属变化：刷新受影响文章的 updated_at"""
+    # clear 之后无法得知清掉了哪些关系，需在 pre_clear 时记下
+    if action == "pre_clear":
+        if reverse:
+            instance._cleared_pks = set(instance.articles.values_list("pk", flat=True))
+        else:
+            instance._cleared_pks = set(instance.tags.values_list("pk", flat=True))
+        return
+    if not action.startswith("post_"):
+        return
+    pks = pk_set if action != "post_clear" else getattr(instance, "_cleared_pks", set())
+
+    if reverse:
+        # 从标签一侧修改(tag.articles.add/remove/clear)
+        article_ids, tag_names = list(pks), [instance.name]
+    else:
+        article_ids = [instance.pk]
+        tag_names = list(Tag.objects.filter(pk__in=pks).values_list("name", flat=True))
+    Article.objects.filter(pk__in=article_ids).update(updated_at=timezone.now())
+    bump_content_version()
+    invalidate_article_pages(article_ids, tag_names)
@@ -0,0 +1,4 @@
+"""
+静态站点构建辅助模块
+供 generate_static_site 管理命令使用
+"""
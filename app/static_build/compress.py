@@ -0,0 +1,64 @@
+"""
+构建产物预压缩
+为文本类文件在旁边写入 .gz (以及安装了 brotli 时的 .br)，
+静态服务器/CDN 可直接按 Accept-Encoding 返回，无需请求时压缩
+"""
+
+import gzip
+import os
+import tempfile
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = {'.html', '.css', '.js', '.mjs', '.json', '.xml', '.svg', '.txt', '.map', '.ico'}
+# 太小的文件压缩收益不抵额外一次请求协商
+MIN_SIZE = 512
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+ENCODINGS = ('br', 'gz') if brotli is not None else ('gz',)
+# 预览服务器按此顺序优先选择
+CONTENT_ENCODINGS = {'br': 'br', 'gz': 'gzip'}
+
+
+def is_compressible(name: str) -> bool:
+    return Path(name).suffix.lower() in COMPRESSIBLE_SUFFIXES
+
+
+def compression_params(encoding: str) -> tuple:
+    """压缩参数，计入清单输入哈希，调整后自动重新压缩"""
+    return (encoding, GZIP_LEVEL) if encoding == 'gz' else (encoding, BROTLI_QUALITY)
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'gz':
+        # mtime=0 保证相同输入得到相同输出
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def compress_file(path: Path, encodings=ENCODINGS) -> list:
+    """
+    压缩单个文件，返回实际写入的后缀列表
+    压缩后不比原文件小的不写入
+    """
+    data = path.read_bytes()
+    if len(data) < MIN_SIZE:
+        return []
+    written = []
+    for encoding in encodings:
+        compressed = _compress(data, encoding)
+        if len(compressed) >= len(data):
+            continue
+        target = path.with_name(f'{path.name}.{encoding}')
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(compressed)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, target)
+        written.append(encoding)
+    return written
@@ -0,0 +1,82 @@
+"""
+静态资源指纹
+复制 static/ 与 media/ 时把文件改名为 name.<内容哈希>.ext，
+生成的 HTML 中对这些文件的引用(src/href/srcset/poster/url())随之改写，
+带指纹的文件内容永不变化，可以使用 Cache-Control: immutable 长期缓存
+"""
+
+import re
+from html import unescape
+from pathlib import PurePosixPath
+from urllib.parse import quote, unquote
+
+HASH_LENGTH = 12
+ASSET_MANIFEST_NAME = 'asset-manifest.json'
+# 只有这些目录下的引用会被改写，也只有它们会记入页面的资源依赖
+ASSET_PREFIXES = ('static/', 'media/')
+
+# name.<12 位十六进制>.ext，与 ManifestStaticFilesStorage 的命名一致
+_HASHED_RE = re.compile(r'\.[0-9a-f]{%d}\.[^./]+$' % HASH_LENGTH)
+_ATTR_RE = re.compile(r'(\b(?:src|href|poster)=")([^"]*)(")')
+_SRCSET_RE = re.compile(r'(\bsrcset=")([^"]*)(")')
+_CSS_URL_RE = re.compile(r'(url\(\s*[\'"]?)([^\'")]+?)([\'"]?\s*\))')
+_SPLIT_RE = re.compile(r'([^?#]*)(.*)', re.S)
+# 封面原图与衍生图按完整内容哈希存放(见 app/images.py)，同样不会变化
+_CONTENT_ADDRESSED_RE = re.compile(r'/_(?:variants|originals)/[0-9a-f]{64}(?:/|\.)')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def is_hashed(name: str) -> bool:
+    return bool(_HASHED_RE.search(name))
+
+
+def is_immutable(path: str) -> bool:
+    """文件名或所在目录带内容哈希，内容永不变化"""
+    return is_hashed(path) or bool(_CONTENT_ADDRESSED_RE.search(path))
+
+
+def hashed_name(name: str, content_hash: str) -> str:
+    """按内容哈希生成带指纹的文件名，已带指纹(如 collectstatic 产物)的保持原名"""
+    if is_hashed(name):
+        return name
+    path = PurePosixPath(name)
+    return str(path.with_name(f'{path.stem}.{content_hash[:HASH_LENGTH]}{path.suffix}'))
+
+
+def find_references(html: str) -> set:
+    """HTML 中引用的 static/、media/ 文件(原名)"""
+    return set(rewrite_references(html, {})[1])
+
+
+def rewrite_references(html: str, assets: dict) -> tuple:
+    """
+    把 HTML 中对 static/、media/ 文件的引用改写为带指纹的名称
+    返回 (改写后的 HTML, {原名: 指纹名或 None})，后者记入构建清单：
+    被引用文件的指纹变化(或从无到有)时页面需要重新生成
+    """
+    refs = {}
+
+    def swap(url: str) -> str:
+        path, suffix = _SPLIT_RE.match(url).groups()
+        lead = '/' if path.startswith('/') else ''
+        key = unquote(unescape(path[len(lead):]))
+        if not key.startswith(ASSET_PREFIXES):
+            return url
+        hashed = assets.get(key)
+        refs[key] = hashed
+        if hashed is None:
+            return url
+        return f'{lead}{quote(hashed, safe="/")}{suffix}'
+
+    def swap_srcset(value: str) -> str:
+        candidates = []
+        for candidate in value.split(','):
+            url, _, descriptor = candidate.strip().partition(' ')
+            candidates.append(f'{swap(url)} {descriptor}'.strip())
+        return ', '.join(candidates)
+
+    html = _ATTR_RE.sub(lambda m: m.group(1) + swap(m.group(2)) + m.group(3), html)
+    html = _SRCSET_RE.sub(lambda m: m.group(1) + swap_srcset(m.group(2)) + m.group(3), html)
+    html = _CSS_URL_RE.sub(lambda m: m.group(1) + swap(m.group(2)) + m.group(3), html)
+    return html, refs
@@ -0,0 +1,145 @@
+"""
+静态构建清单
+记录每个输出文件对应的输入哈希，用于增量构建：
+输入未变化的页面直接跳过，上次构建产出但本次不再产出的文件视为孤立文件删除；
+另记录每个页面引用的带指纹资源，资源指纹变化时页面也需要重新生成；
+以及源文件的 (大小, mtime, 哈希)，大小与 mtime 未变的源文件不再读取内容计算哈希；
+列表页还记录内容最后一次变化的时间，作为 sitemap 的 lastmod
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+MANIFEST_NAME = '.build-manifest.json'
+MANIFEST_VERSION = 3
+
+
+def digest(*parts) -> str:
+    """对任意可 JSON 序列化的输入计算稳定哈希"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """计算单个文件内容的哈希"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def tree_digest(root: Path) -> str:
+    """计算目录下所有文件(相对路径 + 内容)的整体哈希"""
+    h = hashlib.sha256()
+    if root.exists():
+        for path in sorted(p for p in root.rglob('*') if p.is_file()):
+            h.update(path.relative_to(root).as_posix().encode('utf-8'))
+            h.update(file_digest(path).encode('ascii'))
+    return h.hexdigest()
+
+
+class BuildManifest:
+    """输出文件 -> 输入哈希 的映射，分别保存上次与本次构建的结果"""
+
+    def __init__(self, path: Path, entries: dict = None, assets: dict = None, sources: dict = None,
+                 lastmod: dict = None):
+        self.path = path
+        self.root = path.parent
+        self.previous = entries or {}
+        self.current = {}
+        # 页面 -> {资源原名: 指纹名}
+        self.previous_assets = assets or {}
+        self.current_assets = {}
+        # 源文件 -> [大小, mtime_ns, 内容哈希]
+        self.previous_sources = sources or {}
+        self.current_sources = {}
+        # 页面 -> 输入哈希最后一次变化的时间(ISO 8601)
+        self.previous_lastmod = lastmod or {}
+        self.current_lastmod = {}
+
+    @classmethod
+    def load(cls, path: Path) -> 'BuildManifest':
+        """读取清单，文件不存在、损坏或版本不符时返回空清单"""
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get('version') != MANIFEST_VERSION:
+            return cls(path)
+        return cls(
+            path, data.get('files') or {}, data.get('assets') or {}, data.get('sources') or {},
+            data.get('lastmod') or {},
+        )
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.previous)
+
+    def is_fresh(self, name: str, inputs: str) -> bool:
+        """输入哈希与上次一致且输出文件仍在磁盘上"""
+        return self.previous.get(name) == inputs and (self.root / name).exists()
+
+    def record(self, name: str, inputs: str):
+        self.current[name] = inputs
+
+    def assets_fresh(self, name: str, assets: dict) -> bool:
+        """页面上次引用的资源在本次构建中的指纹均未变化"""
+        return all(assets.get(key) == hashed for key, hashed in self.previous_assets.get(name, {}).items())
+
+    def record_assets(self, name: str, refs: dict):
+        if refs:
+            self.current_assets[name] = refs
+
+    def keep_assets(self, name: str):
+        """页面跳过时沿用上次记录的资源引用"""
+        self.record_assets(name, self.previous_assets.get(name, {}))
+
+    def source_digest(self, path: Path, key: str) -> str:
+        """源文件内容哈希，大小与 mtime 与上次一致时沿用上次的结果"""
+        stat = path.stat()
+        cached = self.previous_sources.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            content_hash = cached[2]
+        else:
+            content_hash = file_digest(path)
+        self.current_sources[key] = [stat.st_size, stat.st_mtime_ns, content_hash]
+        return content_hash
+
+    def lastmod(self, name: str, inputs: str, changed_at: datetime, default: datetime = None) -> datetime:
+        """
+        页面内容最后一次变化的时间：输入哈希与上次相同时沿用上次记录的时间，
+        有变化时为 changed_at；上次没有这个页面(或没有记录)时为 default(缺省同 changed_at)
+        """
+        recorded = self.previous_lastmod.get(name)
+        if recorded and self.previous.get(name) == inputs:
+            value = datetime.fromisoformat(recorded)
+        elif name in self.previous and self.previous[name] != inputs:
+            value = changed_at
+        else:
+            value = default or changed_at
+        self.current_lastmod[name] = value.isoformat()
+        return value
+
+    def orphans(self) -> list:
+        """上次构建产出、本次未产出的文件"""
+        return sorted(set(self.previous) - set(self.current))
+
+    def save(self):
+        data = {
+            'version': MANIFEST_VERSION,
+            'files': dict(sorted(self.current.items())),
+            'assets': {name: dict(sorted(refs.items())) for name, refs in sorted(self.current_assets.items())},
+            'sources': dict(sorted(self.current_sources.items())),
+            'lastmod': dict(sorted(self.current_lastmod.items())),
+        }
+        # 清单可能与上一版输出共享同一个硬链接文件，先写临时文件再替换
+        tmp = self.path.with_name(f'.tmp-{os.getpid()}-{self.path.name}')
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=0), encoding='utf-8')
+        os.replace(tmp, self.path)
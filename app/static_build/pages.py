@@ -0,0 +1,149 @@
+"""
+静态页面渲染
+主进程串行构建时直接传入模型对象渲染；
+--jobs 并行构建时，工作进程按任务描述自行查询数据库并渲染、写入
+
+注意：本模块会在工作进程 django.setup() 之前被导入，模型只能在函数内导入
+"""
+
+import os
+import time
+import tempfile
+from pathlib import Path
+
+from django.template.loader import render_to_string
+
+from app.instrumentation import collect, db_wrapper, timed
+
+from .fingerprint import rewrite_references
+
+# 工作进程的输出目录、资源指纹映射与是否统计分段耗时，由 init_worker 设置
+_output_dir = None
+_assets = {}
+_profile = False
+
+
+def render_article(article) -> str:
+    """渲染单篇文章详情页"""
+    comments = []  # 评论功能已移除
+
+    # Markdown -> 安全 HTML (优先使用保存时预渲染的结果)
+    html_content = article.rendered_html
+
+    return render_to_string('detail.html', {
+        'article': article,
+        'comments': comments,
+        'article_html': html_content,
+        'is_static': True,
+        'current_page': 'list'
+    })
+
+
+def render_list(page_obj, tags, active_tag) -> str:
+    """渲染一页文章列表(全部或某个标签)"""
+    return render_to_string('list.html', {
+        'page_obj': page_obj,
+        'tags': tags,
+        'active_tag': active_tag,
+        'is_static': True,
+        'current_page': 'list'
+    })
+
+
+def bucket_by_tag(articles) -> dict:
+    """按标签把(已预取标签的)文章分组，组内保持原有顺序：tag_pk -> [article, ...]"""
+    buckets = {}
+    for article in articles:
+        for tag in article.tags.all():
+            buckets.setdefault(tag.pk, []).append(article)
+    return buckets
+
+
+def write_atomic(path: Path, content: str):
+    """先写临时文件再 rename，读者不会看到写了一半的页面"""
+    with timed('write'):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def init_worker(settings_module: str, output_dir: str, assets: dict = None, profile: bool = False,
+                database: str = None, media_root: str = None):
+    """
+    工作进程初始化：独立完成 Django 配置，数据库连接在首次查询时按进程建立
+    database 为主进程创建的数据库快照文件(见 snapshot.py)，与主进程读到同一时刻的数据；
+    media_root 为主进程当前的 MEDIA_ROOT(可能被测试或基准覆盖)，封面衍生图信息从这里读取
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    if database:
+        from django.db import connection
+        connection.settings_dict['NAME'] = database
+    if media_root:
+        from django.conf import settings
+        settings.MEDIA_ROOT = media_root
+
+    global _output_dir, _assets, _profile
+    _output_dir = Path(output_dir)
+    _assets = assets or {}
+    _profile = profile
+
+
+def load_and_render(spec: tuple) -> str:
+    """
+    按任务描述查询数据并渲染页面
+    ('article', pk) 或 ('list', tag_pk 或 None, 页码)
+    """
+    from django.core.paginator import Paginator
+    from app.models import Article, Tag
+
+    kind = spec[0]
+    if kind == 'article':
+        article = Article.objects.prefetch_related('tags').get(pk=spec[1])
+        return render_article(article)
+    if kind == 'list':
+        _, tag_pk, page_num = spec
+        articles = Article.objects.for_listing()
+        active_tag = None
+        if tag_pk is not None:
+            active_tag = Tag.objects.get(pk=tag_pk)
+            articles = articles.filter(tags=active_tag)
+        page_obj = Paginator(articles, 10).get_page(page_num)
+        return render_list(page_obj, Tag.objects.all(), active_tag)
+    raise ValueError(f'未知页面类型: {kind}')
+
+
+def render_and_write(path: Path, render, assets: dict) -> dict:
+    """渲染并写入一个文件，HTML 中的资源引用按指纹改写，返回资源引用"""
+    content = render()
+    refs = {}
+    if path.suffix == '.html':
+        with timed('rewrite'):
+            content, refs = rewrite_references(content, assets)
+    write_atomic(path, content)
+    return refs
+
+
+def run_job(job: tuple) -> tuple:
+    """
+    工作进程入口：渲染、改写资源引用并写入一个页面
+    返回 (文件名, 进程号, 耗时, 资源引用, 分段耗时)，未开启 --profile 时分段耗时为 None
+    """
+    filename, spec = job
+    start = time.perf_counter()
+    if not _profile:
+        refs = render_and_write(_output_dir / filename, lambda: load_and_render(spec), _assets)
+        return filename, os.getpid(), time.perf_counter() - start, refs, None
+
+    from django.db import connection
+    with connection.execute_wrapper(db_wrapper), collect() as timings:
+        refs = render_and_write(_output_dir / filename, lambda: load_and_render(spec), _assets)
+    return filename, os.getpid(), timings.total, refs, timings.as_dict()
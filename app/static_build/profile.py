@@ -0,0 +1,146 @@
+"""
+静态构建性能报告 (generate_static_site --profile)
+- 每个阶段：墙钟时间、CPU 时间(主进程)、数据库查询数、tracemalloc 内存峰值，
+  以及主进程内 DB / markdown / bleach / template / rewrite / write 分段耗时
+- 每个页面：总耗时与同样的分段(见 app/instrumentation.py)，--jobs 时由工作进程统计后带回
+报告写为 JSON，并在终端输出阶段汇总与最慢的 N 个页面
+"""
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from django.db import connection
+from django.utils import timezone
+
+from app.instrumentation import collect, db_wrapper
+
+# 分段的输出顺序
+SEGMENTS = ("db", "markdown", "bleach", "template", "rewrite", "write", "other")
+
+
+class BuildProfiler:
+    """未启用时 run()/phase()/page() 均为空操作"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.phases = []
+        self.pages = []
+        # 工作进程中执行的查询，主进程的查询钩子统计不到
+        self.remote_queries = 0
+
+    @contextmanager
+    def run(self):
+        """包住整个构建：开启 tracemalloc 与查询钩子"""
+        if not self.enabled:
+            yield
+            return
+        tracemalloc.start()
+        cpu = time.process_time()
+        try:
+            with connection.execute_wrapper(db_wrapper), collect() as timings:
+                yield
+        finally:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.cpu = time.process_time() - cpu
+            self.totals = timings.as_dict()
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        tracemalloc.reset_peak()
+        cpu = time.process_time()
+        remote = self.remote_queries
+        with collect() as timings:
+            yield
+        data = timings.as_dict()
+        self.phases.append({
+            "name": name,
+            "wall": data.pop("total"),
+            "cpu": time.process_time() - cpu,
+            "queries": data.pop("queries") + self.remote_queries - remote,
+            "peak_memory": tracemalloc.get_traced_memory()[1],
+            "segments": data,
+        })
+
+    def page(self, name: str):
+        """统计主进程中一个页面的渲染，结果在退出时记入报告"""
+        if not self.enabled:
+            return nullcontext()
+        return self._page(name)
+
+    @contextmanager
+    def _page(self, name: str):
+        with collect() as timings:
+            yield
+        self.add_page(name, timings.as_dict())
+
+    def add_page(self, name: str, timings: dict, worker: int = None, remote: bool = False):
+        """记入一个页面的分段耗时；remote 表示在工作进程中渲染，其查询数另行累计"""
+        if not self.enabled or timings is None:
+            return
+        self.pages.append({"file": name, "worker": worker, **timings})
+        if remote:
+            self.remote_queries += timings["queries"]
+
+    def report(self, jobs: int) -> dict:
+        return {
+            "generated_at": timezone.now().isoformat(),
+            "jobs": jobs,
+            "wall": self.totals["total"],
+            "cpu": self.cpu,
+            "queries": self.totals["queries"] + self.remote_queries,
+            "peak_memory": self.peak_memory,
+            "phases": self.phases,
+            "pages": {
+                "count": len(self.pages),
+                "total": sum(page["total"] for page in self.pages),
+                "queries": sum(page["queries"] for page in self.pages),
+                "segments": {s: sum(page.get(s, 0.0) for page in self.pages) for s in SEGMENTS},
+            },
+            "page_timings": sorted(self.pages, key=lambda page: page["total"], reverse=True),
+        }
+
+    def write(self, path: Path, jobs: int) -> dict:
+        report = self.report(jobs)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        return report
+
+    @staticmethod
+    def summary(report: dict, top: int) -> list:
+        """终端输出：阶段汇总 + 最慢页面"""
+        lines = [f"  构建耗时 {report['wall']:.2f}s (主进程 CPU {report['cpu']:.2f}s)，"
+                 f"查询 {report['queries']} 次，内存峰值 {_mb(report['peak_memory'])}"]
+        for phase in report["phases"]:
+            lines.append(
+                f"    {phase['name']:<26} {phase['wall']:7.3f}s  CPU {phase['cpu']:7.3f}s  "
+                f"查询 {phase['queries']:>4}  内存峰值 {_mb(phase['peak_memory']):>9}  {_segments(phase['segments'])}"
+            )
+        pages = report["pages"]
+        if pages["count"]:
+            lines.append(
+                f"  渲染 {pages['count']} 个页面共 {pages['total']:.3f}s，查询 {pages['queries']} 次 "
+                f"{_segments(pages['segments'])}"
+            )
+            lines.append(f"  最慢的 {min(top, pages['count'])} 个页面:")
+            for page in report["page_timings"][:top]:
+                lines.append(
+                    f"    {page['total'] * 1000:8.1f}ms  {page['file']}  {_segments(page)}  {page['queries']} 次查询"
+                )
+        return lines
+
+
+def _segments(data: dict) -> str:
+    """耗时超过 1ms 的分段，单位 ms"""
+    parts = [f"{s}={data[s] * 1000:.1f}" for s in SEGMENTS if data.get(s, 0.0) >= 0.001]
+    return f"(ms: {' '.join(parts)})" if parts else ""
+
+
+def _mb(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
@@ -0,0 +1,123 @@
+"""
+静态站点检索索引
+GitHub Pages 没有服务端，检索在浏览器中完成(static/js/site-search.js)：
+- 检索词与 /api/search/ 一致，由 app.search.tokenize 切分(CJK 二元组 + 段末单字，拉丁词小写)
+- 倒排表按检索词哈希分片 search/t<n>.<哈希>.json，查询只下载涉及的分片；
+  另为每个 CJK 单字建立倒排(包含该字的文章)，单字查询直接查这一项，不必扫描前缀
+- 标题/摘要/地址按文章 id 区间分片 search/d<n>.<哈希>.json，只下载结果页用到的分片
+- search/index.json 记录各分片的内容哈希(分片数即列表长度)，分片文件名带内容哈希，可长期缓存
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+
+from app.search import is_cjk, tokenize
+
+INDEX_VERSION = 1
+INDEX_NAME = 'search/index.json'
+# 倒排分片的目标大小(未压缩字节)，分片数取 2 的幂
+TERM_SHARD_BYTES = 32 * 1024
+MAX_TERM_SHARDS = 1024
+# 每个文档分片包含的 id 区间长度
+DOC_SHARD_SIZE = 50
+TITLE_SCORE = 10
+MAX_SCORE = 999
+SUMMARY_LENGTH = 120
+
+
+def shard_of(token: str, shards: int) -> int:
+    """FNV-1a 哈希分片；site-search.js 中的 shardOf 与此保持一致"""
+    h = 2166136261
+    for ch in token:
+        h = ((h ^ ord(ch)) * 16777619) & 0xFFFFFFFF
+    return h % shards
+
+
+def _token_scores(text: str, weight: int, scores: dict):
+    """检索词得分；CJK 二元组的首字另计入单字倒排(段末单字 tokenize 已给出)"""
+    for token in tokenize(text):
+        scores[token] += weight
+        if len(token) == 2 and is_cjk(token):
+            scores[token[0]] += weight
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+
+
+def shard_name(kind: str, n, content_hash: str) -> str:
+    """分片文件名；site-search.js 按同样规则拼接"""
+    return f'search/{kind}{n}.{content_hash}.json'
+
+
+def _content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+
+
+def index_files(meta: dict) -> list:
+    """index.json 中列出的全部分片文件"""
+    return [shard_name('t', n, h) for n, h in enumerate(meta['terms'])] + [
+        shard_name('d', n, h) for n, h in meta['docs'].items()
+    ]
+
+
+def build_index(documents) -> tuple:
+    """
+    documents: 可迭代的 (id, 标题, 正文纯文本, 摘要, 地址, 日期)
+    返回 (index.json 内容, {分片文件名: 内容})
+    倒排表格式 {检索词: [id 增量, 得分, id 增量, 得分, ...]}，id 升序
+    """
+    postings = defaultdict(dict)
+    docs = defaultdict(dict)
+    count = 0
+    for pk, title, text, summary, url, date in documents:
+        count += 1
+        scores = defaultdict(int)
+        _token_scores(title, TITLE_SCORE, scores)
+        _token_scores(text, 1, scores)
+        for token, score in scores.items():
+            postings[token][pk] = min(score, MAX_SCORE)
+        docs[pk // DOC_SHARD_SIZE][pk] = [title, summary[:SUMMARY_LENGTH], url, date]
+
+    encoded = {}
+    for token, hits in postings.items():
+        flat, last = [], 0
+        for pk in sorted(hits):
+            flat += [pk - last, hits[pk]]
+            last = pk
+        encoded[token] = flat
+
+    total = sum(len(token) + len(_dumps(flat)) + 4 for token, flat in encoded.items())
+    shards = 1
+    while shards < MAX_TERM_SHARDS and total / shards > TERM_SHARD_BYTES:
+        shards *= 2
+    buckets = [{} for _ in range(shards)]
+    for token, flat in encoded.items():
+        buckets[shard_of(token, shards)][token] = flat
+
+    files = {}
+    terms = []
+    for n, bucket in enumerate(buckets):
+        content = _dumps(bucket)
+        terms.append(_content_hash(content))
+        files[shard_name('t', n, terms[-1])] = content
+    doc_hashes = {}
+    for n, entries in sorted(docs.items()):
+        content = _dumps({str(pk): entry for pk, entry in entries.items()})
+        doc_hashes[str(n)] = _content_hash(content)
+        files[shard_name('d', n, doc_hashes[str(n)])] = content
+
+    meta = {
+        'version': INDEX_VERSION,
+        'count': count,
+        'doc_shard_size': DOC_SHARD_SIZE,
+        'terms': terms,
+        'docs': doc_hashes,
+    }
+    return _dumps(meta), files
+
+
+def index_size(files: dict) -> int:
+    return sum(len(content.encode('utf-8')) for content in files.values())
+
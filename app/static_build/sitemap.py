@@ -0,0 +1,132 @@
+"""
+站点地图
+URL 逐条写入临时文件，不在内存中拼接整份 XML；超过单文件 URL 数或字节上限时换下一个
+sitemap-<n>.xml，sitemap.xml 为指向各分片的 sitemap index
+lastmod 取自内容的实际修改时间，条目顺序固定，内容未变化时输出逐字节相同
+"""
+
+import hashlib
+import os
+from datetime import timezone
+from pathlib import Path
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+INDEX_NAME = 'sitemap.xml'
+# 协议上限：每个文件 50000 个 URL、50MB(未压缩)
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024
+
+_XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+_URLSET_HEAD = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{_XMLNS}">\n'.encode()
+_URLSET_TAIL = b'</urlset>\n'
+
+
+def shard_name(n: int) -> str:
+    return f'sitemap-{n}.xml'
+
+
+def format_lastmod(value) -> str:
+    """W3C Datetime，统一转为 UTC 精确到秒"""
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+class Shard:
+    """一个写完的分片：临时文件、内容哈希、条目中最新的 lastmod"""
+
+    def __init__(self, name: str, tmp: Path, content_hash: str, lastmod):
+        self.name = name
+        self.tmp = tmp
+        self.content_hash = content_hash
+        self.lastmod = lastmod
+
+
+class SitemapWriter:
+    """
+    按顺序 add() URL，close() 返回写完的分片列表
+    分片先写到输出目录下的临时文件，由调用方决定替换目标文件还是丢弃(内容未变化)
+    """
+
+    def __init__(self, output_dir: Path, base_url: str, max_urls: int = MAX_URLS, max_bytes: int = MAX_BYTES):
+        self.output_dir = output_dir
+        self.base_url = base_url.rstrip('/') + '/'
+        self.max_urls = min(max_urls, MAX_URLS)
+        self.max_bytes = min(max_bytes, MAX_BYTES)
+        self.shards = []
+        self.total = 0
+        self._file = None
+
+    def add(self, path: str, lastmod=None, changefreq: str = None, priority: str = None):
+        """path 为站内相对路径('' 表示首页)，lastmod 为带时区的 datetime"""
+        parts = [f'  <url>\n    <loc>{escape(self.base_url + quote(path))}</loc>\n']
+        if lastmod is not None:
+            parts.append(f'    <lastmod>{format_lastmod(lastmod)}</lastmod>\n')
+        if changefreq:
+            parts.append(f'    <changefreq>{changefreq}</changefreq>\n')
+        if priority:
+            parts.append(f'    <priority>{priority}</priority>\n')
+        parts.append('  </url>\n')
+        entry = ''.join(parts).encode('utf-8')
+
+        if self._file is not None and (
+            self._count >= self.max_urls or self._size + len(entry) + len(_URLSET_TAIL) > self.max_bytes
+        ):
+            self._finish()
+        if self._file is None:
+            self._start()
+        self._write(entry)
+        self._count += 1
+        self.total += 1
+        if lastmod is not None and (self._lastmod is None or lastmod > self._lastmod):
+            self._lastmod = lastmod
+
+    def close(self) -> list:
+        if self._file is not None:
+            self._finish()
+        return self.shards
+
+    def discard(self):
+        """出错时删除尚未交给调用方处理的临时文件"""
+        if self._file is not None:
+            self._file.close()
+            self._tmp.unlink(missing_ok=True)
+            self._file = None
+        for shard in self.shards:
+            shard.tmp.unlink(missing_ok=True)
+
+    def _start(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        name = shard_name(len(self.shards) + 1)
+        self._tmp = self.output_dir / f'.tmp-{os.getpid()}-{name}'
+        self._file = open(self._tmp, 'wb')
+        self._hash = hashlib.sha256()
+        self._count = 0
+        self._size = 0
+        self._lastmod = None
+        self._write(_URLSET_HEAD)
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._hash.update(data)
+        self._size += len(data)
+
+    def _finish(self):
+        self._write(_URLSET_TAIL)
+        self._file.close()
+        self._file = None
+        os.chmod(self._tmp, 0o644)
+        self.shards.append(Shard(shard_name(len(self.shards) + 1), self._tmp, self._hash.hexdigest(), self._lastmod))
+
+
+def render_index(base_url: str, shards: list) -> str:
+    """sitemap index，每个分片的 lastmod 为其条目中最新的一条"""
+    base_url = base_url.rstrip('/') + '/'
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<sitemapindex xmlns="{_XMLNS}">']
+    for shard in shards:
+        lines.append('  <sitemap>')
+        lines.append(f'    <loc>{escape(base_url + shard.name)}</loc>')
+        if shard.lastmod is not None:
+            lines.append(f'    <lastmod>{format_lastmod(shard.lastmod)}</lastmod>')
+        lines.append('  </sitemap>')
+    lines.append('</sitemapindex>')
+    return '\n'.join(lines) + '\n'
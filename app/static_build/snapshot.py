@@ -0,0 +1,71 @@
+"""
+构建期间的一致读
+整个构建读到的是同一时刻的数据，不会出现列表页已包含、详情页却还不存在的文章：
+- SQLite：用 backup API 把数据库一次性复制为快照文件，构建(包括 --jobs 的工作进程)只读快照，
+  不会长时间持有读锁阻塞后台的写入
+- SQLite 内存库(测试)：主进程在事务中读内存库，另备份一份快照文件给 --jobs 的工作进程；
+  已处于事务中时(TestCase)备份会等锁，此时不备份
+- 其他数据库：整个构建放在一个事务中，PostgreSQL 设为 REPEATABLE READ 只读；
+  此时 --jobs 的工作进程使用各自的连接，不在同一快照内
+"""
+
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+
+
+def _backup(connection) -> str:
+    """用 backup API 把连接的数据库复制到临时文件，返回路径"""
+    fd, path = tempfile.mkstemp(prefix='build-snapshot-', suffix='.sqlite3')
+    os.close(fd)
+    try:
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+@contextmanager
+def read_snapshot(using: str = 'default'):
+    """返回工作进程应连接的数据库文件，None 表示沿用原配置"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        with transaction.atomic(using=using):
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+            yield None
+        return
+
+    if connection.is_in_memory_db():
+        path = None if connection.in_atomic_block else _backup(connection)
+        try:
+            with transaction.atomic(using=using):
+                yield path
+        finally:
+            if path:
+                os.unlink(path)
+        return
+
+    path = _backup(connection)
+    try:
+        # 与测试框架切换测试库的方式相同：关闭连接后改 NAME，下次查询连到快照
+        original = connection.settings_dict['NAME']
+        connection.close()
+        connection.settings_dict['NAME'] = path
+        try:
+            yield path
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = original
+    finally:
+        os.unlink(path)
@@ -0,0 +1,110 @@
+"""
+资源文件同步
+把 static/、media/ 中的文件放到 docs/ 下：优先 reflink(写时复制)，其次硬链接，
+都不支持(跨文件系统等)时才真正复制；先放到临时文件再 rename，不会留下半个文件
+
+以及构建目录的整体操作：以硬链接克隆上次的输出作为增量构建的起点，构建完成后与 docs/ 原子交换
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import shutil
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux FICLONE ioctl，btrfs/xfs 等支持写时复制的文件系统可用
+FICLONE = 0x40049409
+# Linux renameat2(2) 的 RENAME_EXCHANGE：原子交换两个路径
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    if fcntl is None:
+        return False
+    with open(src, 'rb') as s, open(dest, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            return False
+    return True
+
+
+def place_file(src: Path, target: Path, link: bool = True) -> str:
+    """把 src 放到 target，返回实际方式：reflink / hardlink / copy"""
+    if target.exists() and os.path.samefile(src, target):
+        return 'hardlink'
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f'.tmp-{os.getpid()}-{target.name}')
+    try:
+        method = 'copy'
+        if link and _reflink(src, tmp):
+            method = 'reflink'
+        elif link:
+            tmp.unlink(missing_ok=True)
+            try:
+                os.link(src, tmp)
+                method = 'hardlink'
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+                    raise
+        if method == 'copy':
+            shutil.copy2(src, tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return method
+
+
+def _link_or_copy(src, dest):
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+def clone_tree(src: Path, dest: Path):
+    """
+    以硬链接克隆目录；构建中所有写入都是 "临时文件 + rename"，
+    替换的是目录项而不是共享的文件内容，克隆源保持不变
+    """
+    shutil.copytree(src, dest, symlinks=True, copy_function=_link_or_copy)
+
+
+def _renameat2_exchange(a: Path, b: Path) -> bool:
+    libc_name = ctypes.util.find_library('c')
+    if not libc_name:
+        return False
+    libc = ctypes.CDLL(libc_name, use_errno=True)
+    renameat2 = getattr(libc, 'renameat2', None)
+    if renameat2 is None:
+        return False
+    if renameat2(AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.ENOSYS, errno.EINVAL, errno.ENOTSUP):
+        return False
+    raise OSError(err, os.strerror(err), str(a), None, str(b))
+
+
+def swap_dirs(a: Path, b: Path) -> bool:
+    """
+    交换两个目录，返回是否为原子操作
+    Linux 上使用 renameat2(RENAME_EXCHANGE)，读者任何时刻看到的都是完整的某一版；
+    其他平台退化为三次 rename，中间有极短的时间 b 不存在
+    """
+    if _renameat2_exchange(a, b):
+        return True
+    tmp = b.with_name(f'{b.name}.swap-{os.getpid()}')
+    os.rename(b, tmp)
+    os.rename(a, b)
+    os.rename(tmp, a)
+    return False
+
@@ -0,0 +1,35 @@
+"""
+封面图片模板标签
+{% cover_picture article "article-cover" sizes="(max-width: 768px) 100vw, 900px" %}
+有衍生图时输出带 WebP/JPEG srcset 的 <picture>，否则退回原图 <img>
+"""
+
+from django import template
+from django.conf import settings
+from django.utils.html import format_html
+
+from app.images import variant_srcsets
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cover_picture(context, article, css_class="", sizes="100vw", lazy=True):
+    if not article.cover:
+        return ""
+    # 静态站点中 media 使用相对路径
+    prefix = "media/" if context.get("is_static") else settings.MEDIA_URL
+    loading = "lazy" if lazy else "eager"
+    srcsets = variant_srcsets(article.cover_hash, prefix)
+    if srcsets is None:
+        src = f"{prefix}{article.cover.name}" if context.get("is_static") else article.cover.url
+        return format_html('<img src="{}" alt="{}" class="{}" loading="{}">', src, article.title, css_class, loading)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="{}" decoding="async">'
+        '</picture>',
+        srcsets["webp"], sizes,
+        srcsets["fallback"], srcsets["jpeg"], sizes, srcsets["width"], srcsets["height"],
+        article.title, css_class, loading,
+    )
@@ -0,0 +1,23 @@
+"""
+模板引擎
+在 Django 自带的模板后端上为每次渲染计时，耗时计入 'template' 分段(app/instrumentation.py)，
+在线请求(ServerTimingMiddleware)与静态构建(--profile)共用；未开启统计时只多一次 contextvar 读取
+"""
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .instrumentation import timed
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
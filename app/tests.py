@@ -1,3 +1,1228 @@
-from django.test import TestCase
+import base64
+import gzip
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone as dt_timezone
+from functools import partial
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.template import Context as TemplateContext, Template
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from asgiref.sync import async_to_sync
+from PIL import Image, ImageFont
+
+from . import async_api_views, images, instrumentation, metrics, rendering
+from .async_api_views import ASGIHandler
+from .benchmarks import corpus
+from .caching import ResponseCache
+from .checks import check_watermark_font
+from .benchmarks.drivers import asgi_get, wsgi_get
+from .benchmarks.scenarios import SCENARIOS, Context, percentile, run_scenario
+from .images import process_cover
+from .management.commands.generate_static_site import Command as GenerateStaticSite
+from .management.commands.preview_static_site import PrecompressedHandler
+from .models import Article, Tag
+from .pagination import paginate_by_cursor
+from .static_build.fingerprint import hashed_name, rewrite_references
+from .static_build.pages import bucket_by_tag
+from .static_build import compress, manifest, search_index, sitemap, sync
+
+
+def create_corpus(articles: int, tags: int, tags_per_article: int = 3, prefix: str = ""):
+    """生成指定规模的文章与标签，每篇文章挂 tags_per_article 个标签"""
+    tag_objs = [Tag.objects.create(name=f"{prefix}标签{i}") for i in range(tags)]
+    now = timezone.now()
+    for i in range(articles):
+        article = Article.objects.create(
+            title=f"文章{i}",
+            content_md=f"# 标题 {i}\n\n正文内容 {i}",
+            published_at=now - timezone.timedelta(minutes=i),
+        )
+        article.tags.set(tag_objs[(i + k) % tags] for k in range(tags_per_article))
+    return tag_objs
+
+
+class RenderedFieldsTests(TestCase):
+    """渲染派生字段：save() 时计算，回填命令可补齐，列表查询不加载正文"""
+
+    CONTENT = "# 标题\n\n" + "汉" * 450 + "\n\n" + "word " * 50 + "<script>alert(1)</script>"
+
+    def assert_rendered(self, article):
+        self.assertIn("<h1>标题</h1>", article.content_html)
+        self.assertNotIn("<script>", article.content_html)
+        self.assertTrue(article.summary.startswith("标题 汉汉"))
+        self.assertEqual(len(article.summary), 200 + len("..."))
+        self.assertEqual(article.word_count, 2 + 450 + 50 + 2)   # 标签被去掉，alert(1) 计为 alert、1 两个词
+        self.assertEqual(article.reading_minutes, 2)
+
+    def test_save_fills_rendered_fields(self):
+        article = Article.objects.create(title="文章", content_md=self.CONTENT)
+        self.assert_rendered(Article.objects.get(pk=article.pk))
+
+    def test_backfill_restores_cleared_fields(self):
+        article = Article.objects.create(title="文章", content_md=self.CONTENT)
+        unchanged = Article.objects.create(title="短文", content_md="短")
+        Article.objects.filter(pk=article.pk).update(
+            content_html="", summary="", word_count=0, reading_minutes=0, content_hash="")
+
+        out = io.StringIO()
+        call_command("backfill_article_render", stdout=out)
+        self.assertIn("已回填 1 篇文章 (共检查 2 篇)", out.getvalue())
+        self.assert_rendered(Article.objects.get(pk=article.pk))
+        self.assertEqual(Article.objects.get(pk=unchanged.pk).word_count, 1)
+
+        out = io.StringIO()
+        call_command("backfill_article_render", "--force", stdout=out)
+        self.assertIn("已回填 2 篇文章", out.getvalue())
+
+    def test_listing_defers_content(self):
+        Article.objects.create(title="文章", content_md=self.CONTENT)
+        article = Article.objects.for_listing().get()
+        self.assertLessEqual({"content_md", "content_html"}, article.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.assertEqual((article.word_count, article.reading_minutes), (504, 2))
+
+
+class ListQueryCountTests(TestCase):
+    """列表页、接口与静态构建的查询数不应随文章数、标签数增长"""
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_query_count_independent_of_corpus_size(self):
+        create_corpus(articles=3, tags=3)
+        small = {
+            "list": self.count_queries("/articles/"),
+            "list_tag": self.count_queries("/articles/", {"tag": "标签0"}),
+            "api": self.count_queries("/api/articles/"),
+            "api_cursor": self.count_queries("/api/articles/", {"cursor": ""}),
+        }
+
+        create_corpus(articles=30, tags=12, tags_per_article=6, prefix="大")
+        large = {
+            "list": self.count_queries("/articles/"),
+            "list_tag": self.count_queries("/articles/", {"tag": "标签0"}),
+            "api": self.count_queries("/api/articles/"),
+            "api_cursor": self.count_queries("/api/articles/", {"cursor": ""}),
+        }
+        self.assertEqual(small, large)
+
+    def test_static_build_buckets_tags_without_extra_queries(self):
+        tags = create_corpus(articles=20, tags=5)
+        articles = list(Article.objects.for_listing())
+        with self.assertNumQueries(0):
+            buckets = bucket_by_tag(articles)
+        for tag in tags:
+            expected = list(Article.objects.for_listing().filter(tags=tag).values_list("pk", flat=True))
+            self.assertEqual([a.pk for a in buckets[tag.pk]], expected)
+
+
+class CursorPaginationTests(TestCase):
+    """游标分页：发布时间相同的文章也不重复、不遗漏，每页查询数固定，坏游标返回 400"""
+
+    def test_walk_all_pages(self):
+        now = timezone.now()
+        tag = Tag.objects.create(name="安卓")
+        for i in range(25):
+            # 每 10 篇共用一个发布时间，只能靠 id 区分先后
+            article = Article.objects.create(
+                title=f"文章{i}", content_md="正文", published_at=now - timezone.timedelta(hours=i // 10),
+            )
+            article.tags.add(tag)
+        Article.objects.create(title="隐藏", content_md="正文", published_at=now, is_hidden=True)
+        expected = list(Article.objects.for_listing().order_by("-published_at", "-id").values_list("pk", flat=True))
+
+        seen, cursor, queries = [], "", set()
+        while cursor is not None:
+            with CaptureQueriesContext(connection) as ctx:
+                page = paginate_by_cursor(Article.objects.for_listing(), cursor, 10)
+                self.assertTrue(all(a.tags.all() for a in page))
+            queries.add(len(ctx))
+            seen.extend(a.pk for a in page)
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual(queries, {2})  # 文章 + 预取标签
+
+        seen, cursor = [], ""
+        while cursor is not None:
+            data = self.client.get("/api/articles/", {"cursor": cursor}).json()["data"]
+            seen.extend(a["id"] for a in data["articles"])
+            cursor = data["pagination"]["next_cursor"]
+            self.assertEqual(data["pagination"]["has_next"], cursor is not None)
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        Article.objects.create(title="文章", content_md="正文")
+
+        def b64(raw: bytes) -> str:
+            return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+        for cursor in ("坏", "!!!", "a", b64(b"no-separator"), b64(b"2025-01-01T00:00:00+00:00|abc"),
+                       b64(b"not-a-date|1"), b64(b"\xff\xfe|1"), b64(b"2025-01-01T00:00:00|1"),
+                       b64(b"2025-01-01T00:00:00+00:00|" + b"9" * 30)):
+            response = self.client.get("/api/articles/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertFalse(response.json()["ok"])
+            self.assertEqual(self.client.get("/articles/", {"cursor": cursor}).status_code, 200, cursor)
+
+
+class SearchTests(TestCase):
+    """FTS5 全文检索：CJK 二元切分、信号同步与可见性过滤"""
+
+    def test_search_api_ranks_and_tracks_changes(self):
+        hit = Article.objects.create(title="盘古大仙洞府", content_md="记录 Django 与 JNI 开发")
+        Article.objects.create(title="夏日时光", content_md="海边的盘古大仙")
+        hidden = Article.objects.create(title="盘古大仙", content_md="隐藏", is_hidden=True)
+
+        data = self.client.get("/api/search/", {"q": "盘古大仙"}).json()["data"]
+        self.assertEqual([r["id"] for r in data["results"]][0], hit.pk)
+        self.assertEqual(data["pagination"]["total_count"], 2)
+        self.assertIn("<mark>盘古大仙</mark>", data["results"][0]["title_highlight"])
+        self.assertNotIn(hidden.pk, [r["id"] for r in data["results"]])
+
+        self.assertEqual(self.client.get("/api/search/", {"q": "jni"}).json()["data"]["pagination"]["total_count"], 1)
+        self.assertEqual(self.client.get("/api/search/", {"q": "洞"}).json()["data"]["pagination"]["total_count"], 1)
+
+        hit.title = "改名"
+        hit.content_md = ""
+        hit.save()
+        self.assertEqual(self.client.get("/api/search/", {"q": "洞府"}).json()["data"]["pagination"]["total_count"], 0)
+        Article.objects.filter(title="夏日时光").delete()
+        self.assertEqual(self.client.get("/api/search/", {"q": "盘古"}).json()["data"]["pagination"]["total_count"], 0)
+
+    def test_admin_search_uses_fts_subquery(self):
+        hit = Article.objects.create(title="盘古大仙洞府", content_md="正文")
+        hidden = Article.objects.create(title="隐藏", content_md="盘古大仙", is_hidden=True)
+        Article.objects.create(title="夏日时光", content_md="海边")
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/backend/app/article/", {"q": "盘古大仙"})
+        self.assertEqual({a.pk for a in response.context["cl"].result_list}, {hit.pk, hidden.pk})
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("SELECT f.rowid")])
+        self.assertTrue([q for q in ctx.captured_queries if "IN (SELECT rowid FROM app_article_fts" in q["sql"]])
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / Last-Modified：内容未变化时返回 304，变化后重新返回 200"""
+
+    def test_etag_round_trip(self):
+        article = Article.objects.create(title="标题", content_md="正文")
+        for url in ("/articles/", "/api/articles/", f"/articles/{article.pk}/", f"/api/articles/{article.pk}/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            etag = response["ETag"]
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304, url)
+
+        list_etag = self.client.get("/api/articles/")["ETag"]
+        detail_etag = self.client.get(f"/api/articles/{article.pk}/")["ETag"]
+        article.tags.add(Tag.objects.create(name="新标签"))
+        self.assertEqual(self.client.get("/api/articles/", HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        self.assertEqual(self.client.get(f"/api/articles/{article.pk}/", HTTP_IF_NONE_MATCH=detail_etag).status_code, 200)
+
+
+class ResponseCacheTests(TestCase):
+    """版本化响应缓存：命中与失效、并发未命中只计算一次、计算锁只由持有者释放"""
+
+    def setUp(self):
+        cache.clear()
+        self.responses = ResponseCache("test", lock_timeout=1, poll_interval=0.01)
+
+    def test_waiter_does_not_release_foreign_lock(self):
+        cache.add("k:lock", "other-process", 60)
+        cache.add("a:lock", "other-process", 60)
+        self.assertEqual(self.responses.get_or_compute("k", lambda: b"sync"), (b"sync", False))
+        self.assertEqual(async_to_sync(self.responses.aget_or_compute)("a", self._acompute), (b"async", False))
+        self.assertEqual(cache.get("k:lock"), "other-process")
+        self.assertEqual(cache.get("a:lock"), "other-process")
+
+        self.assertEqual(self.responses.get_or_compute("own", lambda: b"v"), (b"v", False))
+        self.assertIsNone(cache.get("own:lock"))
+
+    async def _acompute(self):
+        return b"async"
+
+    def test_api_hit_miss_and_invalidation(self):
+        article = Article.objects.create(title="第一篇", content_md="正文")
+        other = Article.objects.create(
+            title="第二篇", content_md="正文", published_at=article.published_at - timezone.timedelta(days=1),
+        )
+        tag = Tag.objects.create(name="安卓")
+        self.assertEqual(self.client.get("/api/articles/")["X-Cache"], "MISS")
+        response = self.client.get("/api/articles/")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.json()["data"]["articles"][0]["title"], "第一篇")
+        self.assertEqual(self.client.get("/api/articles/", {"page": "1"})["X-Cache"], "MISS")
+
+        changes = [
+            lambda: article.tags.add(tag),
+            lambda: Article.objects.filter(pk=article.pk).first().save(),
+            lambda: other.delete(),
+        ]
+        for change in changes:
+            change()
+            self.assertEqual(self.client.get("/api/articles/")["X-Cache"], "MISS")
+            self.assertEqual(self.client.get("/api/articles/")["X-Cache"], "HIT")
+        self.assertEqual(self.client.get("/api/articles/").json()["data"]["articles"][0]["tags"][0]["name"], "安卓")
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return b"value"
+
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: self.responses.get_or_compute("cold", compute), range(8)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({value for value, _ in results}, {b"value"})
+        self.assertEqual(sum(not cached for _, cached in results), 1)
+
+        stats = self.responses.stats()
+        self.assertEqual((stats["misses"], stats["hits"] + stats["waits"]), (1, 7))
+        self.responses.get_or_compute("cold", compute)
+        self.assertEqual(self.responses.stats()["hits"], stats["hits"] + 1)
+        self.assertAlmostEqual(self.responses.stats()["hit_ratio"], 8 / 9)
+
+    def test_wait_outside_stripe_lock(self):
+        self.responses.LOCK_STRIPES = 1
+        self.responses._locks = [threading.Lock()]
+        cache.add("slow:lock", "other-process", 60)
+        waiter = threading.Thread(target=self.responses.get_or_compute, args=("slow", lambda: b"late"))
+        waiter.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        self.assertEqual(self.responses.get_or_compute("other", lambda: b"v"), (b"v", False))
+        self.assertLess(time.monotonic() - started, 0.5)
+        waiter.join()
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTests(TestCase):
+    """整页缓存：命中时不查库，文章变化只失效相关页面"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_hit_and_targeted_invalidation(self):
+        tag = Tag.objects.create(name="安卓")
+        first = Article.objects.create(title="第一篇", content_md="一")
+        second = Article.objects.create(title="第二篇", content_md="二")
+        first.tags.add(tag)
+        urls = ["/articles/", "/articles/?tag=安卓", f"/articles/{first.pk}/", f"/articles/{second.pk}/"]
+        varies = {}
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response["X-Page-Cache"], "MISS")
+            varies[url] = response["Vary"]
+        with self.assertNumQueries(0):
+            for url in urls:
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+                self.assertEqual(response["X-Page-Cache"], "HIT")
+                self.assertEqual(response["Content-Encoding"], "gzip")
+                # 视图与后续中间件设置的 Vary(如 LocaleMiddleware 的 Accept-Language)随缓存保留
+                self.assertEqual(response["Vary"], varies[url])
+                self.assertIn("Accept-Language", response["Vary"])
+                self.assertIn("Accept-Encoding", response["Vary"])
+
+        second.title = "第二篇(修改)"
+        second.save()
+        states = {url: self.client.get(url)["X-Page-Cache"] for url in urls}
+        self.assertEqual(states, {
+            "/articles/": "MISS",
+            "/articles/?tag=安卓": "HIT",
+            f"/articles/{first.pk}/": "HIT",
+            f"/articles/{second.pk}/": "MISS",
+        })
+
+
+class CoverProcessingTests(TestCase):
+    """封面水印只在换封面后处理一次，原图保留，重新处理结果不叠加"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, COVER_PROCESSING_SYNC=True,
+                                     COVER_WATERMARK_TEXT="Pangu")
+        override.enable()
+        self.addCleanup(override.disable)
+        # 测试环境没有 CJK 字体，用 Pillow 自带的拉丁字体
+        patcher = mock.patch("app.images._font", lambda size: ImageFont.load_default(size))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, color):
+        buf = io.BytesIO()
+        Image.new("RGB", (800, 400), color).save(buf, format="PNG")
+        return SimpleUploadedFile("cover.png", buf.getvalue(), content_type="image/png")
+
+    def test_watermark_once_from_original(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            article = Article.objects.create(title="封面", cover=self.upload("navy"))
+        article.refresh_from_db()
+        cover = Path(self.media_root) / article.cover.name
+        original = Path(self.media_root) / article.cover_original
+        self.assertTrue(article.cover_source_hash and article.cover_hash)
+        self.assertNotEqual(cover.read_bytes(), original.read_bytes())
+        watermarked = cover.read_bytes()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            article.title = "改标题"
+            article.save()
+        self.assertEqual(callbacks, [])
+        # 已处理且衍生图齐全：不再读取封面文件计算哈希
+        with mock.patch("app.images.file_sha256", side_effect=AssertionError):
+            self.assertFalse(process_cover(article.pk))
+        process_cover(article.pk, reprocess=True)
+        self.assertEqual(cover.read_bytes(), watermarked)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            article.cover = self.upload("teal")
+            article.save()
+        article.refresh_from_db()
+        self.assertNotEqual(Path(self.media_root, article.cover_original), original)
+
+    def test_adopt_existing_cover_without_redrawing(self):
+        # 未执行提交后的处理任务，相当于升级前已有的封面；迁移 0008 只做标记
+        adopted, lazy = (Article.objects.create(title=title, cover=self.upload("navy")) for title in ("旧封面", "旧封面2"))
+        pending = Article.objects.create(title="新封面", cover=self.upload("teal"))
+        Article.objects.filter(pk__in=[adopted.pk, lazy.pk]).update(cover_source_hash=images.LEGACY_SOURCE_HASH)
+        published = {a.pk: Path(self.media_root, a.cover.name).read_bytes() for a in (adopted, lazy)}
+
+        with mock.patch("app.images.watermark", side_effect=AssertionError):
+            call_command("process_covers", "--adopt", stdout=io.StringIO())
+            adopted.refresh_from_db()
+            self.assertEqual(Path(self.media_root, adopted.cover_original).read_bytes(), published[adopted.pk])
+            self.assertEqual(Article.objects.get(pk=pending.pk).cover_source_hash, "")  # 待加水印的不认领
+            # 未认领的旧封面在首次处理时认领，同样不重画
+            self.assertTrue(process_cover(lazy.pk))
+            self.assertTrue(process_cover(adopted.pk))
+        for article in Article.objects.filter(pk__in=published):
+            self.assertEqual(len(article.cover_source_hash), 64)
+            self.assertTrue(article.cover_hash)
+            self.assertEqual(Path(self.media_root, article.cover.name).read_bytes(), published[article.pk])
+            self.assertEqual(Path(self.media_root, article.cover_original).read_bytes(), published[article.pk])
+
+    def test_skips_watermark_without_glyphs(self):
+        self.assertEqual(images.missing_glyphs(ImageFont.load_default(20), "盘古 Pangu"), ["盘", "古"])
+        self.assertEqual(check_watermark_font(None), [])
+        with override_settings(COVER_WATERMARK_TEXT="盘古大仙洞府"):
+            self.assertEqual([w.id for w in check_watermark_font(None)], ["app.W001"])
+            with self.assertLogs("app.images", "WARNING"), self.captureOnCommitCallbacks(execute=True):
+                article = Article.objects.create(title="封面", cover=self.upload("navy"))
+            article.refresh_from_db()
+            cover = Path(self.media_root) / article.cover.name
+            uploaded = cover.read_bytes()
+            # 未加水印：保持待处理，命令以非零状态退出
+            self.assertEqual((article.cover_source_hash, article.cover_original), ("", ""))
+            with self.assertLogs("app.images", "WARNING"), self.assertRaisesMessage(CommandError, "1 个封面未加水印"):
+                call_command("process_covers", stdout=io.StringIO())
+            self.assertEqual(cover.read_bytes(), uploaded)
+
+        # 字体可用后再处理即补上水印
+        self.assertTrue(process_cover(article.pk))
+        article.refresh_from_db()
+        self.assertTrue(article.cover_source_hash)
+        self.assertEqual(Path(self.media_root, article.cover_original).read_bytes(), uploaded)
+        self.assertNotEqual(cover.read_bytes(), uploaded)
+
+
+class CoverVariantTests(SimpleTestCase):
+    """封面衍生图：按宽度生成 WebP + JPEG，相同内容共用，宽度配置变化时重新生成；模板输出 srcset"""
+
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, COVER_VARIANT_WIDTHS=(320, 640, 960, 1280))
+        override.enable()
+        self.addCleanup(override.disable)
+        # 衍生图描述按哈希缓存在进程内，换了 MEDIA_ROOT 需要清空
+        for cache in (images._variants_cache, images._missing_variants):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        (self.media_root / "covers").mkdir()
+        Image.new("RGB", (1000, 500), "teal").save(self.media_root / "covers" / "a.png")
+        shutil.copyfile(self.media_root / "covers" / "a.png", self.media_root / "covers" / "b.png")
+
+    def test_generate_dedup_and_regenerate(self):
+        cover_hash = images.ensure_cover_variants("covers/a.png")
+        info = images.load_variants(cover_hash)
+        self.assertEqual([(v["width"], v["height"]) for v in info["variants"]],
+                         [(320, 160), (640, 320), (960, 480), (1000, 500)])
+        for variant in info["variants"]:
+            with Image.open(self.media_root / variant["webp"]) as webp, Image.open(self.media_root / variant["jpeg"]) as jpeg:
+                self.assertEqual((webp.format, jpeg.format), ("WEBP", "JPEG"))
+                self.assertEqual(webp.size, (variant["width"], variant["height"]))
+
+        with mock.patch("app.images.generate_variants", wraps=images.generate_variants) as generate:
+            self.assertEqual(images.ensure_cover_variants("covers/b.png"), cover_hash)
+            self.assertEqual(generate.call_count, 0)
+            with override_settings(COVER_VARIANT_WIDTHS=(480,)):
+                self.assertEqual(images.ensure_cover_variants("covers/b.png"), cover_hash)
+                self.assertEqual(generate.call_count, 1)
+                self.assertEqual([v["width"] for v in images.load_variants(cover_hash)["variants"]], [480])
+
+    def test_missing_variants_cached_briefly(self):
+        cover_hash = images.file_sha256(self.media_root / "covers" / "a.png")
+        now = time.monotonic()
+        with mock.patch.object(Path, "read_text", autospec=True, side_effect=Path.read_text) as read, \
+                mock.patch("app.images.time.monotonic", return_value=now):
+            self.assertIsNone(images.load_variants(cover_hash))
+            self.assertIsNone(images.load_variants(cover_hash))
+            self.assertEqual(read.call_count, 1)
+            # 本进程生成衍生图后立即可见
+            self.assertEqual(images.ensure_cover_variants("covers/a.png"), cover_hash)
+            self.assertIsNotNone(images.load_variants(cover_hash))
+
+        # 其他进程生成的衍生图(这里复制到位，不经过本进程的 generate_variants)在过期后可见
+        images._variants_cache.clear()
+        variants_dir = self.media_root / images.VARIANTS_DIR
+        elsewhere = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, elsewhere)
+        shutil.move(variants_dir, elsewhere / "_variants")
+        with mock.patch("app.images.time.monotonic", return_value=now):
+            self.assertIsNone(images.load_variants(cover_hash))
+        shutil.move(elsewhere / "_variants", variants_dir)
+        with mock.patch("app.images.time.monotonic", return_value=now + images._MISSING_VARIANTS_TTL - 1):
+            self.assertIsNone(images.load_variants(cover_hash))
+        with mock.patch("app.images.time.monotonic", return_value=now + images._MISSING_VARIANTS_TTL + 1):
+            self.assertIsNotNone(images.load_variants(cover_hash))
+
+    def render(self, article, **context):
+        return Template(
+            '{% load covers %}{% cover_picture article "article-cover" sizes="(max-width: 768px) 100vw, 640px" %}'
+        ).render(TemplateContext({"article": article, **context}))
+
+    def test_cover_picture_markup(self):
+        article = Article(title="封面", cover="covers/a.png")
+        self.assertHTMLEqual(self.render(article), '<img src="/media/covers/a.png" alt="封面" class="article-cover" loading="lazy">')
+
+        article.cover_hash = cover_hash = images.ensure_cover_variants("covers/a.png")
+        base = f"covers/_variants/{cover_hash}"
+        sizes = "(max-width: 768px) 100vw, 640px"
+        self.assertHTMLEqual(self.render(article, is_static=True), (
+            f'<picture><source type="image/webp" sizes="{sizes}" srcset="media/{base}/w320.webp 320w, '
+            f'media/{base}/w640.webp 640w, media/{base}/w960.webp 960w, media/{base}/w1000.webp 1000w">'
+            f'<img src="media/{base}/w1000.jpg" srcset="media/{base}/w320.jpg 320w, media/{base}/w640.jpg 640w, '
+            f'media/{base}/w960.jpg 960w, media/{base}/w1000.jpg 1000w" sizes="{sizes}" width="1000" height="500" '
+            'alt="封面" class="article-cover" loading="lazy" decoding="async"></picture>'
+        ))
+        self.assertIn(f'srcset="/media/{base}/w320.webp 320w', self.render(article))
+
+
+class RenderCacheTests(SimpleTestCase):
+    """Markdown 渲染缓存：键含配置指纹，磁盘缓存跨实例命中，LRU 淘汰与命中统计"""
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_key_changes_with_config_fingerprint(self):
+        key = rendering.cache_key("# 标题")
+        self.assertEqual(rendering.cache_key("# 标题"), key)
+        self.assertNotEqual(rendering.cache_key("# 标题 "), key)
+        with mock.patch.object(rendering, "CONFIG_FINGERPRINT", "0" * 64):
+            self.assertNotEqual(rendering.cache_key("# 标题"), key)
+
+    def test_disk_hit_across_instances_and_counters(self):
+        key = rendering.cache_key("正文")
+        rendering.RenderCache(8, self.directory).set(key, "<p>正文</p>")
+
+        render_cache = rendering.RenderCache(8, self.directory)
+        self.assertEqual(render_cache.get(key), "<p>正文</p>")   # 新实例：磁盘命中
+        self.assertEqual(render_cache.get(key), "<p>正文</p>")   # 已载入内存
+        self.assertIsNone(render_cache.get(rendering.cache_key("不存在")))
+        stats = render_cache.stats()
+        self.assertEqual((stats["disk_hits"], stats["memory_hits"], stats["misses"]), (1, 1, 1))
+        self.assertEqual(stats["memory_entries"], 1)
+        self.assertAlmostEqual(stats["hit_ratio"], 2 / 3)
+
+        render_cache.clear()
+        self.assertEqual(render_cache.stats()["hit_ratio"], 0.0)
+        self.assertEqual(render_cache.get(key), "<p>正文</p>")   # 清空只影响内存
+        self.assertEqual(render_cache.stats()["disk_hits"], 1)
+
+    def test_memory_lru_eviction(self):
+        render_cache = rendering.RenderCache(2, None)
+        for key in ("a", "b", "c"):
+            render_cache.set(key, key.upper())
+        self.assertIsNone(render_cache.get("a"))
+        self.assertEqual(render_cache.get("b"), "B")
+        render_cache.set("d", "D")                             # b 刚被访问，淘汰 c
+        self.assertIsNone(render_cache.get("c"))
+        self.assertEqual(render_cache.get("b"), "B")
+        self.assertEqual(render_cache.stats()["memory_entries"], 2)
+
+
+class FingerprintTests(SimpleTestCase):
+    """静态构建资源指纹：改写 src/srcset/url() 引用并记录页面依赖"""
+
+    def test_rewrite_references(self):
+        assets = {
+            "media/covers/a b.png": hashed_name("media/covers/a b.png", "0123456789abcdef"),
+            "media/w320.webp": "media/w320.aaaaaaaaaaaa.webp",
+        }
+        html, refs = rewrite_references(
+            '<img src="media/covers/a%20b.png" srcset="media/w320.webp 320w, media/missing.webp 640w">'
+            '<a href="list.html"></a><div style="background: url(/media/w320.webp)"></div>',
+            assets,
+        )
+        self.assertIn('src="media/covers/a%20b.0123456789ab.png"', html)
+        self.assertIn('srcset="media/w320.aaaaaaaaaaaa.webp 320w, media/missing.webp 640w"', html)
+        self.assertIn("url(/media/w320.aaaaaaaaaaaa.webp)", html)
+        self.assertEqual(refs["media/missing.webp"], None)
+        self.assertNotIn("list.html", refs)
+
+
+class StaticSearchIndexTests(SimpleTestCase):
+    """静态检索索引：倒排按哈希分片，CJK 单字有独立倒排"""
+
+    def test_build_index(self):
+        meta, files = search_index.build_index([
+            (3, "盘古大仙", "洞府记录", "摘要", "article_3.html", "2025-01-01"),
+            (7, "夏日", "盘古 Django", "", "article_7.html", "2025-01-02"),
+        ])
+        meta = json.loads(meta)
+        self.assertEqual(sorted(files), sorted(search_index.index_files(meta)))
+        shards = len(meta["terms"])
+
+        def postings(token):
+            n = search_index.shard_of(token, shards)
+            flat = json.loads(files[search_index.shard_name("t", n, meta["terms"][n])]).get(token, [])
+            ids, last = [], 0
+            for delta in flat[::2]:
+                last += delta
+                ids.append(last)
+            return ids
+
+        self.assertEqual(postings("盘古"), [3, 7])
+        self.assertEqual(postings("洞"), [3])
+        self.assertEqual(postings("django"), [7])
+        docs = json.loads(files[search_index.shard_name("d", 0, meta["docs"]["0"])])
+        self.assertEqual(docs["7"][2], "article_7.html")
+
+
+class SitemapWriterTests(SimpleTestCase):
+    """sitemap 按 URL 上限分片，相同输入得到逐字节相同的输出"""
+
+    def write(self, output_dir):
+        writer = sitemap.SitemapWriter(output_dir, "https://example.com", max_urls=2)
+        base = timezone.datetime(2025, 1, 1, tzinfo=timezone.get_current_timezone())
+        for i in range(5):
+            writer.add(f"article_{i}.html", base + timezone.timedelta(days=i))
+        writer.add("list_tag_夏日.html")
+        shards = writer.close()
+        return shards, [shard.tmp.read_bytes() for shard in shards]
+
+    def test_shards_and_index(self):
+        output_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, output_dir)
+        shards, contents = self.write(output_dir)
+        self.assertEqual([s.name for s in shards], ["sitemap-1.xml", "sitemap-2.xml", "sitemap-3.xml"])
+        self.assertEqual([c.count(b"<url>") for c in contents], [2, 2, 2])
+        self.assertIn("list_tag_%E5%A4%8F%E6%97%A5.html".encode(), contents[2])
+        index = sitemap.render_index("https://example.com/", shards)
+        self.assertIn("<loc>https://example.com/sitemap-3.xml</loc>", index)
+        self.assertIn(f"<lastmod>{sitemap.format_lastmod(shards[1].lastmod)}</lastmod>", index)
+
+        again, contents_again = self.write(output_dir)
+        self.assertEqual(contents, contents_again)
+        self.assertEqual([s.content_hash for s in shards], [s.content_hash for s in again])
+
+
+class IncrementalBuildTests(TestCase):
+    """增量构建：输入未变化时不写文件，隐藏文章删除其页面，模板或清单版本变化时重新生成全部页面"""
+
+    def setUp(self):
+        create_corpus(12, 2, tags_per_article=1)
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        self.output_dir = self.root / "docs"
+        # 模板放在临时项目目录中，修改它不影响仓库
+        self.base_dir = self.root / "project"
+        shutil.copytree(Path(settings.BASE_DIR) / "templates", self.base_dir / "templates")
+        self.templates = [{**settings.TEMPLATES[0], "DIRS": [self.base_dir / "templates"]}]
+        override = override_settings(BASE_DIR=self.base_dir, TEMPLATES=self.templates, MEDIA_ROOT=self.root / "media")
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def written(self, out) -> int:
+        return int(re.search(r"写入 (\d+) 个文件", out).group(1))
+
+    def html_pages(self) -> dict:
+        return {p.name: p.stat().st_mtime_ns for p in self.output_dir.glob("*.html")}
+
+    def test_skips_unchanged_and_removes_hidden(self):
+        first = build_static_site(self.output_dir)
+        self.assertIn("全量构建", first)
+        self.assertGreater(self.written(first), 0)
+        second = build_static_site(self.output_dir)
+        self.assertIn("增量构建", second)
+        self.assertIn("写入 0 个文件", second)
+
+        article = Article.objects.get(title="文章5")
+        page = self.output_dir / f"article_{article.pk}.html"
+        self.assertTrue(page.exists())
+        self.assertTrue(page.with_name(page.name + ".gz").exists())
+        Article.objects.filter(pk=article.pk).update(is_hidden=True)
+        out = build_static_site(self.output_dir)
+        self.assertGreater(self.written(out), 0)
+        self.assertFalse(page.exists())
+        self.assertFalse(page.with_name(page.name + ".gz").exists())
+        self.assertFalse((self.output_dir / "api" / "articles" / f"{article.pk}.json").exists())
+
+    def test_template_or_manifest_version_change_rerenders(self):
+        build_static_site(self.output_dir)
+        before = self.html_pages()
+
+        base = self.base_dir / "templates" / "base.html"
+        base.write_text(base.read_text(encoding="utf-8") + "<!-- 模板已修改 -->\n", encoding="utf-8")
+        # 重新设置 TEMPLATES 以丢弃进程内缓存的已编译模板(实际构建每次都是新进程)
+        with override_settings(TEMPLATES=self.templates):
+            build_static_site(self.output_dir)
+        after = self.html_pages()
+        self.assertEqual(after.keys(), before.keys())
+        for name in after:
+            self.assertIn("<!-- 模板已修改 -->", (self.output_dir / name).read_text(encoding="utf-8"), name)
+        self.assertIn("写入 0 个文件", build_static_site(self.output_dir))
+
+        # 清单格式升级：旧清单作废，全量重建
+        with mock.patch.object(manifest, "MANIFEST_VERSION", manifest.MANIFEST_VERSION + 1):
+            out = build_static_site(self.output_dir)
+            self.assertIn("全量构建", out)
+            self.assertTrue(all(mtime > after[name] for name, mtime in self.html_pages().items()))
+            self.assertIn("写入 0 个文件", build_static_site(self.output_dir))
+
+
+class SitemapLastmodTests(TestCase):
+    """列表页 lastmod 随页面内容变化：隐藏文章使后续文章前移时，受影响的页面 lastmod 更新"""
+
+    def lastmods(self, output_dir) -> dict:
+        text = "".join(p.read_text(encoding="utf-8") for p in sorted(output_dir.glob("sitemap-*.xml")))
+        return dict(re.findall(r"<loc>[^<]*/(list[^<]*\.html)</loc>\s*<lastmod>([^<]+)</lastmod>", text))
+
+    def test_list_page_lastmod_follows_content(self):
+        create_corpus(25, 1, tags_per_article=1)
+        Article.objects.update(updated_at=timezone.datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root)
+        output_dir = root / "docs"
+        with override_settings(MEDIA_ROOT=root / "media"):
+            build_static_site(output_dir)
+            first = self.lastmods(output_dir)
+            self.assertEqual(first["list_page_3.html"], "2020-01-01T00:00:00+00:00")
+
+            # 绕过 save() 隐藏第一页的文章：页内其他文章的 updated_at 都不变
+            Article.objects.filter(title="文章0").update(is_hidden=True)
+            build_static_site(output_dir)
+            second = self.lastmods(output_dir)
+            for name in ("list.html", "list_page_2.html", "list_page_3.html"):
+                self.assertGreater(second[name], first[name], name)
+
+            shard = output_dir / "sitemap-1.xml"
+            mtime = shard.stat().st_mtime_ns
+            build_static_site(output_dir)
+        self.assertEqual(self.lastmods(output_dir), second)
+        self.assertEqual(shard.stat().st_mtime_ns, mtime)
+
+
+class InstrumentationTests(TestCase):
+    """分段耗时按自身耗时统计，内层统计累加到外层，查询计入 db 分段"""
+
+    def test_nested_segments_and_queries(self):
+        with connection.execute_wrapper(instrumentation.db_wrapper), instrumentation.collect() as outer:
+            with instrumentation.collect() as page:
+                with instrumentation.timed("template"):
+                    list(Article.objects.all())
+                    list(Tag.objects.all())
+            with instrumentation.timed("write"):
+                pass
+        data = page.as_dict()
+        self.assertEqual(data["queries"], 2)
+        self.assertLessEqual(data["db"] + data["template"] + data["other"], data["total"] + 1e-6)
+        self.assertEqual(outer.as_dict()["queries"], 2)
+        self.assertEqual(set(outer.durations), {"db", "template", "write"})
+        # 未开启统计时 timed() 不做任何记录
+        with instrumentation.timed("template"):
+            self.assertIsNone(instrumentation.current())
+
+
+class ServerTimingTests(TestCase):
+    """Server-Timing 响应头带出查询、渲染分段与缓存命中，慢请求以 JSON 记日志"""
+
+    def setUp(self):
+        cache.clear()
+        self.article = Article.objects.create(title="标题", content_md="# 正文")
+
+    def metrics(self, response) -> dict:
+        return {part.split(";")[0]: part for part in response["Server-Timing"].split(", ")}
+
+    def test_header_and_slow_log(self):
+        metrics = self.metrics(self.client.get(f"/articles/{self.article.pk}/"))
+        self.assertRegex(metrics["db"], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"$')
+        self.assertIn("template", metrics)
+        self.assertIn("total", metrics)
+
+        self.client.get("/api/articles/")
+        self.assertIn('hit=1 miss=0', self.metrics(self.client.get("/api/articles/"))["cache"])
+
+        with override_settings(SLOW_REQUEST_THRESHOLD_MS=0), self.assertLogs("app.requests", "WARNING") as logs:
+            Client().get(f"/articles/{self.article.pk}/")
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], f"/articles/{self.article.pk}/")
+        self.assertGreater(record["queries"], 0)
+        self.assertIn("template", record["segments_ms"])
+
+
+class MetricsTests(TestCase):
+    """/metrics 按 URL 名称输出请求指标与缓存命中率，多进程时汇总各进程写出的数值"""
+
+    def test_exposition_and_multiprocess_aggregation(self):
+        cache.clear()
+        article = Article.objects.create(title="标题", content_md="正文")
+        self.client.get(f"/articles/{article.pk}/")
+        self.client.get("/api/articles/")
+        self.client.get("/api/articles/")
+        text = self.client.get("/metrics").content.decode()
+        self.assertRegex(text, r'blog_http_requests_total\{view="article_detail",method="GET",status="200"\} \d+')
+        self.assertIn('blog_http_request_duration_seconds_bucket{view="api_article_list",le="+Inf"}', text)
+        self.assertIn('blog_db_queries_per_request_count{view="article_detail"}', text)
+        self.assertRegex(text, r'blog_cache_hit_ratio\{cache="api:articles"\} 0\.\d+')
+
+        key = ("article_detail", "GET", "200")
+        own = metrics.REGISTRY.snapshot()["blog_http_requests_total"][key]
+        with tempfile.TemporaryDirectory() as tmp, override_settings(METRICS_MULTIPROC_DIR=tmp):
+            Path(tmp, "1.json").write_text(json.dumps({"pid": 1, "metrics": {
+                "blog_http_requests_total": [[list(key), 5]],
+                "blog_http_request_duration_seconds": [[["article_detail"], [[1] + [0] * 11, 0.004]]],
+            }}))
+            merged = metrics.REGISTRY.collect()
+            self.assertEqual(len(list(Path(tmp).glob(f"{os.getpid()}-*.json"))), 1)
+        self.assertEqual(merged["blog_http_requests_total"][key], own + 5)
+        self.assertEqual(merged["blog_http_request_duration_seconds"][("article_detail",)][0][0],
+                         metrics.REGISTRY.snapshot()["blog_http_request_duration_seconds"][("article_detail",)][0][0] + 1)
+
+        # 新进程复用了已退出 worker 的 pid：写入新文件，汇总值不倒退
+        registry = metrics.Registry()
+        counter = metrics.Counter("test_total", "Test counter.", registry=registry)
+        with tempfile.TemporaryDirectory() as tmp, override_settings(METRICS_MULTIPROC_DIR=tmp):
+            counter.inc(3)
+            registry.flush(force=True)
+            reborn = metrics.Registry()
+            metrics.Counter("test_total", "Test counter.", registry=reborn).inc(1)
+            reborn.flush(force=True)
+            self.assertEqual(reborn.collect()["test_total"][()], 4)
+            with mock.patch("app.metrics.os.getpid", return_value=os.getpid() + 1):
+                counter.inc(1)
+                registry.flush(force=True)  # fork 后的子进程
+            self.assertEqual(len(list(Path(tmp).glob("*.json"))), 3)
+
+        # 基类缺少 merge/exposition，不能直接实例化
+        with self.assertRaises(TypeError):
+            metrics.Metric("test_base", "Test base.", registry=metrics.Registry())
+
+        with override_settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 401)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+
+
+class AsyncApiTests(TransactionTestCase):
+    """ASGI 入口的异步接口与同步接口(WSGI)响应一致，条件请求与查询统计照常工作"""
+
+    def setUp(self):
+        cache.clear()
+        tag = Tag.objects.create(name="安卓")
+        now = timezone.now()
+        self.articles = [
+            Article.objects.create(title=f"第{i}篇", content_md="正文", published_at=now - timezone.timedelta(hours=i))
+            for i in range(12)
+        ]
+        self.articles[3].tags.add(tag)
+
+    def test_matches_sync_views(self):
+        wsgi, asgi = WSGIHandler(), ASGIHandler()
+        detail = f"/api/articles/{self.articles[0].pk}/"
+        requests = [
+            ("/api/articles/", {}), ("/api/articles/", {"page": "2"}), ("/api/articles/", {"page": "99"}),
+            ("/api/articles/", {"page": "abc"}),
+            ("/api/articles/", {"tag": "安卓"}), ("/api/articles/", {"cursor": ""}), ("/api/articles/", {"cursor": "坏"}),
+            (detail, None),
+            ("/api/articles/batch/", {"ids": f"{self.articles[5].pk},{self.articles[1].pk},999", "fields": "title,tags"}),
+            ("/api/about/", None),
+        ]
+        with mock.patch.object(async_api_views, "_build_article_list_response",
+                               wraps=async_api_views._build_article_list_response) as built:
+            for path, params in requests:
+                cache.clear()
+                status, _, body = wsgi_get(wsgi, path, params)
+                cache.clear()
+                async_status, headers, async_body = async_to_sync(asgi_get)(asgi, path, params)
+                self.assertEqual((async_status, json.loads(async_body)), (status, json.loads(body)), (path, params))
+                if params == {"page": "abc"}:
+                    self.assertEqual((status, json.loads(body)["data"]["pagination"]["current_page"]), (200, 1))
+        self.assertEqual(built.await_count, 7)
+
+        self.assertRegex(headers["Server-Timing"], r'db;dur=[\d.]+;desc="0 queries"')
+        _, headers, _ = async_to_sync(asgi_get)(asgi, detail)
+        self.assertRegex(headers["Server-Timing"], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        status, _, _ = async_to_sync(asgi_get)(asgi, detail, headers={"If-None-Match": headers["ETag"]})
+        self.assertEqual(status, 304)
+
+
+class BatchApiTests(TestCase):
+    """批量接口：按请求顺序返回、字段选择，文章数不影响查询数"""
+
+    def setUp(self):
+        cache.clear()
+        create_corpus(articles=6, tags=3)
+        self.hidden = Article.objects.create(title="隐藏", content_md="正文", is_hidden=True)
+        self.ids = list(Article.objects.visible().order_by("pk").values_list("pk", flat=True))
+
+    def test_order_fields_and_missing(self):
+        ids = [self.ids[4], self.ids[0], self.hidden.pk, 999, self.ids[4], self.ids[2]]
+        self.client.get("/api/articles/batch/", {"ids": str(self.ids[0])})  # 预热内容版本
+        with self.assertNumQueries(2):
+            data = self.client.get("/api/articles/batch/", {
+                "ids": ",".join(map(str, ids)), "fields": "title,tags",
+            }).json()["data"]
+        self.assertEqual([a["id"] for a in data["articles"]], [self.ids[4], self.ids[0], self.ids[2]])
+        self.assertEqual(set(data["articles"][0]), {"id", "title", "tags"})
+        self.assertEqual(data["missing"], [self.hidden.pk, 999])
+
+        with self.assertNumQueries(1):
+            data = self.client.get("/api/articles/batch/", {"ids": str(self.ids[1]), "fields": "word_count"}).json()
+        self.assertEqual(list(data["data"]["articles"][0]), ["id", "word_count"])
+
+        detail = self.client.get(f"/api/articles/{self.ids[1]}/").json()["data"]
+        article = self.client.get("/api/articles/batch/", {"ids": str(self.ids[1])}).json()["data"]["articles"][0]
+        self.assertEqual(article, {k: v for k, v in detail.items() if k != "comments"})
+
+    def test_invalid_parameters(self):
+        for params in ({}, {"ids": "1,x"}, {"ids": "1", "fields": "title,secret"},
+                       {"ids": ",".join(map(str, range(1, 60)))}):
+            response = self.client.get("/api/articles/batch/", params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertFalse(response.json()["ok"])
+
+
+def build_static_site(output_dir, *args):
+    command = GenerateStaticSite()
+    command.output_dir = output_dir
+    out = io.StringIO()
+    call_command(command, *args, stdout=out, stderr=io.StringIO())
+    return out.getvalue()
+
+
+class ParallelBuildTests(TransactionTestCase):
+    """--jobs 并行渲染的输出与单进程逐字节相同"""
+
+    def test_parallel_output_matches_serial(self):
+        create_corpus(23, 3, tags_per_article=2)
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root)
+        trees = []
+        with override_settings(MEDIA_ROOT=root / "media"):
+            for jobs in ("1", "3"):
+                output_dir = root / f"docs-{jobs}"
+                output = build_static_site(output_dir, "--full", "--jobs", jobs)
+                trees.append({
+                    p.relative_to(output_dir).as_posix(): p.read_bytes()
+                    for p in sorted(output_dir.rglob("*")) if p.is_file()
+                })
+        self.assertIn("并行渲染", output)
+        self.assertEqual(sorted(trees[0]), sorted(trees[1]))
+        for name in trees[0]:
+            self.assertEqual(trees[0][name], trees[1][name], name)
+
+
+class BuildProfileTests(TransactionTestCase):
+    """--profile 报告：阶段、页面数与查询数(含 --jobs 工作进程)，终端只列最慢的 N 个页面"""
+
+    PHASES = [
+        "prepare_covers", "copy_static_files", "copy_media_files", "write_asset_manifest", "generate_index",
+        "generate_article_list", "generate_article_details", "render_pending", "generate_about",
+        "generate_search", "generate_sitemap", "compress_outputs", "remove_orphans",
+    ]
+
+    def test_profile_report(self):
+        create_corpus(23, 3, tags_per_article=2)
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root)
+        rendered = {}
+        with override_settings(MEDIA_ROOT=root / "media"):
+            for jobs in ("1", "2"):
+                output_dir = root / f"docs-{jobs}"
+                report_path = root / f"profile-{jobs}.json"
+                output = build_static_site(output_dir, "--full", "--jobs", jobs,
+                                           "--profile", str(report_path), "--profile-top", "3")
+                report = json.loads(report_path.read_text(encoding="utf-8"))
+                phases = {phase["name"]: phase for phase in report["phases"]}
+                self.assertEqual(list(phases), self.PHASES)
+                self.assertGreaterEqual(report["queries"], sum(phase["queries"] for phase in report["phases"]))
+
+                pages = report["page_timings"]
+                rendered[jobs] = sorted(page["file"] for page in pages)
+                self.assertEqual(report["pages"]["count"], len(pages))
+                self.assertEqual(len(set(rendered[jobs])), len(pages))
+                html = {p.name for p in output_dir.glob("*.html")}
+                self.assertLessEqual(html, set(rendered[jobs]))
+                self.assertEqual([page["total"] for page in pages], sorted((page["total"] for page in pages), reverse=True))
+
+                lines = output.splitlines()
+                start = lines.index("  最慢的 3 个页面:") + 1
+                listed = [line for line in lines[start:] if line.endswith("次查询")]
+                self.assertEqual([line.split()[1] for line in listed], [page["file"] for page in pages[:3]])
+
+            # 工作进程渲染的页面与查询也记入报告
+            remote = [page for page in pages if page["worker"] is not None]
+            self.assertIn(f"并行渲染 {len(remote)} 个页面", output)
+            self.assertEqual({page["file"] for page in remote},
+                             {name for name in html if name.startswith(("article_", "list"))})
+            remote_queries = sum(page["queries"] for page in remote)
+            self.assertGreater(remote_queries, 0)
+            self.assertEqual(phases["render_pending"]["queries"], remote_queries)
+            self.assertEqual(rendered["1"], rendered["2"])
+
+
+class StaticApiExportTests(TestCase):
+    """静态 JSON 接口与在线 API 结构一致，未变化时不重写"""
+
+    def build(self, output_dir):
+        return build_static_site(output_dir)
+
+    def test_export_matches_live_api(self):
+        tags = create_corpus(12, 2, tags_per_article=1)
+        output_dir = Path(tempfile.mkdtemp()) / "docs"
+        self.addCleanup(shutil.rmtree, output_dir.parent)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            self.build(output_dir)
+
+        def exported(name):
+            return json.loads((output_dir / "api" / name).read_text(encoding="utf-8"))
+
+        client = Client()
+        article = Article.objects.first()
+        self.assertEqual(exported("articles/page_2.json"), client.get("/api/articles/", {"page": 2}).json())
+        self.assertEqual(
+            exported(f"articles/tag/{tags[0].name}/page_1.json"),
+            client.get("/api/articles/", {"tag": tags[0].name}).json(),
+        )
+        self.assertEqual(exported(f"articles/{article.pk}.json"), client.get(f"/api/articles/{article.pk}/").json())
+        self.assertEqual(exported("about.json"), client.get("/api/about/").json())
+
+        # 只改一篇文章：它的详情与所在列表页重写，其他 JSON 文件保持不动
+        other = output_dir / "api" / "articles" / f"{Article.objects.last().pk}.json"
+        mtime = other.stat().st_mtime_ns
+        Article.objects.filter(pk=article.pk).update(title="改过的标题")
+        with override_settings(MEDIA_ROOT=media_root):
+            self.build(output_dir)
+        self.assertEqual(exported(f"articles/{article.pk}.json")["data"]["title"], "改过的标题")
+        self.assertEqual(exported("articles/page_1.json")["data"]["articles"][0]["title"], "改过的标题")
+        self.assertEqual(other.stat().st_mtime_ns, mtime)
+
+
+class QuietHandler(PrecompressedHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PrecompressTests(TestCase):
+    """预压缩：只压缩足够大的文本文件，未变化的不重写；预览服务器按 Accept-Encoding 返回副本"""
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_compress_file_threshold(self):
+        small = self.root / "small.html"
+        small.write_text("x" * (compress.MIN_SIZE - 1), encoding="utf-8")
+        large = self.root / "large.html"
+        large.write_text("<p>盘古大仙洞府</p>" * 200, encoding="utf-8")
+        noise = self.root / "noise.json"
+        noise.write_bytes(random.Random(1).randbytes(4096))
+
+        self.assertEqual(compress.compress_file(small), [])
+        self.assertEqual(compress.compress_file(large), list(compress.ENCODINGS))
+        self.assertEqual(compress.compress_file(noise), [])  # 压缩后没有变小
+        self.assertEqual(gzip.decompress((self.root / "large.html.gz").read_bytes()), large.read_bytes())
+        if compress.brotli is not None:
+            self.assertEqual(compress.brotli.decompress((self.root / "large.html.br").read_bytes()), large.read_bytes())
+        self.assertFalse((self.root / "small.html.gz").exists())
+        self.assertFalse((self.root / "noise.json.gz").exists())
+
+    def test_build_skips_unchanged(self):
+        create_corpus(12, 2, tags_per_article=1)
+        output_dir = self.root / "docs"
+        with override_settings(MEDIA_ROOT=self.root / "media"):
+            build_static_site(output_dir)
+            sibling = output_dir / "list.html.gz"
+            mtime = sibling.stat().st_mtime_ns
+            self.assertEqual(gzip.decompress(sibling.read_bytes()), (output_dir / "list.html").read_bytes())
+            output = build_static_site(output_dir)
+        self.assertIn("写入 0 个", next(line for line in output.splitlines() if "预压缩" in line))
+        self.assertEqual(sibling.stat().st_mtime_ns, mtime)
+
+    def get(self, server, path, accept_encoding=None):
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}{path}")
+        if accept_encoding is not None:
+            request.add_header("Accept-Encoding", accept_encoding)
+        with urllib.request.urlopen(request) as response:
+            return response.headers, response.read()
+
+    def test_preview_serves_precompressed(self):
+        page = self.root / "index.html"
+        page.write_text("<p>首页</p>" * 100, encoding="utf-8")
+        compress.compress_file(page, ["gz"])
+        (self.root / "index.html.br").write_bytes(b"brotli-bytes")
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(self.root)))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        headers, body = self.get(server, "/", "gzip, br")
+        self.assertEqual((headers["Content-Encoding"], headers["Vary"], body), ("br", "Accept-Encoding", b"brotli-bytes"))
+        headers, body = self.get(server, "/index.html", "br;q=0, gzip")
+        self.assertEqual((headers["Content-Encoding"], headers["Vary"]), ("gzip", "Accept-Encoding"))
+        self.assertEqual(gzip.decompress(body), page.read_bytes())
+        self.assertTrue(headers["Content-Type"].startswith("text/html"))
+        headers, body = self.get(server, "/index.html", "identity")
+        self.assertIsNone(headers["Content-Encoding"])
+        self.assertEqual(body, page.read_bytes())
+
+
+class MediaSyncTests(TestCase):
+    """media 同步：只发布可见文章引用的文件，不再引用的删除，未变化的不重写"""
+
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.output_dir = Path(tempfile.mkdtemp()) / "docs"
+        self.addCleanup(shutil.rmtree, self.output_dir.parent)
+        for name in ("covers/shown.png", "covers/hidden.png", "img/body.png", "img/unused.png"):
+            (self.media_root / name).parent.mkdir(parents=True, exist_ok=True)
+            Image.new("RGB", (400, 200), "navy").save(self.media_root / name)
+
+    def article(self, title, cover, **kwargs):
+        article = Article.objects.create(title=title, cover=cover, **kwargs)
+        # 视为已处理过的封面，构建时只生成衍生图
+        Article.objects.filter(pk=article.pk).update(cover_source_hash="done")
+        return article
+
+    def build(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            build_static_site(self.output_dir, "--no-fingerprint")
+        published = self.output_dir / "media"
+        return {p.relative_to(published).as_posix() for p in published.rglob("*") if p.is_file()}
+
+    def test_publishes_only_referenced_media(self):
+        shown = self.article("可见", "covers/shown.png", content_md="![图](/media/img/body.png)")
+        hidden = self.article("隐藏", "covers/hidden.png", is_hidden=True)
+        published = self.build()
+        shown.refresh_from_db()
+        variants = {v["webp"] for v in images.load_variants(shown.cover_hash)["variants"]}
+        self.assertTrue({"covers/shown.png", "img/body.png"} | variants <= published)
+        self.assertNotIn("covers/hidden.png", published)
+        self.assertNotIn("img/unused.png", published)
+
+        cover = self.output_dir / "media" / "covers" / "shown.png"
+        inode, mtime = cover.stat().st_ino, cover.stat().st_mtime_ns
+        Article.objects.filter(pk=shown.pk).update(content_md="不再引用图片", is_hidden=False)
+        Article.objects.filter(pk=hidden.pk).update(is_hidden=False)
+        published = self.build()
+        self.assertNotIn("img/body.png", published)
+        self.assertIn("covers/hidden.png", published)
+        self.assertEqual((cover.stat().st_ino, cover.stat().st_mtime_ns), (inode, mtime))
+
+        Article.objects.filter(pk=hidden.pk).update(is_hidden=True)
+        self.assertNotIn("covers/hidden.png", self.build())
+
+    def test_place_file(self):
+        src = self.media_root / "img" / "body.png"
+        target = self.output_dir / "body.png"
+        if sync.place_file(src, target) == "hardlink":
+            inode = target.stat().st_ino
+            self.assertEqual(sync.place_file(src, target), "hardlink")  # 已是同一文件，不再写入
+            self.assertEqual(target.stat().st_ino, inode)
+        self.assertEqual(target.read_bytes(), src.read_bytes())
+        copy = self.output_dir / "copy.png"
+        self.assertEqual(sync.place_file(src, copy, link=False), "copy")
+        self.assertEqual(copy.read_bytes(), src.read_bytes())
+        self.assertFalse(os.path.samefile(src, copy))
+        self.assertEqual([p.name for p in self.output_dir.iterdir() if p.name.startswith(".tmp-")], [])
+
+
+class StagedBuildTests(TestCase):
+    """构建失败时 docs/ 不受影响，成功后上一版保留在 docs.previous/ 可回滚"""
+
+    def test_failed_build_and_rollback(self):
+        create_corpus(3, 1, tags_per_article=1)
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root)
+        output_dir = root / "docs"
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            build_static_site(output_dir)
+            first = (output_dir / "list.html").read_text(encoding="utf-8")
+
+            Article.objects.filter(title="文章0").update(title="新的标题")
+            def generate_sitemap(command):
+                raise RuntimeError("boom")
+
+            with mock.patch.object(GenerateStaticSite, "generate_sitemap", generate_sitemap):
+                with self.assertRaises(RuntimeError):
+                    build_static_site(output_dir)
+            self.assertEqual((output_dir / "list.html").read_text(encoding="utf-8"), first)
+            self.assertFalse((root / "docs.staging").exists())
+
+            build_static_site(output_dir)
+        self.assertIn("新的标题", (output_dir / "list.html").read_text(encoding="utf-8"))
+        self.assertEqual((root / "docs.previous" / "list.html").read_text(encoding="utf-8"), first)
+
+        build_static_site(output_dir, "--rollback")
+        self.assertEqual((output_dir / "list.html").read_text(encoding="utf-8"), first)
+
+
+class BenchmarkTests(TestCase):
+    """基准语料可复现，场景在小语料上能跑通并给出分位数与查询数"""
+
+    def test_corpus_and_scenario(self):
+        self.assertEqual(corpus.make_markdown(random.Random(3), 800), corpus.make_markdown(random.Random(3), 800))
+        self.assertEqual(percentile([1.0, 2.0, 3.0, 4.0], 50), 2.5)
+
+        stats = corpus.seed_corpus(articles=25, tags=5, tags_per_article=2, markdown_size=400, covers=0)
+        self.assertEqual(stats["articles"], 25)
+        self.assertEqual(Article.tags.through.objects.count(), 50)
+        ctx = Context()
+        for name in ("view:article_list", "api:article_list", "render:markdown"):
+            result = run_scenario(SCENARIOS[name], ctx, iterations=3, measure_memory=False)
+            self.assertEqual(result["iterations"], 3)
+            self.assertLessEqual(result["latency_ms"]["p50"], result["latency_ms"]["max"])
+        self.assertGreater(result["segments_ms"]["markdown"], 0)
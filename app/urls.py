@@ -7,10 +7,13 @@ urlpatterns = [
     path('articles/', views.article_list, name='article_list'),
     path('articles/<int:pk>/', views.article_detail, name='article_detail'),
     path('about/', views.about, name='about'),
+    path('metrics', views.metrics_view, name='metrics'),
 
     # ===== API 路由（只读，安全） =====
     path('api/articles/', api_views.api_article_list, name='api_article_list'),
+    path('api/articles/batch/', api_views.api_article_batch, name='api_article_batch'),
     path('api/articles/<int:pk>/', api_views.api_article_detail, name='api_article_detail'),
+    path('api/search/', api_views.api_search, name='api_search'),
     path('api/about/', api_views.api_about_info, name='api_about_info'),
 ]
 
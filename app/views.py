@@ -1,12 +1,14 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpRequest
+from django.http import Http404, HttpResponse, JsonResponse, HttpRequest
 from django.utils import timezone
-from django.views.decorators.http import require_POST
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET, require_POST
 from django.core.paginator import Paginator
 from django.core.cache import cache
+from . import metrics
+from .caching import article_conditional, site_conditional
 from .models import Article, Tag
-import markdown as md
-import bleach
+from .pagination import InvalidCursor, paginate_by_cursor
 import hashlib
 import random
 from pathlib import Path
@@ -21,34 +23,53 @@ def index(request: HttpRequest):
     return render(request, "index.html", {"bio": AUTHOR_BIO})
 
 
+@site_conditional
 def article_list(request: HttpRequest):
-    """文章列表：支持标签筛选与分页"""
+    """文章列表：支持标签筛选与分页（默认页码分页，带 cursor 参数时使用游标分页）"""
     tag_name = request.GET.get("tag")
-    qs = Article.objects.filter(is_hidden=False).order_by("-published_at")
+    qs = Article.objects.for_listing()
     active_tag = None
     if tag_name:
         active_tag = get_object_or_404(Tag, name=tag_name)
         qs = qs.filter(tags=active_tag)
+    tags = Tag.objects.all()
+    cursor = request.GET.get("cursor")
+    if cursor is not None:
+        try:
+            page_obj = paginate_by_cursor(qs, cursor, 10)
+        except InvalidCursor:
+            # 与 Paginator.get_page 一样宽容：无效游标回到第一页
+            page_obj = paginate_by_cursor(qs, "", 10)
+        return render(request, "list.html", {"page_obj": page_obj, "tags": tags, "active_tag": active_tag, "cursor_mode": True})
     paginator = Paginator(qs, 10)
     page_obj = paginator.get_page(request.GET.get("page"))
-    tags = Tag.objects.all()
     return render(request, "list.html", {"page_obj": page_obj, "tags": tags, "active_tag": active_tag})
 
 
+@article_conditional
 def article_detail(request: HttpRequest, pk: int):
-    """文章详情：底部评论列表"""
+    """文章详情：Markdown 渲染结果走共享渲染缓存"""
     article = get_object_or_404(Article, pk=pk, is_hidden=False)
-    comments = article.comments.filter(is_hidden=False)
-    # Markdown -> 安全 HTML
-    allowed_tags = bleach.sanitizer.ALLOWED_TAGS.union({"p", "pre", "code", "img", "h1", "h2", "h3", "h4", "h5", "h6", "table", "thead", "tbody", "tr", "th", "td", "blockquote"})
-    html = md.markdown(article.content_md, extensions=["extra", "fenced_code", "tables", "codehilite"])
-    html = bleach.clean(html, tags=allowed_tags, attributes={"*": ["class", "id"], "img": ["src", "alt"]}, strip=True)
+    comments = []  # 评论功能已移除
+    # Markdown -> 安全 HTML (优先使用保存时预渲染的结果)
+    html = article.rendered_html
     return render(request, "detail.html", {"article": article, "comments": comments, "article_html": html})
 
 
 def about(request: HttpRequest):
     return render(request, "about.html")
 
+@require_GET
+def metrics_view(request: HttpRequest):
+    """Prometheus 指标(文本格式)；配置了 METRICS_TOKEN 时要求 Authorization: Bearer <token>"""
+    if not getattr(settings, "METRICS_ENABLED", False):
+        raise Http404
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401, headers={"WWW-Authenticate": "Bearer"})
+    return HttpResponse(metrics.exposition(), content_type=metrics.CONTENT_TYPE)
+
+
 def admin_responsive_test(request: HttpRequest):
     """响应式管理后台测试页面"""
     return render(request, "admin/responsive_test.html")
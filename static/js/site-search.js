@@ -0,0 +1,185 @@
+// 静态站点站内检索 - 读取 generate_static_site 生成的 search/ 分片索引
+// 切分规则与 app/search.py 一致：CJK 连续字符按二元组，单字查单字倒排，拉丁词小写整词匹配
+// 只下载查询涉及的倒排分片与结果页用到的文档分片
+
+(function() {
+    const CJK_RE = /[㐀-䶿一-鿿豈-﫿぀-ヿ가-힯]/;
+    const WORD_RE = /[\p{L}\p{N}]/u;
+    const PAGE_SIZE = 20;
+
+    const cache = new Map();
+    let metaPromise = null;
+
+    function fetchJson(url) {
+        if (!cache.has(url)) {
+            cache.set(url, fetch(url).then(function(response) {
+                if (!response.ok) throw new Error(url + ': ' + response.status);
+                return response.json();
+            }));
+        }
+        return cache.get(url);
+    }
+
+    function loadMeta() {
+        // index.json 文件名固定，每次协商缓存；分片文件名带哈希
+        if (!metaPromise) metaPromise = fetch('search/index.json', { cache: 'no-cache' }).then(function(r) { return r.json(); });
+        return metaPromise;
+    }
+
+    // 与 search_index.shard_name 保持一致
+    function shardUrl(kind, n, hash) {
+        return 'search/' + kind + n + '.' + hash + '.json';
+    }
+
+    // 与 search_index.shard_of 保持一致
+    function shardOf(token, shards) {
+        let h = 2166136261;
+        for (const ch of token) h = Math.imul(h ^ ch.codePointAt(0), 16777619) >>> 0;
+        return h % shards;
+    }
+
+    // 把一个检索词拆成连续的 CJK 段与拉丁词段
+    function runs(term) {
+        const result = [];
+        let current = '', cjk = false;
+        for (const ch of term) {
+            const isCjk = CJK_RE.test(ch);
+            const isWord = isCjk || WORD_RE.test(ch);
+            if (!isWord || (current && isCjk !== cjk)) {
+                if (current) result.push({ text: current, cjk: cjk });
+                current = '';
+            }
+            if (isWord) {
+                current += ch;
+                cjk = isCjk;
+            }
+        }
+        if (current) result.push({ text: current, cjk: cjk });
+        return result;
+    }
+
+    // 与 search.build_match_query 对应：每段为一个子句，子句之间为 AND
+    function parseQuery(query) {
+        const clauses = [];
+        query.split(/\s+/).forEach(function(term) {
+            runs(term).forEach(function(run) {
+                if (!run.cjk) {
+                    clauses.push({ tokens: [run.text.toLowerCase()] });
+                    return;
+                }
+                const chars = Array.from(run.text);
+                if (chars.length === 1) {
+                    clauses.push({ tokens: chars });
+                    return;
+                }
+                const tokens = [];
+                for (let i = 0; i < chars.length - 1; i++) tokens.push(chars[i] + chars[i + 1]);
+                clauses.push({ tokens: tokens });
+            });
+        });
+        return clauses;
+    }
+
+    // [id 增量, 得分, ...] -> Map(id -> 得分)
+    function decode(flat) {
+        const hits = new Map();
+        let id = 0;
+        for (let i = 0; i < flat.length; i += 2) {
+            id += flat[i];
+            hits.set(id, flat[i + 1]);
+        }
+        return hits;
+    }
+
+    function intersect(a, b) {
+        const out = new Map();
+        a.forEach(function(score, id) {
+            if (b.has(id)) out.set(id, score + b.get(id));
+        });
+        return out;
+    }
+
+    function evaluate(clause, shard) {
+        return clause.tokens.map(function(token) { return decode(shard[token] || []); }).reduce(intersect);
+    }
+
+    async function search(query) {
+        const clauses = parseQuery(query);
+        if (!clauses.length) return { total: 0, results: [] };
+        const meta = await loadMeta();
+        const shards = meta.terms.length;
+
+        let hits = null;
+        for (const clause of clauses) {
+            // 同一子句的检索词可能落在不同分片，合并后再求值
+            const needed = new Set(clause.tokens.map(function(t) { return shardOf(t, shards); }));
+            const loaded = await Promise.all(Array.from(needed).map(function(n) { return fetchJson(shardUrl('t', n, meta.terms[n])); }));
+            const merged = Object.assign({}, ...loaded);
+            const clauseHits = evaluate(clause, merged);
+            hits = hits ? intersect(hits, clauseHits) : clauseHits;
+            if (!hits.size) break;
+        }
+
+        const ranked = Array.from(hits.entries()).sort(function(a, b) { return b[1] - a[1] || b[0] - a[0]; });
+        const top = ranked.slice(0, PAGE_SIZE).map(function(entry) { return entry[0]; });
+        const docShards = new Set(top.map(function(id) { return String(Math.floor(id / meta.doc_shard_size)); }));
+        const docs = Object.assign({}, ...(await Promise.all(
+            Array.from(docShards).map(function(n) { return fetchJson(shardUrl('d', n, meta.docs[n])); })
+        )));
+        return {
+            total: ranked.length,
+            results: top.filter(function(id) { return docs[id]; }).map(function(id) {
+                const doc = docs[id];
+                return { id: id, title: doc[0], summary: doc[1], url: doc[2], date: doc[3] };
+            }),
+        };
+    }
+
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function render(container, status, query, data) {
+        status.textContent = query ? '找到 ' + data.total + ' 篇相关文章' : '';
+        container.innerHTML = data.results.map(function(r) {
+            return '<article class="card search-result">' +
+                '<h2><a href="' + escapeHtml(r.url) + '">' + escapeHtml(r.title) + '</a></h2>' +
+                '<div class="search-date">' + escapeHtml(r.date) + '</div>' +
+                '<p>' + escapeHtml(r.summary) + '</p></article>';
+        }).join('');
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        const form = document.getElementById('site-search-form');
+        if (!form) return;
+        const input = form.querySelector('input[name="q"]');
+        const container = document.getElementById('site-search-results');
+        const status = document.getElementById('site-search-status');
+
+        function run(query) {
+            query = query.trim();
+            if (!query) return render(container, status, '', { total: 0, results: [] });
+            status.textContent = '检索中...';
+            search(query).then(function(data) {
+                render(container, status, query, data);
+            }).catch(function(error) {
+                status.textContent = '检索索引加载失败';
+                console.error(error);
+            });
+        }
+
+        form.addEventListener('submit', function(event) {
+            event.preventDefault();
+            history.replaceState(null, '', '?q=' + encodeURIComponent(input.value.trim()));
+            run(input.value);
+        });
+
+        const initial = new URLSearchParams(location.search).get('q') || '';
+        input.value = initial;
+        run(initial);
+    });
+
+    window.siteSearch = search;
+})();